@@ -6,6 +6,9 @@ import os
 
 from routes import register_routes
 from services.online_service import obter_usuarios_online_count, registrar_atividade_usuario
+from services.dashboard_operacional_service import start_dashboard_refresher
+from core.job_queue import restore_pending as restore_pending_jobs
+from core.lookup_cache import start_warm_up as warm_up_lookup_caches
 from core.auth import (
     has_perm,
     any_perm,
@@ -24,6 +27,10 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY", "minha_chave_secreta")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
 register_routes(app)
+start_dashboard_refresher()
+# Depois das rotas: os módulos dos jobs já registraram seus tipos.
+restore_pending_jobs()
+warm_up_lookup_caches()
 
 
 @app.before_request
@@ -0,0 +1,108 @@
+import itertools
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+# Retenção do último evento de cada canal depois que o job termina; o front
+# que chegar depois disso cai no polling do endpoint de status.
+RETENTION_SECONDS = int(os.getenv("JOB_EVENTS_RETENTION_SECONDS", "600"))
+MAX_CHANNELS = int(os.getenv("JOB_EVENTS_MAX_CHANNELS", "2000"))
+
+TERMINAL_STATUSES = {
+    "completed",
+    "success",
+    "done",
+    "finished",
+    "failed",
+    "error",
+    "canceled",
+    "cancelled",
+}
+
+_channels: Dict[str, dict] = {}
+_condition = threading.Condition()
+# Versão global e crescente (semeada pelo relógio): um canal removido e
+# recriado (ex.: mesmo job_id reaproveitado) ou um processo
+# reiniciado nunca volta a uma versão que um assinante já viu (Last-Event-ID).
+_versions = itertools.count(int(time.time() * 1000))
+
+
+def channel_name(kind: str, job_id) -> str:
+    return f"{kind}:{job_id}"
+
+
+def is_terminal(payload: dict) -> bool:
+    return str((payload or {}).get("status") or "").strip().lower() in TERMINAL_STATUSES
+
+
+def _prune(now: float):
+    expired = [
+        name
+        for name, channel in _channels.items()
+        if channel["terminal"] and now - channel["updated_at"] > RETENTION_SECONDS
+    ]
+    for name in expired:
+        del _channels[name]
+
+    if len(_channels) > MAX_CHANNELS:
+        oldest = sorted(_channels, key=lambda name: _channels[name]["updated_at"])
+        for name in oldest[:len(_channels) - MAX_CHANNELS]:
+            del _channels[name]
+
+
+def publish(kind: str, job_id, payload: dict, merge: bool = False):
+    """
+    Publica o estado atual de um job para quem estiver acompanhando via SSE.
+
+    Guarda só o último estado por canal (quem assina recebe o mais recente,
+    não o histórico). merge=True combina com o estado anterior, para quem
+    grava só os campos alterados (ex.: job_update do importador).
+    Nunca levanta exceção: progresso não pode derrubar o job.
+    """
+    try:
+        name = channel_name(kind, job_id)
+        now = time.time()
+
+        with _condition:
+            channel = _channels.get(name)
+            data = dict(channel["payload"]) if merge and channel else {}
+            data.update(payload or {})
+
+            _channels[name] = {
+                "version": next(_versions),
+                "payload": data,
+                "terminal": is_terminal(data),
+                "updated_at": now,
+            }
+
+            _prune(now)
+            _condition.notify_all()
+
+    except Exception as e:
+        print(f"[WARN] Falha ao publicar evento do job {kind}:{job_id}: {e}")
+
+
+def latest(kind: str, job_id) -> Optional[dict]:
+    """Último estado publicado neste processo ({version, payload, terminal}) ou None."""
+    with _condition:
+        channel = _channels.get(channel_name(kind, job_id))
+        return dict(channel) if channel else None
+
+
+def wait_for_update(kind: str, job_id, after_version: int, timeout: float) -> Optional[dict]:
+    """Bloqueia até sair uma versão mais nova que after_version ou até o timeout."""
+    name = channel_name(kind, job_id)
+    deadline = time.monotonic() + timeout
+
+    with _condition:
+        while True:
+            channel = _channels.get(name)
+            if channel and channel["version"] > after_version:
+                return dict(channel)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            _condition.wait(remaining)
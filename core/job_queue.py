@@ -0,0 +1,439 @@
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows (servidor de desenvolvimento, um processo só)
+    fcntl = None
+
+# Fila de jobs em segundo plano.
+#
+# Cada classe de job tem um pool próprio de workers (JOB_QUEUE_WORKERS_<CLASSE>)
+# e uma fila com prioridade (menor número sai primeiro; mesma prioridade sai
+# na ordem de chegada). Um mesmo usuário roda no máximo
+# JOB_QUEUE_MAX_RUNNING_PER_USER jobs por classe ao mesmo tempo; os demais
+# esperam a vez sem bloquear os jobs de outros usuários.
+#
+# Os jobs na fila ficam gravados em JOB_QUEUE_DIR (com o pid de quem
+# enfileirou) e voltam para a fila no próximo start (restore_pending). Só um
+# worker do gunicorn restaura: quem pega o lock exclusivo de RESTORE_LOCK_NAME
+# e o mantém enquanto viver. Se esse worker morrer, o próximo a subir assume o
+# lock e restaura só os jobs de processos que não existem mais; os dos workers
+# vivos continuam só com eles. Antes de rodar, o worker "reivindica" o arquivo
+# com os.rename, então um job que acabe em mais de uma fila só roda uma vez.
+# Os limites valem por processo.
+JOB_QUEUE_DIR = os.getenv("JOB_QUEUE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "instance",
+    "job_queue",
+)
+RESTORE_LOCK_NAME = "restore.lock"
+MAX_PENDING_PER_CLASS = int(os.getenv("JOB_QUEUE_MAX_PENDING", "20"))
+MAX_PENDING_PER_USER = int(os.getenv("JOB_QUEUE_MAX_PENDING_PER_USER", "3"))
+MAX_RUNNING_PER_USER = int(os.getenv("JOB_QUEUE_MAX_RUNNING_PER_USER", "1"))
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+# Classe -> workers padrão. Relatórios e sincronizações batem no OFS e
+# disputam o mesmo limite de requisições, por isso poucos workers.
+JOB_CLASSES = {
+    "ofs_report": 2,
+    "ofs_sync": 1,
+    "ofs_users": 1,
+    "ofs_import": 1,
+    "ddc": 1,
+}
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class _Pool:
+    def __init__(self, job_class: str, workers: int):
+        self.job_class = job_class
+        self.workers = max(1, workers)
+        self.queue = []
+        self.running_by_user: Dict[str, int] = {}
+        self.started = False
+        self.condition = threading.Condition()
+
+    def pending(self):
+        """Jobs esperando, na ordem em que vão sair (prioridade, chegada)."""
+        return [job for _, _, job in sorted(self.queue, key=lambda entry: entry[:2])]
+
+
+_registry: Dict[str, dict] = {}
+_pools: Dict[str, _Pool] = {}
+_pools_lock = threading.Lock()
+_sequence = itertools.count()
+# Arquivo do lock de restauração; fica aberto enquanto o processo viver.
+_restore_lock = None
+
+
+def register_job(
+    name: str,
+    job_class: str,
+    target: Callable,
+    on_queued: Optional[Callable] = None,
+    on_interrupted: Optional[Callable] = None,
+):
+    """
+    Registra um tipo de job. Chamar no import do módulo que define target,
+    para que jobs restaurados do disco encontrem a função.
+
+    on_queued(position, *args) é chamado quando a posição na fila muda
+    (1 = próximo a rodar), para o job refletir isso no próprio status.
+    on_interrupted(*args) é chamado no restore para um job que estava rodando
+    num processo que morreu, para o status dele não ficar "rodando" para sempre.
+    """
+    if job_class not in JOB_CLASSES:
+        raise ValueError(f"Classe de job desconhecida: {job_class}")
+
+    _registry[name] = {
+        "job_class": job_class,
+        "target": target,
+        "on_queued": on_queued,
+        "on_interrupted": on_interrupted,
+    }
+
+
+def _pool_for(job_class: str) -> _Pool:
+    with _pools_lock:
+        pool = _pools.get(job_class)
+        if pool is None:
+            workers = int(os.getenv(f"JOB_QUEUE_WORKERS_{job_class.upper()}", str(JOB_CLASSES[job_class])))
+            pool = _Pool(job_class, workers)
+            _pools[job_class] = pool
+        return pool
+
+
+def _job_file(name: str, job_id) -> str:
+    return os.path.join(JOB_QUEUE_DIR, f"{name}__{job_id}.json")
+
+
+def _claimed_file(path: str) -> str:
+    return f"{path}.{os.getpid()}.running"
+
+
+def _persist(job: dict):
+    try:
+        os.makedirs(JOB_QUEUE_DIR, exist_ok=True)
+        path = _job_file(job["name"], job["job_id"])
+        tmp_path = f"{path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "name": job["name"],
+                "job_id": job["job_id"],
+                "args": job["args"],
+                "user_key": job["user_key"],
+                "priority": job["priority"],
+                "created_ts": job["created_ts"],
+                "pid": job.get("pid") or os.getpid(),
+            }, f, ensure_ascii=False, default=str)
+
+        os.replace(tmp_path, path)
+        job["path"] = path
+
+    except Exception as e:
+        # Sem o arquivo o job roda normalmente, só não sobrevive a um restart.
+        print(f"[WARN] Falha ao gravar job {job['name']}:{job['job_id']} na fila: {e}")
+
+
+def _claim(job: dict) -> bool:
+    path = job.get("path")
+    if not path:
+        return True
+
+    claimed = _claimed_file(path)
+
+    try:
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        # Outro worker já pegou (ou o job foi descartado).
+        return False
+    except OSError as e:
+        print(f"[WARN] Falha ao reivindicar job {job['name']}:{job['job_id']}: {e}")
+        return True
+
+    job["path"] = claimed
+    return True
+
+
+def _release(job: dict):
+    path = job.get("path")
+    if not path:
+        return
+
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _claimed_elsewhere(job: dict) -> bool:
+    """O arquivo do job sumiu: outro processo já o reivindicou (ou terminou)."""
+    path = job.get("path")
+    return bool(path) and not path.endswith(".running") and not os.path.exists(path)
+
+
+def _notify_positions(pool: _Pool):
+    # Roda com a condition: nenhum job sai da fila enquanto o status dele
+    # ainda está sendo marcado como "na fila". Job que outro processo já pegou
+    # sai da fila sem aviso, para não sobrescrever o status de quem está rodando.
+    with pool.condition:
+        claimed = [job for _, _, job in pool.queue if _claimed_elsewhere(job)]
+        if claimed:
+            pool.queue = [entry for entry in pool.queue if entry[2] not in claimed]
+
+        for position, job in enumerate(pool.pending(), start=1):
+            if job["position"] == position:
+                continue
+
+            job["position"] = position
+            on_queued = _registry[job["name"]]["on_queued"]
+            if not on_queued:
+                continue
+
+            try:
+                on_queued(position, *job["args"])
+            except Exception as e:
+                print(f"[WARN] Falha ao atualizar posição do job {job['name']}:{job['job_id']}: {e}")
+
+
+def _next_job(pool: _Pool) -> dict:
+    """Tira da fila o primeiro job cujo usuário ainda tem vaga (chamar com a condition)."""
+    while True:
+        for job in pool.pending():
+            user_key = job["user_key"]
+
+            if user_key and pool.running_by_user.get(user_key, 0) >= MAX_RUNNING_PER_USER:
+                continue
+
+            pool.queue = [entry for entry in pool.queue if entry[2] is not job]
+
+            if user_key:
+                pool.running_by_user[user_key] = pool.running_by_user.get(user_key, 0) + 1
+            return job
+
+        pool.condition.wait()
+
+
+def _worker_loop(pool: _Pool):
+    while True:
+        with pool.condition:
+            job = _next_job(pool)
+
+        _notify_positions(pool)
+
+        try:
+            if _claim(job):
+                _registry[job["name"]]["target"](*job["args"])
+        except Exception as e:
+            print(f"[WARN] Job {job['name']}:{job['job_id']} terminou com erro: {e}")
+        finally:
+            _release(job)
+
+            with pool.condition:
+                user_key = job["user_key"]
+                if user_key:
+                    remaining = pool.running_by_user.get(user_key, 0) - 1
+                    if remaining > 0:
+                        pool.running_by_user[user_key] = remaining
+                    else:
+                        pool.running_by_user.pop(user_key, None)
+                pool.condition.notify_all()
+
+
+def _ensure_workers(pool: _Pool):
+    with pool.condition:
+        if pool.started:
+            return
+        pool.started = True
+
+    for index in range(pool.workers):
+        threading.Thread(
+            target=_worker_loop,
+            args=(pool,),
+            name=f"job-{pool.job_class}-{index + 1}",
+            daemon=True,
+        ).start()
+
+
+def ensure_capacity(name: str, user_key=None):
+    """Levanta JobQueueFull se a fila da classe (ou do usuário) já estiver cheia."""
+    pool = _pool_for(_registry[name]["job_class"])
+    user_key = str(user_key) if user_key not in (None, "") else None
+
+    with pool.condition:
+        pending = pool.pending()
+
+    if len(pending) >= MAX_PENDING_PER_CLASS:
+        raise JobQueueFull("A fila de processamento está cheia. Tente novamente em alguns minutos.")
+
+    if user_key and sum(1 for job in pending if job["user_key"] == user_key) >= MAX_PENDING_PER_USER:
+        raise JobQueueFull("Você já tem jobs demais aguardando na fila. Aguarde algum terminar.")
+
+
+def submit(name: str, job_id, args: tuple = (), user_key=None, priority: int = PRIORITY_NORMAL, persist: bool = True):
+    """
+    Coloca um job registrado na fila da sua classe.
+
+    args precisa ser serializável em JSON para o job sobreviver a um restart
+    (persist=False mantém só em memória). Use ensure_capacity antes de criar
+    o status do job para recusar quando a fila estiver cheia.
+    """
+    _enqueue({
+        "name": name,
+        "job_id": job_id,
+        "args": list(args),
+        "user_key": str(user_key) if user_key not in (None, "") else None,
+        "priority": int(priority),
+        "created_ts": time.time(),
+    }, persist=persist)
+
+
+def _enqueue(job: dict, persist: bool):
+    pool = _pool_for(_registry[job["name"]]["job_class"])
+    job.update({"position": None, "path": job.get("path")})
+
+    if persist and not job["path"]:
+        _persist(job)
+
+    with pool.condition:
+        pool.queue.append((job["priority"], next(_sequence), job))
+        pool.condition.notify_all()
+
+    _ensure_workers(pool)
+    _notify_positions(pool)
+
+
+def queue_position(name: str, job_id) -> Optional[int]:
+    """Posição atual do job na fila deste processo (None se não está esperando)."""
+    entry = _registry.get(name)
+    if not entry:
+        return None
+
+    pool = _pool_for(entry["job_class"])
+
+    with pool.condition:
+        for position, job in enumerate(pool.pending(), start=1):
+            if str(job["job_id"]) == str(job_id):
+                return position
+
+    return None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _acquire_restore_lock() -> bool:
+    """Lock exclusivo (não bloqueante) do restore; True se este processo ficou com ele."""
+    global _restore_lock
+
+    if _restore_lock is not None:
+        return True
+
+    if fcntl is None:
+        return True
+
+    try:
+        os.makedirs(JOB_QUEUE_DIR, exist_ok=True)
+        lock_file = open(os.path.join(JOB_QUEUE_DIR, RESTORE_LOCK_NAME), "a")
+    except OSError as e:
+        print(f"[WARN] Falha ao abrir o lock de restauração da fila: {e}")
+        return False
+
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+
+    _restore_lock = lock_file
+    return True
+
+
+def _interrupt_job(path: str):
+    """Marca como falho o job de um processo que morreu e tira o arquivo da fila."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            job = json.load(f)
+    except Exception as e:
+        print(f"[WARN] Job interrompido ilegível na fila ({path}): {e}")
+        job = {}
+
+    print(f"[WARN] Job interrompido por reinício: {os.path.basename(path)}")
+
+    entry = _registry.get(job.get("name"))
+    on_interrupted = entry["on_interrupted"] if entry else None
+
+    if on_interrupted:
+        try:
+            on_interrupted(*job.get("args", []))
+        except Exception as e:
+            print(f"[WARN] Falha ao marcar job {job.get('name')}:{job.get('job_id')} como interrompido: {e}")
+
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def restore_pending():
+    """
+    Recoloca na fila os jobs gravados que ainda não começaram e marca como
+    falhos (on_interrupted) os que estavam rodando num processo que não existe
+    mais. Só roda no processo que ficar com o lock de restauração, e só pega
+    jobs de processos mortos: os de outro worker vivo seguem na fila dele.
+    """
+    if not _acquire_restore_lock():
+        return
+
+    for path in glob.glob(os.path.join(JOB_QUEUE_DIR, "*.running")):
+        try:
+            pid = int(path.rsplit(".", 2)[-2])
+        except ValueError:
+            continue
+
+        if pid != os.getpid() and not _pid_alive(pid):
+            _interrupt_job(path)
+
+    jobs = []
+
+    for path in glob.glob(os.path.join(JOB_QUEUE_DIR, "*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except Exception as e:
+            print(f"[WARN] Job ilegível na fila ({path}): {e}")
+            continue
+
+        owner = job.get("pid")
+        if owner and owner != os.getpid() and _pid_alive(int(owner)):
+            continue
+
+        if job.get("name") not in _registry:
+            print(f"[WARN] Job sem tipo registrado na fila: {job.get('name')}")
+            continue
+
+        job["path"] = path
+        jobs.append(job)
+
+    for job in sorted(jobs, key=lambda item: item.get("created_ts") or 0):
+        _enqueue(job, persist=False)
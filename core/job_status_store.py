@@ -0,0 +1,191 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+# Status de job em memória com gravação em disco espaçada.
+#
+# O job atualiza o status a cada página do OFS; gravar o JSON inteiro a cada
+# chamada custa serialização, arquivo temporário e os.replace. Aqui a escrita
+# só atualiza a memória, e o arquivo é regravado no máximo a cada
+# JOB_STATUS_FLUSH_MS ou na hora quando o "status" muda (fila -> execução ->
+# concluído/falha). Quem lê neste processo recebe o estado mais recente da
+# memória; outros workers leem o arquivo, atrasado no máximo um intervalo.
+FLUSH_MS = int(os.getenv("JOB_STATUS_FLUSH_MS", "1000"))
+# Depois que o job termina e o arquivo final foi gravado, o estado ainda fica
+# em memória por este tempo (polling final do front) e depois sai.
+RETENTION_SECONDS = int(os.getenv("JOB_STATUS_RETENTION_SECONDS", "300"))
+
+_entries: Dict[str, dict] = {}
+_lock = threading.Lock()
+_flusher_started = False
+
+FINAL_STATUSES = {"completed", "failed", "canceled", "cancelled"}
+
+
+def _snapshot(payload: dict) -> dict:
+    # Cópia de um nível a mais: o job continua mexendo em daily_counts & cia.
+    data = {}
+    for key, value in payload.items():
+        if isinstance(value, dict):
+            value = dict(value)
+        elif isinstance(value, list):
+            value = list(value)
+        data[key] = value
+    return data
+
+
+def _encode(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _write_file(path: str, encoded: str):
+    base_dir = os.path.dirname(path) or "."
+    os.makedirs(base_dir, exist_ok=True)
+
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(encoded)
+
+    last_error = None
+
+    for attempt in range(12):
+        try:
+            os.replace(tmp_path, path)
+            return
+
+        except OSError as e:
+            last_error = e
+            time.sleep(0.15 * (attempt + 1))
+
+    try:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    except Exception:
+        pass
+
+    raise last_error
+
+
+def _flush_entry(path: str, entry: dict):
+    """Grava o estado pendente da entrada (chamar fora do _lock)."""
+    with entry["io_lock"]:
+        with _lock:
+            if not entry["dirty"]:
+                return
+            payload = entry["payload"]
+            entry["dirty"] = False
+
+        try:
+            _write_file(path, _encode(payload))
+        except Exception:
+            with _lock:
+                entry["dirty"] = True
+            raise
+
+        with _lock:
+            entry["flushed_at"] = time.monotonic()
+
+
+def _flush_loop():
+    interval = max(FLUSH_MS, 50) / 1000
+
+    while True:
+        time.sleep(interval)
+        now = time.monotonic()
+
+        with _lock:
+            pending = [
+                (path, entry)
+                for path, entry in _entries.items()
+                if entry["dirty"] and now - entry["flushed_at"] >= interval
+            ]
+            expired = [
+                path
+                for path, entry in _entries.items()
+                if entry["final"] and not entry["dirty"] and now - entry["flushed_at"] > RETENTION_SECONDS
+            ]
+            for path in expired:
+                del _entries[path]
+
+        for path, entry in pending:
+            try:
+                _flush_entry(path, entry)
+            except Exception as e:
+                print(f"[WARN] Falha ao gravar status do job em {path}: {e}")
+
+
+def _ensure_flusher():
+    global _flusher_started
+
+    if _flusher_started:
+        return
+
+    with _lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+
+    threading.Thread(target=_flush_loop, name="job-status-flush", daemon=True).start()
+
+
+def write(path: str, payload: dict) -> dict:
+    """
+    Atualiza o status do job e devolve a cópia guardada.
+
+    Grava o arquivo na hora quando o "status" mudou ou quando já passou o
+    intervalo desde a última gravação; senão fica para o flush periódico.
+    Erro de gravação imediata é propagado, como antes.
+    """
+    data = _snapshot(payload)
+    status = str(data.get("status") or "").strip().lower()
+    now = time.monotonic()
+
+    with _lock:
+        entry = _entries.get(path)
+        if entry is None:
+            entry = {
+                "payload": data,
+                "status": None,
+                "dirty": True,
+                "final": False,
+                "flushed_at": 0.0,
+                "io_lock": threading.Lock(),
+            }
+            _entries[path] = entry
+
+        due = (
+            status != entry["status"]
+            or now - entry["flushed_at"] >= FLUSH_MS / 1000
+        )
+
+        entry.update({
+            "payload": data,
+            "status": status,
+            "dirty": True,
+            "final": status in FINAL_STATUSES,
+        })
+
+    _ensure_flusher()
+
+    if due:
+        _flush_entry(path, entry)
+
+    return data
+
+
+def read(path: str) -> Optional[dict]:
+    """Estado em memória deste processo (cópia) ou None se o job não passou por aqui."""
+    with _lock:
+        entry = _entries.get(path)
+        return _snapshot(entry["payload"]) if entry else None
+
+
+def discard(path: str):
+    with _lock:
+        entry = _entries.pop(path, None)
+        if entry:
+            entry["dirty"] = False
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+# Cache em memória dos mapas de consulta (nomes de recurso, tipos de
+# atividade, motivos de fechamento...) que os jobs montavam a cada execução
+# com um SELECT na tabela inteira.
+#
+# Cada mapa pertence a um grupo ("grupo.nome"). invalidate(grupo) é chamado
+# por quem grava a tabela (sincronizações) e carimba uma nova versão do
+# grupo num arquivo em LOOKUP_CACHE_DIR, então os outros workers do gunicorn
+# também recarregam na próxima leitura. Sem sincronização, o mapa vence
+# depois de LOOKUP_CACHE_TTL_SECONDS.
+#
+# O valor devolvido é compartilhado entre os jobs: não altere o dict.
+TTL_SECONDS = int(os.getenv("LOOKUP_CACHE_TTL_SECONDS", "900"))
+LOOKUP_CACHE_DIR = os.getenv("LOOKUP_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "instance",
+    "lookup_cache",
+)
+
+_loaders: Dict[str, Callable] = {}
+_entries: Dict[str, dict] = {}
+_load_locks: Dict[str, threading.Lock] = {}
+_lock = threading.Lock()
+
+
+def _group(name: str) -> str:
+    return name.split(".", 1)[0]
+
+
+def _stamp_path(group: str) -> str:
+    return os.path.join(LOOKUP_CACHE_DIR, f"{group}.version")
+
+
+def _group_version(group: str) -> int:
+    try:
+        return os.stat(_stamp_path(group)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def register(name: str, loader: Callable):
+    """Registra o carregador de um mapa ("grupo.nome")."""
+    with _lock:
+        _loaders[name] = loader
+        _load_locks.setdefault(name, threading.Lock())
+
+
+def get(name: str):
+    """
+    Devolve o mapa em cache, recarregando se venceu ou se o grupo foi
+    invalidado. Jobs simultâneos esperam a mesma carga em vez de cada um
+    fazer a sua.
+    """
+    version = _group_version(_group(name))
+
+    entry = _entries.get(name)
+    if entry and entry["version"] == version and time.monotonic() < entry["expires_at"]:
+        return entry["value"]
+
+    with _load_locks[name]:
+        entry = _entries.get(name)
+        if entry and entry["version"] == version and time.monotonic() < entry["expires_at"]:
+            return entry["value"]
+
+        value = _loaders[name]()
+
+        _entries[name] = {
+            "value": value,
+            "version": version,
+            "expires_at": time.monotonic() + TTL_SECONDS,
+        }
+        return value
+
+
+def invalidate(*groups: str):
+    """Marca os grupos como alterados neste e nos demais processos."""
+    for group in groups:
+        with _lock:
+            for name in list(_entries):
+                if _group(name) == group:
+                    del _entries[name]
+
+        try:
+            os.makedirs(LOOKUP_CACHE_DIR, exist_ok=True)
+            with open(_stamp_path(group), "w", encoding="utf-8") as f:
+                f.write(str(time.time_ns()))
+        except OSError as e:
+            print(f"[WARN] Falha ao carimbar versão do cache {group}: {e}")
+
+
+def _warm_up():
+    for name in list(_loaders):
+        try:
+            get(name)
+        except Exception as e:
+            print(f"[WARN] Falha ao pré-carregar cache {name}: {e}")
+
+
+def start_warm_up():
+    """Carrega todos os mapas registrados em segundo plano (boot do worker)."""
+    threading.Thread(target=_warm_up, name="lookup-cache-warm-up", daemon=True).start()
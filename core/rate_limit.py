@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# Limites por upstream. Cada um pode ser ajustado por env:
+# RATE_LIMIT_<NOME>_RATE / _MIN_RATE / _MAX_RATE (requisições por segundo).
+UPSTREAM_DEFAULTS = {
+    "ofs_core": {"rate": 10.0, "min_rate": 1.0, "max_rate": 50.0},
+    "ofs_metadata": {"rate": 5.0, "min_rate": 0.5, "max_rate": 20.0},
+    "oic": {"rate": 1.0, "min_rate": 0.2, "max_rate": 5.0},
+}
+
+# AIMD: sobe um pouco a cada resposta boa, corta pela metade ao ver 429/503
+# ou um pico de latência (resposta N vezes mais lenta que a média recente).
+INCREASE_STEP = float(os.getenv("RATE_LIMIT_INCREASE_STEP", "0.1"))
+DECREASE_FACTOR = float(os.getenv("RATE_LIMIT_DECREASE_FACTOR", "0.5"))
+DECREASE_COOLDOWN_SECONDS = float(os.getenv("RATE_LIMIT_DECREASE_COOLDOWN", "1.0"))
+LATENCY_SPIKE_FACTOR = float(os.getenv("RATE_LIMIT_LATENCY_SPIKE_FACTOR", "3.0"))
+LATENCY_MIN_SAMPLES = 10
+MAX_RETRY_AFTER_SECONDS = 60.0
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+_limiters: Dict[str, "AdaptiveRateLimiter"] = {}
+_limiters_lock = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_retry_after(value) -> Optional[float]:
+    try:
+        seconds = float(str(value or "").strip())
+    except ValueError:
+        return None
+
+    if seconds <= 0:
+        return None
+
+    return min(seconds, MAX_RETRY_AFTER_SECONDS)
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket compartilhado pelo processo, com taxa ajustada por AIMD.
+
+    acquire() bloqueia até haver um token; record() informa o resultado da
+    chamada para a taxa subir (sucesso) ou cair (429/503/latência alta).
+    """
+
+    def __init__(self, name: str, rate: float, min_rate: float, max_rate: float):
+        self.name = name
+        self.min_rate = max(0.01, min_rate)
+        self.max_rate = max(self.min_rate, max_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._latency_avg = None
+        self._latency_samples = 0
+
+        self.waiting = 0
+        self.total_requests = 0
+        self.total_throttled = 0
+        self.total_wait_seconds = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        # Burst máximo de ~1s de tráfego na taxa atual.
+        self._tokens = min(max(self.rate, 1.0), self._tokens + elapsed * self.rate)
+
+    def acquire(self) -> float:
+        """Espera um token e retorna quantos segundos ficou esperando."""
+        started = time.monotonic()
+
+        with self._lock:
+            self.waiting += 1
+
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._refill(now)
+
+                    if now >= self._paused_until and self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        self.total_requests += 1
+                        waited = now - started
+                        self.total_wait_seconds += waited
+                        return waited
+
+                    if now < self._paused_until:
+                        wait = self._paused_until - now
+                    else:
+                        wait = (1.0 - self._tokens) / self.rate
+
+                time.sleep(min(max(wait, 0.01), 0.5))
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def _decrease(self, now: float):
+        if now - self._last_decrease < DECREASE_COOLDOWN_SECONDS:
+            return
+
+        self._last_decrease = now
+        self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+        self._tokens = min(self._tokens, 1.0)
+
+    def record(self, status_code: Optional[int] = None, latency: Optional[float] = None, retry_after=None):
+        """Ajusta a taxa a partir do status HTTP e da latência da chamada."""
+        with self._lock:
+            now = time.monotonic()
+
+            if status_code in THROTTLE_STATUS_CODES:
+                self.total_throttled += 1
+                self._decrease(now)
+
+                pause = _parse_retry_after(retry_after)
+                if pause:
+                    self._paused_until = max(self._paused_until, now + pause)
+                return
+
+            spike = False
+
+            if latency is not None:
+                if self._latency_avg is not None and self._latency_samples >= LATENCY_MIN_SAMPLES:
+                    spike = latency > self._latency_avg * LATENCY_SPIKE_FACTOR
+
+                if self._latency_avg is None:
+                    self._latency_avg = latency
+                else:
+                    self._latency_avg = (self._latency_avg * 0.9) + (latency * 0.1)
+                self._latency_samples += 1
+
+            if spike:
+                self._decrease(now)
+            elif status_code is not None and status_code < 500:
+                self.rate = min(self.max_rate, self.rate + INCREASE_STEP)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "rate": round(self.rate, 3),
+                "min_rate": self.min_rate,
+                "max_rate": self.max_rate,
+                "queue_depth": self.waiting,
+                "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+                "latency_avg": round(self._latency_avg, 3) if self._latency_avg is not None else None,
+                "total_requests": self.total_requests,
+                "total_throttled": self.total_throttled,
+                "total_wait_seconds": round(self.total_wait_seconds, 3),
+            }
+
+
+def get_rate_limiter(name: str) -> Optional[AdaptiveRateLimiter]:
+    """Retorna o limitador do upstream (ofs_core, ofs_metadata, oic) ou None se desligado."""
+    if not RATE_LIMIT_ENABLED or not name:
+        return None
+
+    limiter = _limiters.get(name)
+    if limiter is not None:
+        return limiter
+
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+
+        if limiter is None:
+            defaults = UPSTREAM_DEFAULTS.get(name, UPSTREAM_DEFAULTS["ofs_core"])
+            prefix = f"RATE_LIMIT_{name.upper()}"
+            limiter = AdaptiveRateLimiter(
+                name,
+                rate=_env_float(f"{prefix}_RATE", defaults["rate"]),
+                min_rate=_env_float(f"{prefix}_MIN_RATE", defaults["min_rate"]),
+                max_rate=_env_float(f"{prefix}_MAX_RATE", defaults["max_rate"]),
+            )
+            _limiters[name] = limiter
+
+    return limiter
+
+
+def upstream_for_url(url: str) -> Optional[str]:
+    """Identifica o upstream OFS pela URL da chamada."""
+    url = str(url or "")
+
+    if "/ofscMetadata/" in url:
+        return "ofs_metadata"
+
+    if "/ofscCore/" in url:
+        return "ofs_core"
+
+    return None
+
+
+def rate_limiter_stats() -> List[dict]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+
+    return [limiter.stats() for limiter in limiters]
+
+
+def call_with_rate_limit(name: str, func, *args, **kwargs):
+    """
+    Executa func(*args, **kwargs) respeitando o limitador do upstream.
+
+    func deve retornar um requests.Response; status, latência e Retry-After
+    alimentam o ajuste da taxa.
+    """
+    limiter = get_rate_limiter(name)
+
+    if limiter is None:
+        return func(*args, **kwargs)
+
+    limiter.acquire()
+    started = time.monotonic()
+    response = func(*args, **kwargs)
+
+    limiter.record(
+        getattr(response, "status_code", None),
+        latency=time.monotonic() - started,
+        retry_after=getattr(response, "headers", {}).get("Retry-After"),
+    )
+
+    return response
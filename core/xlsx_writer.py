@@ -0,0 +1,102 @@
+import os
+from typing import List
+
+import xlsxwriter
+
+# Mesma regra de xlsx_auto_width (maior texto + 2, até 60), mas estimada a
+# partir das primeiras linhas em vez de reler a planilha inteira.
+WIDTH_SAMPLE_ROWS = int(os.getenv("XLSX_WIDTH_SAMPLE_ROWS", "1000"))
+MAX_COLUMN_WIDTH = 60
+
+HEADER_FORMAT = {
+    "bold": True,
+    "font_color": "#FFFFFF",
+    "bg_color": "#1F4E78",
+    "align": "center",
+    "valign": "vcenter",
+    "border": 1,
+    "border_color": "#D9E2F3",
+}
+
+BODY_FORMAT = {
+    "valign": "top",
+    "border": 1,
+    "border_color": "#D9E2F3",
+}
+
+
+class StreamingXlsxWriter:
+    """
+    Planilha de relatório gravada linha a linha (xlsxwriter constant_memory).
+
+    Cada linha vai para disco ao ser escrita, então a memória não cresce com
+    o número de linhas. Cabeçalho e corpo usam um formato compartilhado cada
+    (o visual é o mesmo dos relatórios em openpyxl: cabeçalho azul, bordas
+    finas, primeira linha congelada). Usar como context manager: se sair com
+    exceção, o arquivo parcial é removido.
+    """
+
+    def __init__(self, output_path: str, sheet_name: str, headers: List[str]):
+        self.output_path = output_path
+        self.rows_written = 0
+
+        self._workbook = xlsxwriter.Workbook(output_path, {
+            "constant_memory": True,
+            # Texto do OFS vai como texto: sem virar link ou fórmula.
+            "strings_to_urls": False,
+            "strings_to_formulas": False,
+        })
+        self._sheet = self._workbook.add_worksheet(sheet_name[:31])
+        self._header_format = self._workbook.add_format(HEADER_FORMAT)
+        self._body_format = self._workbook.add_format(BODY_FORMAT)
+        self._widths = [len(str(header)) for header in headers]
+        self._closed = False
+
+        self._sheet.write_row(0, 0, headers, self._header_format)
+        self._sheet.freeze_panes(1, 0)
+
+    def write_row(self, values: list):
+        self.rows_written += 1
+
+        if self.rows_written <= WIDTH_SAMPLE_ROWS:
+            widths = self._widths
+            for index, value in enumerate(values):
+                size = 0 if value is None else len(str(value))
+                if size > widths[index]:
+                    widths[index] = size
+
+        self._sheet.write_row(self.rows_written, 0, values, self._body_format)
+
+    def close(self):
+        if self._closed:
+            return
+
+        self._closed = True
+
+        for index, width in enumerate(self._widths):
+            self._sheet.set_column(index, index, min(width + 2, MAX_COLUMN_WIDTH))
+
+        self._workbook.close()
+
+    def discard(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+        try:
+            if os.path.exists(self.output_path):
+                os.remove(self.output_path)
+        except OSError as e:
+            print(f"[WARN] Falha ao remover XLSX parcial {self.output_path}: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.discard()
+            return False
+
+        self.close()
+        return False
@@ -1,6 +1,138 @@
+import atexit
 import json
-from datetime import datetime
+import os
+import queue
+import threading
+import time
 from database.connection import get_connection
+from database.bulk import bulk_insert
+
+# Gravação assíncrona: audit_log só enfileira; uma thread grava em lote.
+AUDIT_ASYNC = os.getenv("AUDIT_ASYNC", "true").lower() not in ("0", "false", "no")
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_FLUSH_EVENTS = int(os.getenv("AUDIT_FLUSH_EVENTS", "100"))
+AUDIT_FLUSH_MS = int(os.getenv("AUDIT_FLUSH_MS", "500"))
+AUDIT_SHUTDOWN_TIMEOUT = float(os.getenv("AUDIT_SHUTDOWN_TIMEOUT", "10"))
+
+AUDIT_COLUMNS = (
+    "actor_user_id",
+    "actor_username",
+    "module",
+    "action",
+    "entity_type",
+    "entity_id",
+    "entity_ref",
+    "summary",
+    "before_json",
+    "after_json",
+    "meta_json",
+    "api_response",
+)
+
+_queue = queue.Queue(maxsize=max(1, AUDIT_QUEUE_SIZE))
+_writer = None
+_writer_lock = threading.Lock()
+_stop = threading.Event()
+
+
+def _write_rows(rows):
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        bulk_insert(cur, "audit_log", AUDIT_COLUMNS, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _flush(rows):
+    try:
+        _write_rows(rows)
+    except Exception as e:
+        # Um evento ruim não pode derrubar o lote inteiro: regrava um a um.
+        print(f"[WARN] Falha ao gravar lote de auditoria ({len(rows)} eventos): {e}")
+
+        for row in rows:
+            try:
+                _write_rows([row])
+            except Exception as row_error:
+                print(f"[WARN] Evento de auditoria descartado: {row_error} | {row[2]}.{row[3]}")
+
+
+def _writer_loop():
+    flush_interval = max(AUDIT_FLUSH_MS, 1) / 1000.0
+
+    while True:
+        try:
+            first = _queue.get(timeout=flush_interval)
+        except queue.Empty:
+            if _stop.is_set():
+                return
+            continue
+
+        rows = [first]
+        deadline = time.monotonic() + flush_interval
+
+        while len(rows) < AUDIT_FLUSH_EVENTS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                rows.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        _flush(rows)
+
+        for _ in rows:
+            _queue.task_done()
+
+
+def _ensure_writer():
+    global _writer
+
+    if _writer is not None and _writer.is_alive():
+        return
+
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(
+                target=_writer_loop,
+                name="audit-log-writer",
+                daemon=True,
+            )
+            _writer.start()
+
+
+def flush_audit_log(timeout: float = AUDIT_SHUTDOWN_TIMEOUT):
+    """
+    Grava o que ainda está na fila e encerra a thread de escrita.
+
+    Registrado no atexit; o que não couber no timeout é gravado direto.
+    """
+    _stop.set()
+
+    if _writer is not None:
+        _writer.join(timeout)
+
+    leftovers = []
+    while True:
+        try:
+            leftovers.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+
+    if leftovers:
+        _flush(leftovers)
+
+
+atexit.register(flush_audit_log)
+
 
 def audit_log(
     actor_user_id=None,
@@ -18,6 +150,11 @@ def audit_log(
 ):
     """
     before/after/meta podem ser dict/list/str. Serão serializados como JSON.
+
+    O evento é enfileirado e gravado em lote por uma thread de fundo. created_at
+    continua vindo do default do banco (mesmo relógio e fuso de sempre), na
+    gravação do lote: até AUDIT_FLUSH_MS depois da chamada. Com a fila cheia,
+    ou AUDIT_ASYNC desligado, grava na hora como antes.
     """
     def _to_json(x):
         if x is None:
@@ -26,30 +163,28 @@ def audit_log(
             return json.dumps(x, ensure_ascii=False)
         return str(x)
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO audit_log
-        (actor_user_id, actor_username, module, action, entity_type, entity_id, entity_ref,
-         summary, before_json, after_json, meta_json, api_response)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """,
-        (
-            actor_user_id,
-            actor_username,
-            module,
-            action,
-            entity_type,
-            str(entity_id) if entity_id is not None else None,
-            str(entity_ref) if entity_ref is not None else None,
-            summary,
-            _to_json(before),
-            _to_json(after),
-            _to_json(meta),
-            json.dumps(api_response, ensure_ascii=False) if api_response else None,
-        ),
+    row = (
+        actor_user_id,
+        actor_username,
+        module,
+        action,
+        entity_type,
+        str(entity_id) if entity_id is not None else None,
+        str(entity_ref) if entity_ref is not None else None,
+        summary,
+        _to_json(before),
+        _to_json(after),
+        _to_json(meta),
+        json.dumps(api_response, ensure_ascii=False) if api_response else None,
     )
-    conn.commit()
-    cur.close()
-    conn.close()
+
+    if AUDIT_ASYNC and not _stop.is_set():
+        _ensure_writer()
+
+        try:
+            _queue.put_nowait(row)
+            return
+        except queue.Full:
+            pass
+
+    _write_rows([row])
@@ -0,0 +1,214 @@
+import os
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Linhas por comando INSERT multi-VALUES. Chunks maiores economizam ida e
+# volta ao banco, mas precisam caber no max_allowed_packet do MySQL.
+DEFAULT_CHUNK_SIZE = int(os.getenv("DB_BULK_CHUNK_SIZE", "500"))
+
+
+def chunked(rows: Iterable, size: int) -> Iterator[list]:
+    """Quebra qualquer iterável em listas de até `size` itens."""
+    size = max(1, int(size or DEFAULT_CHUNK_SIZE))
+    iterator = iter(rows)
+
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _quote(identifier: str) -> str:
+    return f"`{identifier}`"
+
+
+def _insert_prefix(table: str, columns: Sequence[str], extra_values: Dict[str, str], ignore: bool) -> str:
+    all_columns = list(columns) + list(extra_values)
+    keyword = "INSERT IGNORE INTO" if ignore else "INSERT INTO"
+    return f"{keyword} {_quote(table)} ({', '.join(_quote(c) for c in all_columns)}) VALUES "
+
+
+def _row_placeholder(columns: Sequence[str], extra_values: Dict[str, str]) -> str:
+    parts = ["%s"] * len(columns) + list(extra_values.values())
+    return "(" + ", ".join(parts) + ")"
+
+
+def _flatten(chunk: List[Sequence]) -> list:
+    params = []
+    for row in chunk:
+        params.extend(row)
+    return params
+
+
+def _count_existing(cur, table: str, columns: Sequence[str], key_columns: Sequence[str], chunk: List[Sequence]) -> int:
+    """Quantas chaves distintas do chunk já existem na tabela."""
+    key_indexes = [list(columns).index(c) for c in key_columns]
+    keys = {tuple(row[i] for i in key_indexes) for row in chunk}
+
+    if len(key_columns) == 1:
+        placeholders = ", ".join(["%s"] * len(keys))
+        where = f"{_quote(key_columns[0])} IN ({placeholders})"
+        params = [key[0] for key in keys]
+    else:
+        tuple_placeholder = "(" + ", ".join(["%s"] * len(key_columns)) + ")"
+        placeholders = ", ".join([tuple_placeholder] * len(keys))
+        where = f"({', '.join(_quote(c) for c in key_columns)}) IN ({placeholders})"
+        params = [value for key in keys for value in key]
+
+    cur.execute(f"SELECT COUNT(*) FROM {_quote(table)} WHERE {where}", params)
+    row = cur.fetchone()
+    return int(row[0] or 0) if row else 0
+
+
+def _bulk_insert(cur, table, columns, rows, chunk_size, extra_values, ignore) -> Tuple[int, int]:
+    extra_values = extra_values or {}
+    prefix = _insert_prefix(table, columns, extra_values, ignore=ignore)
+    placeholder = _row_placeholder(columns, extra_values)
+
+    total = 0
+    inserted = 0
+
+    for chunk in chunked(rows, chunk_size or DEFAULT_CHUNK_SIZE):
+        cur.execute(prefix + ", ".join([placeholder] * len(chunk)), _flatten(chunk))
+        total += len(chunk)
+        inserted += max(0, cur.rowcount)
+
+    return total, inserted
+
+
+def bulk_insert(
+    cur,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+    chunk_size: Optional[int] = None,
+    extra_values: Optional[Dict[str, str]] = None,
+) -> int:
+    """INSERT simples em lotes multi-VALUES. Retorna linhas inseridas. Não faz commit."""
+    _, inserted = _bulk_insert(cur, table, columns, rows, chunk_size, extra_values, ignore=False)
+    return inserted
+
+
+def bulk_insert_ignore(
+    cur,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+    chunk_size: Optional[int] = None,
+    extra_values: Optional[Dict[str, str]] = None,
+) -> dict:
+    """
+    INSERT IGNORE em lotes multi-VALUES.
+
+    Retorna {"rows", "inserted", "ignored"}; ignoradas são as linhas que
+    bateram em chave única já existente. Não faz commit.
+    """
+    total, inserted = _bulk_insert(cur, table, columns, rows, chunk_size, extra_values, ignore=True)
+
+    return {
+        "rows": total,
+        "inserted": inserted,
+        "ignored": total - inserted,
+    }
+
+
+def bulk_upsert(
+    cur,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+    key_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    chunk_size: Optional[int] = None,
+    extra_values: Optional[Dict[str, str]] = None,
+) -> dict:
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE em lotes multi-VALUES.
+
+    key_columns: colunas da chave única (usadas só para contar as linhas
+    que já existiam). update_columns: padrão é tudo que não é chave.
+    extra_values: colunas com expressão SQL fixa, ex. {"last_seen_at": "NOW()"}.
+
+    Retorna {"rows", "inserted", "updated", "unchanged"}. O MySQL informa
+    affected = inseridas + 2 * atualizadas (conexão sem CLIENT_FOUND_ROWS,
+    padrão do conector); com a contagem de chaves já existentes no chunk
+    dá para separar os dois números. Não faz commit.
+    """
+    extra_values = extra_values or {}
+
+    if update_columns is None:
+        update_columns = [c for c in columns if c not in key_columns] + list(extra_values)
+
+    prefix = _insert_prefix(table, columns, extra_values, ignore=False)
+    placeholder = _row_placeholder(columns, extra_values)
+    update_clause = " ON DUPLICATE KEY UPDATE " + ", ".join(
+        f"{_quote(c)} = VALUES({_quote(c)})" for c in update_columns
+    )
+
+    total = 0
+    inserted = 0
+    updated = 0
+
+    for chunk in chunked(rows, chunk_size or DEFAULT_CHUNK_SIZE):
+        existing = _count_existing(cur, table, columns, key_columns, chunk)
+
+        key_indexes = [list(columns).index(c) for c in key_columns]
+        new_keys = len({tuple(row[i] for i in key_indexes) for row in chunk}) - existing
+
+        cur.execute(prefix + ", ".join([placeholder] * len(chunk)) + update_clause, _flatten(chunk))
+
+        affected = max(0, cur.rowcount)
+        chunk_updated = max(0, (affected - new_keys) // 2)
+
+        total += len(chunk)
+        inserted += new_keys
+        updated += chunk_updated
+
+    return {
+        "rows": total,
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": total - inserted - updated,
+    }
+
+
+def bulk_update(
+    cur,
+    table: str,
+    key_column: str,
+    set_columns: Sequence[str],
+    rows: Iterable[Sequence],
+    chunk_size: Optional[int] = None,
+) -> int:
+    """
+    UPDATE de várias linhas por chave num único comando por lote (CASE ... WHEN).
+
+    Cada linha é (chave, valor_coluna_1, valor_coluna_2, ...). Retorna o
+    total de linhas alteradas. Não faz commit.
+    """
+    changed = 0
+
+    for chunk in chunked(rows, chunk_size or DEFAULT_CHUNK_SIZE):
+        assignments = []
+        params = []
+
+        for offset, column in enumerate(set_columns, start=1):
+            whens = " ".join(["WHEN %s THEN %s"] * len(chunk))
+            assignments.append(
+                f"{_quote(column)} = CASE {_quote(key_column)} {whens} ELSE {_quote(column)} END"
+            )
+            for row in chunk:
+                params.extend((row[0], row[offset]))
+
+        keys = [row[0] for row in chunk]
+        params.extend(keys)
+
+        cur.execute(
+            f"UPDATE {_quote(table)} SET {', '.join(assignments)} "
+            f"WHERE {_quote(key_column)} IN ({', '.join(['%s'] * len(keys))})",
+            params,
+        )
+        changed += max(0, cur.rowcount)
+
+    return changed
@@ -0,0 +1,199 @@
+import base64
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional, Sequence, Tuple
+
+# Totais de listagem são reaproveitados por alguns segundos: navegar entre
+# páginas com o mesmo filtro não repete o COUNT(*).
+COUNT_CACHE_TTL_SECONDS = int(os.getenv("PAGINATION_COUNT_TTL_SECONDS", "60"))
+
+_count_cache = {}
+_count_cache_lock = threading.Lock()
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["n", str(value)]
+    return ["v", value]
+
+
+def _decode_value(item):
+    kind, value = item
+    if kind == "dt":
+        return datetime.fromisoformat(value)
+    if kind == "d":
+        return date.fromisoformat(value)
+    if kind == "n":
+        return Decimal(value)
+    return value
+
+
+def encode_cursor(direction: str, values: Sequence, page: int) -> str:
+    """Token opaco com a chave da borda da página, a direção e o número da página."""
+    payload = {
+        "d": direction,
+        "k": [_encode_value(v) for v in values],
+        "p": page,
+    }
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[dict]:
+    """Retorna {"direction", "values", "page"} ou None para token ausente/inválido."""
+    token = str(token or "").strip()
+    if not token:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+
+        direction = payload["d"]
+        if direction not in ("next", "prev"):
+            return None
+
+        return {
+            "direction": direction,
+            "values": [_decode_value(item) for item in payload["k"]],
+            "page": max(1, int(payload.get("p") or 1)),
+        }
+    except Exception:
+        return None
+
+
+def fetch_keyset_page(
+    cur,
+    select_sql: str,
+    where_sql: str,
+    params: Sequence,
+    order_columns: Sequence[Tuple[str, str]],
+    per_page: int,
+    cursor_token: Optional[str] = None,
+) -> dict:
+    """
+    Busca uma página por keyset (seek) em vez de OFFSET.
+
+    order_columns: [(expressão SQL, chave na linha retornada), ...], todas em
+    ordem decrescente; a última precisa ser única (ex.: id) para desempatar.
+    O custo é o mesmo na página 1 ou na 500, desde que exista índice composto
+    nessas colunas.
+
+    Retorna {"items", "page", "has_prev", "has_next", "prev_cursor", "next_cursor"}.
+    """
+    cursor = decode_cursor(cursor_token)
+    if cursor and len(cursor["values"]) != len(order_columns):
+        cursor = None
+
+    direction = cursor["direction"] if cursor else "next"
+    page = cursor["page"] if cursor else 1
+
+    columns_sql = ", ".join(expr for expr, _ in order_columns)
+    where = [f"({where_sql})"]
+    query_params = list(params)
+
+    if cursor:
+        placeholders = ", ".join(["%s"] * len(order_columns))
+        operator = "<" if direction == "next" else ">"
+        where.append(f"({columns_sql}) {operator} ({placeholders})")
+        query_params.extend(cursor["values"])
+
+    order = "DESC" if direction == "next" else "ASC"
+    order_sql = ", ".join(f"{expr} {order}" for expr, _ in order_columns)
+
+    cur.execute(
+        f"""
+        {select_sql}
+        WHERE {' AND '.join(where)}
+        ORDER BY {order_sql}
+        LIMIT %s
+        """,
+        tuple(query_params + [per_page + 1]),
+    )
+    rows = cur.fetchall() or []
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if direction == "prev":
+        rows.reverse()
+        has_prev = has_more
+        has_next = True
+    else:
+        has_prev = cursor is not None
+        has_next = has_more
+
+    def key_of(row):
+        return [row.get(key) for _, key in order_columns]
+
+    prev_cursor = None
+    next_cursor = None
+
+    if rows and has_prev and page > 1:
+        prev_cursor = encode_cursor("prev", key_of(rows[0]), page - 1)
+
+    if rows and has_next:
+        next_cursor = encode_cursor("next", key_of(rows[-1]), page + 1)
+
+    return {
+        "items": rows,
+        "page": page,
+        "has_prev": prev_cursor is not None,
+        "has_next": next_cursor is not None,
+        "prev_cursor": prev_cursor,
+        "next_cursor": next_cursor,
+    }
+
+
+def cached_count(cur, count_sql: str, params: Sequence = (), ttl_seconds: int = COUNT_CACHE_TTL_SECONDS) -> int:
+    """COUNT(*) com cache em memória por (SQL, parâmetros) durante ttl_seconds."""
+    key = (count_sql, tuple(str(p) for p in params))
+    now = time.monotonic()
+
+    with _count_cache_lock:
+        cached = _count_cache.get(key)
+        if cached and now - cached[1] < ttl_seconds:
+            return cached[0]
+
+    cur.execute(count_sql, tuple(params))
+    row = cur.fetchone()
+
+    if isinstance(row, dict):
+        total = int(next(iter(row.values()), 0) or 0)
+    else:
+        total = int(row[0] or 0) if row else 0
+
+    with _count_cache_lock:
+        if len(_count_cache) > 500:
+            _count_cache.clear()
+        _count_cache[key] = (total, now)
+
+    return total
+
+
+def approximate_table_rows(cur, table: str) -> int:
+    """Estimativa de linhas da tabela pelas estatísticas do InnoDB (sem varrer a tabela)."""
+    cur.execute(
+        """
+        SELECT TABLE_ROWS AS total
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = %s
+        """,
+        (table,),
+    )
+    row = cur.fetchone()
+
+    if isinstance(row, dict):
+        return int(row.get("total") or 0)
+
+    return int(row[0] or 0) if row else 0
+
@@ -0,0 +1,95 @@
+from typing import List
+
+# Ajustes de schema feitos pelo próprio código (sem migrations), verificados
+# uma vez por processo.
+_ensured = set()
+
+
+def _exists(cur, sql: str, params) -> bool:
+    cur.execute(sql, params)
+    row = cur.fetchone()
+
+    if not row:
+        return False
+
+    value = row.get("total") if isinstance(row, dict) else row[0]
+    return bool(value)
+
+
+def ensure_table(cur, table: str, create_sql: str):
+    """
+    Roda o CREATE TABLE IF NOT EXISTS uma vez por processo. Erros sobem: ao
+    contrário de colunas e índices opcionais, sem a tabela o chamador não
+    funciona.
+    """
+    key = ("table", table)
+    if key in _ensured:
+        return
+
+    cur.execute(create_sql)
+    _ensured.add(key)
+
+
+def ensure_column(cur, table: str, column: str, definition: str, after: str = None) -> bool:
+    """
+    Adiciona a coluna se ainda não existir. Retorna True quando a coluna foi criada agora.
+
+    definition: tipo e restrições, ex. "VARCHAR(20) NOT NULL DEFAULT '-'".
+    """
+    key = ("column", table, column)
+    if key in _ensured:
+        return False
+
+    created = False
+
+    try:
+        exists = _exists(
+            cur,
+            """
+            SELECT COUNT(*) AS total
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = %s
+              AND COLUMN_NAME = %s
+            """,
+            (table, column),
+        )
+
+        if not exists:
+            position = f" AFTER `{after}`" if after else ""
+            cur.execute(f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}{position}")
+            created = True
+
+        _ensured.add(key)
+    except Exception as e:
+        print(f"[WARN] Não foi possível garantir a coluna {column} em {table}: {e}")
+
+    return created
+
+
+def ensure_index(cur, table: str, index_name: str, columns: List[str]):
+    """Cria o índice composto se ainda não existir."""
+    key = ("index", table, index_name)
+    if key in _ensured:
+        return
+
+    try:
+        exists = _exists(
+            cur,
+            """
+            SELECT COUNT(*) AS total
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = %s
+              AND INDEX_NAME = %s
+            """,
+            (table, index_name),
+        )
+
+        if not exists:
+            cols = ", ".join(f"`{c}`" for c in columns)
+            cur.execute(f"CREATE INDEX `{index_name}` ON `{table}` ({cols})")
+
+        _ensured.add(key)
+    except Exception as e:
+        print(f"[WARN] Não foi possível garantir o índice {index_name} em {table}: {e}")
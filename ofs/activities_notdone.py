@@ -1,9 +1,10 @@
 import os
 import json
 import datetime as dt
-import requests
 from flask import Blueprint, render_template, request, current_app
 
+from ofs.client import get_http_session
+
 bp_activities_notdone = Blueprint("activities_notdone", __name__)
 
 FIELDS = [
@@ -40,7 +41,7 @@ def _ofs_get(path: str, params: dict):
     auth = _ofs_auth()
 
     # Importante: timeout curto pra não travar request do Flask
-    resp = requests.get(url, params=params, auth=auth, timeout=30)
+    resp = get_http_session().get(url, params=params, auth=auth, timeout=30)
     if resp.status_code >= 400:
         current_app.logger.error("OFS GET ERROR %s - %s", resp.status_code, resp.text)
         resp.raise_for_status()
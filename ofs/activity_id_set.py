@@ -0,0 +1,70 @@
+# ofs/activity_id_set.py
+from array import array
+from bisect import bisect_left
+
+# activityId do OFS é um inteiro sequencial: guardar como str num set custa
+# ~100 bytes por atividade. Aqui os ids numéricos ficam em blocos de 65536
+# valores (mesma ideia de um "roaring bitmap"): bloco com poucos ids é uma
+# lista ordenada de uint16 (2 bytes por id) e vira bitmap de 8 KB quando
+# passa de SPARSE_LIMIT ids. Ids não numéricos caem num set comum.
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+BITMAP_BYTES = (1 << CHUNK_BITS) // 8
+SPARSE_LIMIT = BITMAP_BYTES // 2
+
+
+class ActivityIdSet:
+    """Conjunto compacto de activityId para deduplicar páginas do OFS."""
+
+    def __init__(self):
+        self._chunks = {}
+        self._others = set()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, activity_id) -> bool:
+        """Adiciona o id; devolve False se ele já estava no conjunto."""
+        text = str(activity_id).strip()
+
+        if text.isdigit() and len(text) < 19 and not (len(text) > 1 and text[0] == "0"):
+            if not self._add_int(int(text)):
+                return False
+        else:
+            if text in self._others:
+                return False
+            self._others.add(text)
+
+        self._count += 1
+        return True
+
+    def _add_int(self, value: int) -> bool:
+        key = value >> CHUNK_BITS
+        low = value & CHUNK_MASK
+        chunk = self._chunks.get(key)
+
+        if chunk is None:
+            self._chunks[key] = array("H", [low])
+            return True
+
+        if isinstance(chunk, bytearray):
+            byte, bit = low >> 3, 1 << (low & 7)
+            if chunk[byte] & bit:
+                return False
+            chunk[byte] |= bit
+            return True
+
+        index = bisect_left(chunk, low)
+        if index < len(chunk) and chunk[index] == low:
+            return False
+
+        chunk.insert(index, low)
+
+        if len(chunk) > SPARSE_LIMIT:
+            bitmap = bytearray(BITMAP_BYTES)
+            for item in chunk:
+                bitmap[item >> 3] |= 1 << (item & 7)
+            self._chunks[key] = bitmap
+
+        return True
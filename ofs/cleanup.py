@@ -9,6 +9,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Iterable, List, Tuple
 from dotenv import load_dotenv
 
+from ofs.client import new_http_session
+
 load_dotenv()
 
 
@@ -23,6 +25,8 @@ PASSWORD = os.getenv("OFS_PASSWORD", "XXXXX")
 LIMIT = int(os.getenv("OFS_PAGE_LIMIT", "100"))
 TIMEOUT = int(os.getenv("OFS_TIMEOUT", "30"))
 CLEANUP_ACTION_TIMEOUT = int(os.getenv("OFS_CLEANUP_ACTION_TIMEOUT", "12"))
+# Base do backoff entre tentativas. O ritmo entre chamadas fica com o
+# limitador compartilhado (core/rate_limit.py), aplicado pela Session.
 PAUSE = float(os.getenv("OFS_PAUSE", "0.2"))
 VERIFY_SSL = os.getenv("OFS_VERIFY_SSL", "true").lower() not in ("0", "false", "no")
 
@@ -66,7 +70,7 @@ def older_than(dt: Optional[datetime], days: int) -> bool:
 
 
 def get_session() -> requests.Session:
-    session = requests.Session()
+    session = new_http_session()
 
     token = base64.b64encode(
         f"{USERNAME}:{PASSWORD}".encode("utf-8")
@@ -188,8 +192,6 @@ def get_users_paginated(session: requests.Session) -> Iterable[Dict]:
         got = len(items)
         offset += got
 
-        time.sleep(PAUSE)
-
         if got < LIMIT:
             break
 
@@ -398,8 +400,6 @@ def find_stale_users(
         if len(items) < LIMIT:
             break
 
-        time.sleep(PAUSE)
-
     return vencidos, {
         "ok": page_error is None,
         "first_code": first_code,
@@ -488,6 +488,4 @@ def execute_cleanup(
                 "inactivate_resource": code_inactivate,
             })
 
-        time.sleep(PAUSE)
-
     return results
\ No newline at end of file
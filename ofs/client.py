@@ -1,9 +1,95 @@
 # ofs/client.py
 import os
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+from core.rate_limit import get_rate_limiter, upstream_for_url
+from ofs.resource_hierarchy import RESOURCE_HIERARCHY_FIELDS, ResourceHierarchy
+
 DEFAULT_TIMEOUT = 20
+ACTIVITIES_PAGE_LIMIT = 2000
+
+# Pool de conexões HTTP compartilhado (keep-alive) para todo o processo.
+POOL_CONNECTIONS = int(os.getenv("OFS_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("OFS_POOL_MAXSIZE", "16"))
+POOL_BLOCK = os.getenv("OFS_POOL_BLOCK", "false").lower() in ("1", "true", "yes")
+KEEP_ALIVE = os.getenv("OFS_KEEP_ALIVE", "true").lower() not in ("0", "false", "no")
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter que passa cada chamada ao OFS pelo limitador do upstream
+    (core ou metadata), compartilhado por todos os jobs do processo.
+    """
+
+    def send(self, request, **kwargs):
+        limiter = get_rate_limiter(upstream_for_url(request.url))
+
+        if limiter is None:
+            return super().send(request, **kwargs)
+
+        limiter.acquire()
+        started = time.monotonic()
+
+        try:
+            response = super().send(request, **kwargs)
+        except requests.RequestException:
+            limiter.record(latency=time.monotonic() - started)
+            raise
+
+        limiter.record(
+            response.status_code,
+            latency=time.monotonic() - started,
+            retry_after=response.headers.get("Retry-After"),
+        )
+        return response
+
+
+def new_http_session() -> requests.Session:
+    """
+    Cria uma Session com pool de conexões configurável.
+
+    Use get_http_session() para o pool compartilhado. Esta função existe para
+    quem precisa de headers próprios na Session (ex.: ofs/cleanup.py), mantendo
+    a mesma configuração de pool/keep-alive.
+    """
+    session = requests.Session()
+
+    adapter = RateLimitedAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=POOL_BLOCK,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    if not KEEP_ALIVE:
+        session.headers["Connection"] = "close"
+
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """
+    Retorna a Session compartilhada do processo.
+
+    A Session não guarda autenticação nem headers por chamada, então pode ser
+    usada por várias threads ao mesmo tempo (o pool do urllib3 é thread-safe).
+    """
+    global _shared_session
+
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = new_http_session()
+
+    return _shared_session
 
 
 class OFSClient:
@@ -11,6 +97,7 @@ class OFSClient:
         self.username = username or os.getenv("OFS_USERNAME")
         self.password = password or os.getenv("OFS_PASSWORD")
         self.auth = HTTPBasicAuth(self.username, self.password)
+        self.session = get_http_session()
 
         # Base principal já usada no projeto
         self.base_url = os.getenv(
@@ -30,7 +117,7 @@ class OFSClient:
         }
         if headers:
             h.update(headers)
-        resp = requests.request(
+        resp = self.session.request(
             method,
             url,
             auth=self.auth,
@@ -40,33 +127,14 @@ class OFSClient:
         )
         return resp
 
-    def get_resources_hierarchy_map(self, progress_callback=None) -> dict:
+    def iter_resources(self, fields=None, limit: int = 100, progress_callback=None):
         """
-        Lista recursos do OFS paginando e monta a hierarquia em memória.
-
-        Estrutura gerada por usuário/recurso:
-        - Bucket ID
-        - Bucket Nome
-        - Recurso acima do bucket ID
-        - Recurso acima do bucket Nome
-        - Segundo nível acima do bucket ID
-        - Segundo nível acima do bucket Nome
+        Pagina GET /resources e entrega os itens crus.
 
-        Não faz consulta individual por recurso.
-        Busca todos os recursos uma vez e cruza tudo em memória.
+        progress_callback(loaded) é chamado a cada página com o total já lido.
         """
-        resources = {}
+        fields = ",".join(fields or RESOURCE_HIERARCHY_FIELDS)
         offset = 0
-        limit = 100
-
-        fields = ",".join([
-            "resourceId",
-            "name",
-            "parentResourceId",
-            "XR_PARENT_RESOURCE",
-            "resourceType",
-        ])
-
         loaded = 0
 
         while True:
@@ -79,24 +147,7 @@ class OFSClient:
                 break
 
             for item in items:
-                resource_id = (
-                    item.get("resourceId")
-                    or item.get("id")
-                    or item.get("resource_id")
-                )
-
-                if not resource_id:
-                    continue
-
-                resource_id = str(resource_id)
-
-                resources[resource_id] = {
-                    "resourceId": resource_id,
-                    "name": item.get("name") or "-",
-                    "parentResourceId": item.get("parentResourceId") or "-",
-                    "XR_PARENT_RESOURCE": item.get("XR_PARENT_RESOURCE") or "-",
-                    "resourceType": item.get("resourceType") or "-",
-                }
+                yield item
 
             loaded += len(items)
 
@@ -105,76 +156,120 @@ class OFSClient:
 
             offset += limit
 
-        bucket_by_resource = {}
-        bucket_name_by_resource = {}
-
-        bucket_parent_by_resource = {}
-        bucket_parent_name_by_resource = {}
-
-        bucket_grandparent_by_resource = {}
-        bucket_grandparent_name_by_resource = {}
-
-        for resource_id, resource in resources.items():
-            bucket_id = (
-                resource.get("XR_PARENT_RESOURCE")
-                if resource.get("XR_PARENT_RESOURCE") not in (None, "", "-")
-                else resource.get("parentResourceId")
-            )
-
-            if not bucket_id or bucket_id == "-":
-                bucket_by_resource[resource_id] = "-"
-                bucket_name_by_resource[resource_id] = "-"
-
-                bucket_parent_by_resource[resource_id] = "-"
-                bucket_parent_name_by_resource[resource_id] = "-"
-
-                bucket_grandparent_by_resource[resource_id] = "-"
-                bucket_grandparent_name_by_resource[resource_id] = "-"
-                continue
-
-            bucket_id = str(bucket_id)
-            bucket = resources.get(bucket_id, {})
-
-            bucket_parent_id = bucket.get("parentResourceId") or "-"
-            bucket_parent = (
-                resources.get(str(bucket_parent_id), {})
-                if bucket_parent_id and bucket_parent_id != "-"
-                else {}
-            )
-
-            bucket_grandparent_id = bucket_parent.get("parentResourceId") or "-"
-            bucket_grandparent = (
-                resources.get(str(bucket_grandparent_id), {})
-                if bucket_grandparent_id and bucket_grandparent_id != "-"
-                else {}
-            )
-
-            bucket_by_resource[resource_id] = bucket_id
-            bucket_name_by_resource[resource_id] = bucket.get("name") or "-"
-
-            bucket_parent_by_resource[resource_id] = bucket_parent_id
-            bucket_parent_name_by_resource[resource_id] = bucket_parent.get("name") or "-"
-
-            bucket_grandparent_by_resource[resource_id] = bucket_grandparent_id
-            bucket_grandparent_name_by_resource[resource_id] = bucket_grandparent.get("name") or "-"
-
-        return {
-            "resources": resources,
-            "bucket_by_resource": bucket_by_resource,
-            "bucket_name_by_resource": bucket_name_by_resource,
-            "bucket_parent_by_resource": bucket_parent_by_resource,
-            "bucket_parent_name_by_resource": bucket_parent_name_by_resource,
-            "bucket_grandparent_by_resource": bucket_grandparent_by_resource,
-            "bucket_grandparent_name_by_resource": bucket_grandparent_name_by_resource,
-        }
+    def get_resources_hierarchy_map(self, progress_callback=None) -> dict:
+        """
+        Lista recursos do OFS paginando e monta a hierarquia em memória.
+
+        Estrutura gerada por usuário/recurso:
+        - Bucket ID
+        - Bucket Nome
+        - Recurso acima do bucket ID
+        - Recurso acima do bucket Nome
+        - Segundo nível acima do bucket ID
+        - Segundo nível acima do bucket Nome
+
+        Sempre consulta o OFS. Para reaproveitar a hierarquia entre jobs use
+        services.ofs_resource_hierarchy_service.get_resource_hierarchy.
+        """
+        hierarchy = ResourceHierarchy.from_items(
+            self.iter_resources(progress_callback=progress_callback)
+        )
+        return hierarchy.to_bucket_maps()
+
     # ======== MÉTODOS JÁ UTILIZADOS NO PROJETO ========
-    def authenticated_get(self, url: str) -> dict:
+    def authenticated_get(self, url: str, params=None, timeout=DEFAULT_TIMEOUT) -> dict:
         """GET autenticado genérico que retorna JSON (com raise em erro HTTP)."""
         headers = {"Accept": "application/json"}
-        response = requests.get(url, headers=headers, auth=self.auth, timeout=DEFAULT_TIMEOUT)
+        response = self.session.get(
+            url,
+            headers=headers,
+            params=params,
+            auth=self.auth,
+            timeout=timeout,
+        )
         response.raise_for_status()
         return response.json()
 
+    # ======== Atividades (paginação offset/hasMore) ========
+    def iter_activity_pages(
+        self,
+        date_from: str,
+        date_to: str,
+        resources: str,
+        q: str = None,
+        fields=None,
+        limit: int = ACTIVITIES_PAGE_LIMIT,
+        max_pages: int = None,
+        timeout=DEFAULT_TIMEOUT,
+        before_page=None,
+    ):
+        """
+        GET /activities paginando por offset/hasMore.
+
+        Entrega cada página assim que ela chega, sem acumular o período inteiro
+        em memória. Cada página é um dict:
+          - page: número da página (1..N)
+          - offset: offset usado na request
+          - items: itens retornados
+          - has_more: valor de hasMore retornado pela API
+
+        before_page(page, offset) é chamado antes de cada request (progresso).
+        A paginação para quando hasMore=false ou quando a página vem vazia;
+        quem precisa tratar hasMore=true sem itens olha a última página.
+        """
+        if isinstance(fields, (list, tuple)):
+            fields = ",".join(fields)
+
+        url = f"{self.base_url}/activities/"
+        offset = 0
+        page = 1
+
+        while max_pages is None or page <= max_pages:
+            params = [
+                ("dateFrom", date_from),
+                ("dateTo", date_to),
+                ("resources", resources),
+            ]
+            if q:
+                params.append(("q", q))
+            if fields:
+                params.append(("fields", fields))
+            params.append(("limit", str(limit)))
+            params.append(("offset", str(offset)))
+
+            if before_page:
+                before_page(page, offset)
+
+            data = self.authenticated_get(url, params=params, timeout=timeout)
+
+            if isinstance(data, dict):
+                items = data.get("items") or []
+                has_more = bool(data.get("hasMore"))
+            elif isinstance(data, list):
+                items = data
+                has_more = False
+            else:
+                items = []
+                has_more = False
+
+            yield {
+                "page": page,
+                "offset": offset,
+                "items": items,
+                "has_more": has_more,
+            }
+
+            if not has_more or not items:
+                break
+
+            offset += len(items)
+            page += 1
+
+    def iter_activities(self, date_from: str, date_to: str, resources: str, q: str = None, fields=None, **kwargs):
+        """Mesma paginação de iter_activity_pages, entregando item a item."""
+        for page in self.iter_activity_pages(date_from, date_to, resources, q=q, fields=fields, **kwargs):
+            yield from page["items"]
+
     def get_login_by_resource_id(self, resource_id: str) -> str:
         """Retorna o login atrelado a um resource_id via /resources/{id}/users"""
         url = f"{self.base_url}/resources/{resource_id}/users"
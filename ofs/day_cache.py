@@ -0,0 +1,246 @@
+# ofs/day_cache.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+# Cache em disco das páginas de /activities por (dia, resources, q, fields).
+#
+# Cada shard de um dia vira um arquivo .jsonl.gz (uma página por linha), então
+# um segundo relatório do mesmo período relê o disco em vez de ir ao OFS.
+# Dia já encerrado (mais DAY_CACHE_GRACE_HOURS) quando foi consultado vale por
+# OFS_DAY_CACHE_PAST_TTL_SECONDS; o dia atual, que ainda muda, só por
+# OFS_DAY_CACHE_TODAY_TTL_SECONDS (0 desliga o cache do dia atual).
+#
+# Ao lado das páginas ficam também contagens por (dia, resources, q), usadas
+# para estimar o tamanho de um relatório antes de consultá-lo; valem pelos
+# mesmos TTLs.
+DAY_CACHE_ENABLED = os.getenv("OFS_DAY_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+DAY_CACHE_DIR = os.getenv("OFS_DAY_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "instance",
+    "ofs_day_cache",
+)
+PAST_TTL_SECONDS = int(os.getenv("OFS_DAY_CACHE_PAST_TTL_SECONDS", str(24 * 3600)))
+TODAY_TTL_SECONDS = int(os.getenv("OFS_DAY_CACHE_TODAY_TTL_SECONDS", "300"))
+DAY_CACHE_GRACE_HOURS = int(os.getenv("OFS_DAY_CACHE_GRACE_HOURS", "3"))
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def cache_key(day: str, resources: str, q: Optional[str], fields, limit: int) -> str:
+    if isinstance(fields, (list, tuple)):
+        fields = ",".join(fields)
+
+    raw = json.dumps([day, resources or "", q or "", fields or "", int(limit)])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_path(day: str, key: str) -> str:
+    return os.path.join(DAY_CACHE_DIR, f"{day}_{key}.jsonl.gz")
+
+
+def _ttl_seconds(day: str, fetched_ts: float) -> int:
+    try:
+        day_end = datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)
+    except ValueError:
+        return 0
+
+    closed_at = day_end + timedelta(hours=DAY_CACHE_GRACE_HOURS)
+
+    if datetime.fromtimestamp(fetched_ts) >= closed_at:
+        return PAST_TTL_SECONDS
+    return TODAY_TTL_SECONDS
+
+
+def is_cacheable(day: str) -> bool:
+    """Vale a pena gravar o dia? (False se o TTL do momento for zero)."""
+    return DAY_CACHE_ENABLED and _ttl_seconds(day, time.time()) > 0
+
+
+def open_pages(day: str, key: str) -> Optional[Iterator[dict]]:
+    """
+    Páginas em cache do shard, na ordem em que vieram do OFS, ou None se não
+    há entrada válida. A entrada vencida é removida.
+    """
+    if not DAY_CACHE_ENABLED:
+        return None
+
+    path = _entry_path(day, key)
+
+    try:
+        fetched_ts = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    if time.time() - fetched_ts > _ttl_seconds(day, fetched_ts):
+        _remove(path)
+        return None
+
+    def pages():
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                page_data = json.loads(line)
+                page_data["from_cache"] = True
+                yield page_data
+
+    return pages()
+
+
+def _count_path(day: str, resources: str, q: Optional[str]) -> str:
+    key = cache_key(day, resources, q, "count", 0)
+    return os.path.join(DAY_CACHE_DIR, f"{day}_{key}.count")
+
+
+def read_count(day: str, resources: str, q: Optional[str]) -> Optional[int]:
+    """Quantidade de atividades do shard já conhecida, ou None."""
+    if not DAY_CACHE_ENABLED:
+        return None
+
+    path = _count_path(day, resources, q)
+
+    try:
+        fetched_ts = os.path.getmtime(path)
+        if time.time() - fetched_ts > _ttl_seconds(day, fetched_ts):
+            _remove(path)
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+
+    except (OSError, ValueError):
+        return None
+
+
+def store_count(day: str, resources: str, q: Optional[str], count: int):
+    """Guarda a quantidade de atividades do shard (consulta completa ou sonda)."""
+    if not is_cacheable(day):
+        return
+
+    path = _count_path(day, resources, q)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+    try:
+        os.makedirs(DAY_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(int(count)))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[WARN] Falha ao gravar contagem do OFS {path}: {e}")
+        _remove(tmp_path)
+
+
+class PageWriter:
+    """
+    Grava as páginas de um shard conforme chegam. Só vira entrada de cache no
+    commit(), depois da última página; abort() descarta o arquivo parcial.
+    Falha de disco desliga a gravação sem derrubar a consulta.
+    """
+
+    def __init__(self, day: str, key: str):
+        os.makedirs(DAY_CACHE_DIR, exist_ok=True)
+
+        self.path = _entry_path(day, key)
+        self.tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        self._file = gzip.open(self.tmp_path, "wt", encoding="utf-8", compresslevel=5)
+        self._failed = False
+        self._incomplete = False
+
+    def write(self, page_data: dict):
+        if self._failed:
+            return
+
+        items = page_data.get("items") or []
+        has_more = bool(page_data.get("has_more"))
+        # hasMore=true sem itens é erro do lado do OFS: não guardar esse dia.
+        self._incomplete = has_more and not items
+
+        try:
+            self._file.write(json.dumps({
+                "page": page_data.get("page"),
+                "offset": page_data.get("offset"),
+                "items": items,
+                "has_more": has_more,
+            }, ensure_ascii=False, separators=(",", ":")))
+            self._file.write("\n")
+        except Exception as e:
+            print(f"[WARN] Falha ao gravar cache do OFS {self.path}: {e}")
+            self._failed = True
+
+    def commit(self):
+        if self._failed or self._incomplete:
+            self.abort()
+            return
+
+        try:
+            self._file.close()
+            os.replace(self.tmp_path, self.path)
+        except Exception as e:
+            print(f"[WARN] Falha ao gravar cache do OFS {self.path}: {e}")
+            self.abort()
+            return
+
+        _maybe_prune()
+
+    def abort(self):
+        try:
+            self._file.close()
+        except Exception:
+            pass
+        _remove(self.tmp_path)
+
+
+def open_writer(day: str, key: str) -> Optional[PageWriter]:
+    """PageWriter para o shard, ou None se o dia não deve ir para o cache agora."""
+    if not is_cacheable(day):
+        return None
+
+    try:
+        return PageWriter(day, key)
+    except Exception as e:
+        print(f"[WARN] Cache do OFS indisponível em {DAY_CACHE_DIR}: {e}")
+        return None
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"[WARN] Falha ao remover cache do OFS {path}: {e}")
+
+
+def _maybe_prune():
+    """Remove entradas e temporários mais velhos que o maior TTL (no máximo 1x por hora)."""
+    global _last_prune
+
+    now = time.time()
+
+    with _prune_lock:
+        if now - _last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        _last_prune = now
+
+    max_age = max(PAST_TTL_SECONDS, TODAY_TTL_SECONDS, PRUNE_INTERVAL_SECONDS)
+
+    try:
+        names = os.listdir(DAY_CACHE_DIR)
+    except OSError:
+        return
+
+    for name in names:
+        path = os.path.join(DAY_CACHE_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                _remove(path)
+        except OSError:
+            pass
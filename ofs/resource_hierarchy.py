@@ -0,0 +1,161 @@
+# ofs/resource_hierarchy.py
+from typing import Dict, Iterable, List, Optional
+
+EMPTY = "-"
+
+RESOURCE_HIERARCHY_FIELDS = [
+    "resourceId",
+    "name",
+    "parentResourceId",
+    "XR_PARENT_RESOURCE",
+    "resourceType",
+    "status",
+]
+
+
+def _clean(value) -> str:
+    value = str(value or "").strip()
+    return value or EMPTY
+
+
+def normalize_resource_item(item: dict) -> Optional[dict]:
+    """Normaliza um item de /resources no formato usado pela hierarquia."""
+    resource_id = (
+        item.get("resourceId")
+        or item.get("id")
+        or item.get("resource_id")
+    )
+
+    if not resource_id:
+        return None
+
+    return {
+        "resourceId": str(resource_id).strip(),
+        "name": _clean(item.get("name")),
+        "parentResourceId": _clean(item.get("parentResourceId")),
+        "XR_PARENT_RESOURCE": _clean(item.get("XR_PARENT_RESOURCE")),
+        "resourceType": _clean(item.get("resourceType")),
+        "status": _clean(item.get("status")).lower(),
+    }
+
+
+class ResourceHierarchy:
+    """
+    Árvore de recursos do OFS em memória.
+
+    ancestors() sobe a árvore até a raiz, em qualquer profundidade, e guarda
+    o resultado por recurso: cada cadeia é calculada uma vez só, reaproveitando
+    a cadeia já calculada do pai.
+    """
+
+    def __init__(self, resources: Dict[str, dict]):
+        self.resources = resources
+        self._ancestors: Dict[str, tuple] = {}
+
+    @classmethod
+    def from_items(cls, items: Iterable[dict]) -> "ResourceHierarchy":
+        resources = {}
+
+        for item in items:
+            resource = normalize_resource_item(item)
+            if resource:
+                resources[resource["resourceId"]] = resource
+
+        return cls(resources)
+
+    def __len__(self):
+        return len(self.resources)
+
+    def __contains__(self, resource_id):
+        return str(resource_id or "") in self.resources
+
+    def name(self, resource_id: str) -> str:
+        return self.resources.get(str(resource_id or ""), {}).get("name") or EMPTY
+
+    def parent_of(self, resource_id: str) -> str:
+        return self.resources.get(str(resource_id or ""), {}).get("parentResourceId") or EMPTY
+
+    def bucket_of(self, resource_id: str) -> str:
+        """Bucket do recurso: XR_PARENT_RESOURCE quando preenchido, senão o pai direto."""
+        resource = self.resources.get(str(resource_id or ""))
+
+        if not resource:
+            return EMPTY
+
+        if resource.get("XR_PARENT_RESOURCE") not in (None, "", EMPTY):
+            return resource["XR_PARENT_RESOURCE"]
+
+        return resource.get("parentResourceId") or EMPTY
+
+    def ancestors(self, resource_id: str) -> tuple:
+        """IDs dos ancestrais (pai, avô, ...) até a raiz."""
+        resource_id = str(resource_id or "")
+
+        cached = self._ancestors.get(resource_id)
+        if cached is not None:
+            return cached
+
+        # Sobe até achar um nó já calculado (ou a raiz), protegendo contra ciclos.
+        path = []
+        visited = set()
+        current = resource_id
+
+        while current and current != EMPTY and current not in self._ancestors:
+            if current in visited:
+                break
+
+            visited.add(current)
+            path.append(current)
+            current = self.parent_of(current)
+
+        tail = ()
+        if current and current != EMPTY:
+            tail = self._ancestors.get(current, ())
+            if current in visited:
+                tail = ()
+            else:
+                tail = (current,) + tail
+
+        for node in reversed(path):
+            self._ancestors[node] = tail
+            tail = (node,) + tail
+
+        return self._ancestors.get(resource_id, ())
+
+    def bucket_chain(self, resource_id: str, levels: int = 3) -> List[str]:
+        """Bucket do recurso seguido dos níveis acima dele (sempre com `levels` posições)."""
+        bucket_id = self.bucket_of(resource_id)
+
+        if bucket_id == EMPTY:
+            return [EMPTY] * levels
+
+        chain = [bucket_id] + list(self.ancestors(bucket_id))
+        chain = chain[:levels]
+
+        return chain + [EMPTY] * (levels - len(chain))
+
+    def to_bucket_maps(self) -> dict:
+        """Formato histórico de OFSClient.get_resources_hierarchy_map (bucket + 2 níveis)."""
+        maps = {
+            "resources": self.resources,
+            "bucket_by_resource": {},
+            "bucket_name_by_resource": {},
+            "bucket_parent_by_resource": {},
+            "bucket_parent_name_by_resource": {},
+            "bucket_grandparent_by_resource": {},
+            "bucket_grandparent_name_by_resource": {},
+        }
+
+        for resource_id in self.resources:
+            bucket_id, parent_id, grandparent_id = self.bucket_chain(resource_id, levels=3)
+
+            maps["bucket_by_resource"][resource_id] = bucket_id
+            maps["bucket_name_by_resource"][resource_id] = self.name(bucket_id)
+
+            maps["bucket_parent_by_resource"][resource_id] = parent_id
+            maps["bucket_parent_name_by_resource"][resource_id] = self.name(parent_id)
+
+            maps["bucket_grandparent_by_resource"][resource_id] = grandparent_id
+            maps["bucket_grandparent_name_by_resource"][resource_id] = self.name(grandparent_id)
+
+        return maps
@@ -0,0 +1,362 @@
+# ofs/shards.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ofs import day_cache
+from ofs.client import ACTIVITIES_PAGE_LIMIT, DEFAULT_TIMEOUT, OFSClient
+
+# Quantos shards um único job consulta em paralelo.
+SHARD_WORKERS = int(os.getenv("OFS_SHARD_WORKERS", "4"))
+
+# Teto global do processo: somando todos os jobs, no máximo N requisições de
+# página à OFS ao mesmo tempo. A vaga vale só durante a requisição: um shard
+# parado esperando o consumidor não segura vaga de ninguém.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("OFS_MAX_CONCURRENT_REQUESTS", "6"))
+
+_request_slots = threading.BoundedSemaphore(max(1, MAX_CONCURRENT_REQUESTS))
+
+# Páginas que cada shard em andamento pode deixar na fila esperando a vez
+# dele. Memória máxima de um job: janela de shards x SHARD_QUEUE_PAGES páginas.
+SHARD_QUEUE_PAGES = int(os.getenv("OFS_SHARD_QUEUE_PAGES", "4"))
+
+
+def _put(events: queue.Queue, item, stop_event: threading.Event) -> bool:
+    """put na fila limitada que desiste quando a consulta foi interrompida (False)."""
+    while not stop_event.is_set():
+        try:
+            events.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _next_page(pages: Iterator[Dict]) -> Optional[Dict]:
+    """Próxima página do shard (None no fim), com a vaga global só durante o HTTP."""
+    with _request_slots:
+        return next(pages, None)
+
+
+def build_activity_shards(days: List[str], resources: List[str], split_resources: bool = False) -> List[Dict]:
+    """
+    Monta a lista de shards (dia x grupo de recursos) em ordem determinística.
+
+    split_resources=False: um shard por dia com todos os recursos juntos.
+    split_resources=True: um shard por dia e por recurso.
+    """
+    if split_resources and len(resources) > 1:
+        resource_groups = [[resource] for resource in resources]
+    else:
+        resource_groups = [list(resources)]
+
+    shards = []
+
+    for day in days:
+        for group in resource_groups:
+            shards.append({
+                "index": len(shards),
+                "day": day,
+                "resources": ",".join(group),
+            })
+
+    return shards
+
+
+def _replay_cached_shard(shard, key, events, stop_event) -> bool:
+    """Entrega as páginas do shard a partir do cache; False se não houver entrada."""
+    index = shard["index"]
+    pages = day_cache.open_pages(shard["day"], key)
+
+    if pages is None:
+        return False
+
+    sent = False
+
+    try:
+        for page_data in pages:
+            if stop_event.is_set():
+                return True
+
+            if not _put(events, ("page", index, page_data), stop_event):
+                return True
+            sent = True
+
+    except Exception as e:
+        # Arquivo ilegível: se nada foi entregue ainda, consulta o OFS.
+        if sent:
+            raise
+        print(f"[WARN] Cache do OFS ilegível para {shard['day']}: {e}")
+        return False
+
+    _put(events, ("done", index, {"from_cache": True}), stop_event)
+    return True
+
+
+def _fetch_shard(client, shard, events, stop_event, q, fields, limit, timeout, use_cache):
+    index = shard["index"]
+    key = day_cache.cache_key(shard["day"], shard["resources"], q, fields, limit) if use_cache else None
+    writer = None
+
+    try:
+        if key and _replay_cached_shard(shard, key, events, stop_event):
+            return
+
+        writer = day_cache.open_writer(shard["day"], key) if key else None
+
+        fetched = 0
+
+        pages = client.iter_activity_pages(
+            shard["day"],
+            shard["day"],
+            shard["resources"],
+            q=q,
+            fields=fields,
+            limit=limit,
+            timeout=timeout,
+        )
+
+        while True:
+            page_data = _next_page(pages)
+            if page_data is None:
+                break
+
+            if stop_event.is_set():
+                if writer:
+                    writer.abort()
+                return
+
+            if writer:
+                writer.write(page_data)
+
+            fetched += len(page_data["items"])
+
+            if not _put(events, ("page", index, page_data), stop_event):
+                if writer:
+                    writer.abort()
+                return
+
+        if writer:
+            writer.commit()
+
+        if use_cache:
+            day_cache.store_count(shard["day"], shard["resources"], q, fetched)
+
+        _put(events, ("done", index, {"from_cache": False}), stop_event)
+
+    except Exception as e:
+        if writer:
+            writer.abort()
+        _put(events, ("error", index, e), stop_event)
+
+
+def iter_activity_shards(
+    client: OFSClient,
+    shards: List[Dict],
+    q: str = None,
+    fields=None,
+    limit: int = ACTIVITIES_PAGE_LIMIT,
+    timeout=DEFAULT_TIMEOUT,
+    max_workers: Optional[int] = None,
+    use_cache: bool = True,
+    cache_stats: Optional[Dict] = None,
+) -> Iterator[Tuple[Dict, Dict]]:
+    """
+    Consulta os shards em paralelo e entrega (shard, página) na ordem dos shards.
+
+    Cada shard pagina com client.iter_activity_pages. As páginas do shard
+    "da vez" saem assim que chegam; as dos shards seguintes ficam em espera
+    até chegar a vez deles, então o resultado final é sempre o mesmo de uma
+    consulta sequencial (importante para a deduplicação por activityId).
+
+    Só os `workers` shards a partir do "da vez" ficam em andamento (janela
+    deslizante) e cada um tem a própria fila limitada (OFS_SHARD_QUEUE_PAGES):
+    o shard adiantado para de paginar até chegar a vez dele, em vez de
+    acumular as páginas, e parado não segura vaga global (ela vale só durante
+    cada requisição), então jobs simultâneos não se travam. A memória não cresce com o tamanho do período nem
+    com o de um dia. Erro num shard adiantado sobe quando chega a vez dele.
+
+    Tudo que é entregue roda na thread de quem consome, então progresso e
+    escrita de status não precisam de lock. Use contextlib.closing ao
+    interromper o consumo no meio, para encerrar os workers.
+
+    Shards já consultados saem do cache em disco (ofs.day_cache) quando
+    use_cache=True; cache_stats, se informado, recebe "cache_hits" e
+    "cache_misses" por shard concluído.
+    """
+    if not shards:
+        return
+
+    workers = max(1, min(max_workers or SHARD_WORKERS, len(shards)))
+
+    shard_queues = {}
+    stop_event = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ofs-shard")
+    submitted = 0
+
+    def submit_window(next_index):
+        nonlocal submitted
+        while submitted < len(shards) and submitted < next_index + workers:
+            shard = shards[submitted]
+            events = queue.Queue(maxsize=max(1, SHARD_QUEUE_PAGES))
+            shard_queues[submitted] = events
+            submitted += 1
+
+            executor.submit(
+                _fetch_shard,
+                client,
+                shard,
+                events,
+                stop_event,
+                q,
+                fields,
+                limit,
+                timeout,
+                use_cache,
+            )
+
+    try:
+        for next_index, shard in enumerate(shards):
+            submit_window(next_index)
+            events = shard_queues[next_index]
+
+            while True:
+                kind, _, payload = events.get()
+
+                if kind == "error":
+                    raise payload
+
+                if kind == "page":
+                    yield shard, payload
+                    continue
+
+                if cache_stats is not None:
+                    counter = "cache_hits" if payload["from_cache"] else "cache_misses"
+                    cache_stats[counter] = cache_stats.get(counter, 0) + 1
+
+                del shard_queues[next_index]
+                break
+
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _probe_shard_count(client: OFSClient, shard: Dict, q: str, timeout, deadline: Optional[float]) -> Optional[int]:
+    params = [
+        ("dateFrom", shard["day"]),
+        ("dateTo", shard["day"]),
+        ("resources", shard["resources"]),
+    ]
+    if q:
+        params.append(("q", q))
+    params.extend([("fields", "activityId"), ("limit", "1"), ("offset", "0")])
+
+    wait_seconds = None if deadline is None else deadline - time.monotonic()
+    if wait_seconds is not None and wait_seconds <= 0:
+        return None
+
+    # Mesma vaga global das páginas: a espera é no máximo uma requisição.
+    if not _request_slots.acquire(timeout=wait_seconds):
+        return None
+
+    try:
+        data = client.authenticated_get(f"{client.base_url}/activities/", params=params, timeout=timeout)
+    finally:
+        _request_slots.release()
+
+    if isinstance(data, list):
+        return len(data)
+    if not isinstance(data, dict):
+        return None
+
+    try:
+        return int(data["totalResults"])
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    # Sem totalResults só dá para ter certeza quando tudo coube na sonda.
+    if not data.get("hasMore"):
+        return len(data.get("items") or [])
+    return None
+
+
+def count_activity_shards(
+    client: OFSClient,
+    shards: List[Dict],
+    q: str = None,
+    timeout=DEFAULT_TIMEOUT,
+    max_workers: Optional[int] = None,
+    stats: Optional[Dict] = None,
+    deadline_seconds: Optional[float] = None,
+    max_probes: Optional[int] = None,
+) -> Dict[int, Optional[int]]:
+    """
+    Quantidade de atividades por shard ({index: total}), sem baixar as páginas.
+
+    Usa a contagem guardada no cache em disco (de uma consulta completa ou de
+    uma sonda anterior) e, para os demais, uma sonda limit=1 em paralelo que
+    lê totalResults. None quando o OFS não informa o total, quando o shard
+    passa de max_probes sondas ou quando deadline_seconds estoura. stats, se
+    informado, recebe "count_cache_hits", "probes", "skipped_probes" e
+    "timed_out".
+    """
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+    counts = {}
+    pending = []
+
+    for shard in shards:
+        cached = day_cache.read_count(shard["day"], shard["resources"], q)
+        if cached is None:
+            pending.append(shard)
+        else:
+            counts[shard["index"]] = cached
+
+    skipped = []
+    if max_probes is not None and len(pending) > max_probes:
+        pending, skipped = pending[:max_probes], pending[max_probes:]
+
+    for shard in skipped:
+        counts[shard["index"]] = None
+
+    if stats is not None:
+        stats["count_cache_hits"] = stats.get("count_cache_hits", 0) + len(counts) - len(skipped)
+        stats["probes"] = stats.get("probes", 0) + len(pending)
+        stats["skipped_probes"] = stats.get("skipped_probes", 0) + len(skipped)
+        stats.setdefault("timed_out", False)
+
+    if not pending:
+        return counts
+
+    workers = max(1, min(max_workers or SHARD_WORKERS, len(pending)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ofs-probe")
+
+    try:
+        futures = {
+            executor.submit(_probe_shard_count, client, shard, q, timeout, deadline): shard
+            for shard in pending
+        }
+
+        finished, unfinished = wait(
+            futures,
+            timeout=None if deadline is None else max(0, deadline - time.monotonic()),
+        )
+
+        for future, shard in futures.items():
+            count = future.result() if future in finished else None
+            counts[shard["index"]] = count
+
+            if count is not None:
+                day_cache.store_count(shard["day"], shard["resources"], q, count)
+
+        if stats is not None and (unfinished or (deadline is not None and time.monotonic() >= deadline)):
+            stats["timed_out"] = True
+
+    finally:
+        # Sonda que estourou o prazo termina sozinha (timeout do HTTP) em segundo plano.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return counts
@@ -16,6 +16,7 @@ from .online_routes import init_app as init_online_routes
 from .toquio_td_bucket_routes import init_app as init_toquio_td_bucket_routes
 from .relatorios_routes import init_app as init_relatorios_routes
 from .bi_activities_routes import init_app as init_bi_activities_routes
+from .job_events_routes import init_app as init_job_events_routes
 
 def register_routes(app):
     init_auth_routes(app)
@@ -37,4 +38,5 @@ def register_routes(app):
     init_ofs_erros_tratativas_dashboards_routes(app)
     init_ofs_erros_agendamento_routes(app)
     init_relatorios_routes(app)
-    init_bi_activities_routes(app)
\ No newline at end of file
+    init_bi_activities_routes(app)
+    init_job_events_routes(app)
\ No newline at end of file
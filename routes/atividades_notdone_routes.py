@@ -1,13 +1,15 @@
 from math import ceil
-from urllib.parse import urlencode
 from datetime import datetime
 from io import BytesIO
 
+import requests
 from flask import render_template, request, send_file, redirect, url_for, flash, jsonify
 from openpyxl import Workbook
 
 from database.connection import get_connection
 from database.audit import audit_log
+from database.bulk import bulk_insert_ignore
+from database.pagination import fetch_keyset_page
 from ofs.client import OFSClient
 from core.auth import login_required, perm_required, current_actor
 from core.utils import xlsx_auto_width
@@ -53,15 +55,9 @@ def init_app(app):
             dt_from = datetime.strptime(today, "%Y-%m-%d").date()
             dt_to = dt_from
 
-        page_raw = (request.args.get("page") or "1").strip()
-        try:
-            page = int(page_raw)
-        except ValueError:
-            page = 1
-        if page < 1:
-            page = 1
+        cursor_token = (request.args.get("cursor") or "").strip()
 
-        return date_from, date_to, resources, page
+        return date_from, date_to, resources, cursor_token
 
     def _get_kpis(date_from, date_to):
         conn = get_connection()
@@ -85,30 +81,24 @@ def init_app(app):
             cur.close()
             conn.close()
 
-    def _get_items(date_from, date_to, page, view_mode):
+    def _get_items(date_from, date_to, cursor_token, view_mode, total_items):
         where_status = "tratado_em IS NULL" if view_mode == "pendentes" else "tratado_em IS NOT NULL"
-        offset = (page - 1) * PER_PAGE
+
+        # Paginação por keyset: o total já vem dos KPIs, sem COUNT(*) por página.
+        if view_mode == "tratadas":
+            order_columns = [("tratado_em", "tratado_em"), ("created_at", "created_at"), ("activity_id", "activityId")]
+        else:
+            order_columns = [("created_at", "created_at"), ("activity_id", "activityId")]
+
+        total_pages = max(1, ceil(total_items / PER_PAGE)) if total_items else 1
 
         conn = get_connection()
         cur = conn.cursor(dictionary=True)
 
         try:
-            cur.execute(f"""
-                SELECT COUNT(*) AS total_items
-                FROM ofs_atividades_notdone
-                WHERE `date` BETWEEN %s AND %s
-                  AND {where_status}
-            """, (date_from, date_to))
-            total_items = int((cur.fetchone() or {}).get("total_items") or 0)
-
-            total_pages = max(1, ceil(total_items / PER_PAGE)) if total_items else 1
-            if page > total_pages:
-                page = total_pages
-                offset = (page - 1) * PER_PAGE
-
-            order_sql = "tratado_em DESC, created_at DESC" if view_mode == "tratadas" else "created_at DESC"
-
-            cur.execute(f"""
+            result = fetch_keyset_page(
+                cur,
+                """
                 SELECT
                     activity_id AS activityId,
                     activity_type AS activityType,
@@ -124,48 +114,51 @@ def init_app(app):
                     tratativa_status,
                     tratativa_obs,
                     tratado_por_username,
-                    tratado_em
+                    tratado_em,
+                    created_at
                 FROM ofs_atividades_notdone
-                WHERE `date` BETWEEN %s AND %s
-                  AND {where_status}
-                ORDER BY {order_sql}
-                LIMIT %s OFFSET %s
-            """, (date_from, date_to, PER_PAGE, offset))
-            items = cur.fetchall()
+                """,
+                f"`date` BETWEEN %s AND %s AND {where_status}",
+                (date_from, date_to),
+                order_columns,
+                PER_PAGE,
+                cursor_token,
+            )
 
-            return items, total_items, total_pages, page
+            return result, total_pages
         finally:
             cur.close()
             conn.close()
 
-    def _build_page_url(endpoint_name, page, date_from, date_to, resources):
+    def _build_page_url(endpoint_name, cursor_token, date_from, date_to, resources):
         return url_for(
             endpoint_name,
-            page=page,
+            cursor=cursor_token,
             dateFrom=date_from,
             dateTo=date_to,
             resources=resources,
         )
 
     def _render_atividades_notdone(view_mode):
-        date_from, date_to, resources, page = _parse_period()
+        date_from, date_to, resources, cursor_token = _parse_period()
         kpis = _get_kpis(date_from, date_to)
-        items, total_items, total_pages, current_page = _get_items(date_from, date_to, page, view_mode)
+        total_items = kpis["pendentes"] if view_mode == "pendentes" else kpis["tratados"]
+        result, total_pages = _get_items(date_from, date_to, cursor_token, view_mode, total_items)
 
         endpoint_name = "atividades_notdone" if view_mode == "pendentes" else "atividades_notdone_tratadas"
 
         prev_page_url = None
         next_page_url = None
 
-        if current_page > 1:
-            prev_page_url = _build_page_url(endpoint_name, current_page - 1, date_from, date_to, resources)
+        if result["prev_cursor"]:
+            prev_page_url = _build_page_url(endpoint_name, result["prev_cursor"], date_from, date_to, resources)
 
-        if current_page < total_pages:
-            next_page_url = _build_page_url(endpoint_name, current_page + 1, date_from, date_to, resources)
+        if result["next_cursor"]:
+            next_page_url = _build_page_url(endpoint_name, result["next_cursor"], date_from, date_to, resources)
 
         return render_template(
             "atividades_notdone.html",
-            items=items,
+            items=result["items"],
             date_from=date_from,
             date_to=date_to,
             resources=resources,
@@ -174,7 +167,7 @@ def init_app(app):
             pendentes=kpis["pendentes"],
             total_items=total_items,
             per_page=PER_PAGE,
-            page=current_page,
+            page=result["page"],
             total_pages=total_pages,
             prev_page_url=prev_page_url,
             next_page_url=next_page_url,
@@ -366,97 +359,86 @@ def init_app(app):
             "date",
         ]
 
-        base_params = {
-            "dateFrom": date_from,
-            "dateTo": date_to,
-            "resources": resources,
-            "q": "status=='notdone'",
-            "fields": ",".join(fields),
-            "limit": 2000,
-            "offset": 0,
-        }
-
-        items = []
-        has_more = True
-        max_pages = 20
-        page = 0
-
-        try:
-            while has_more and page < max_pages:
-                qs = urlencode(base_params, safe="=,'")
-                url = f"{client.base_url}/activities/?{qs}"
-                data = client.authenticated_get(url)
-
-                batch = data.get("items") or []
-                items.extend(batch)
-
-                has_more = bool(data.get("hasMore"))
-                if has_more:
-                    base_params["offset"] = len(items)
-                page += 1
-        except Exception as e:
-            flash(f"❌ Falha ao importar da API: {e}", "danger")
-            return redirect(url_for(redirect_endpoint, dateFrom=date_from, dateTo=date_to, resources=resources))
-
         conn = get_connection()
         cur = conn.cursor()
 
+        ignored_types = 0
         inserted = 0
         skipped = 0
-        ignored_types = 0
 
-        sql = """
-            INSERT IGNORE INTO ofs_atividades_notdone
-            (
-                activity_id,
-                activity_type,
-                city,
-                customer_number,
-                customer_phone,
-                customer_name,
-                appt_number,
-                origin_bucket,
-                tsk_not,
-                ser_clo_imp_ada,
-                resource_id,
-                date
-            )
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """
+        columns = (
+            "activity_id",
+            "activity_type",
+            "city",
+            "customer_number",
+            "customer_phone",
+            "customer_name",
+            "appt_number",
+            "origin_bucket",
+            "tsk_not",
+            "ser_clo_imp_ada",
+            "resource_id",
+            "date",
+        )
 
-        for a in items:
-            activity_id = str(a.get("activityId") or "").strip()
-            activity_type = str(a.get("activityType") or "").strip().upper()
+        try:
+            # Cada página é gravada assim que chega (mesma transação).
+            for page in client.iter_activity_pages(
+                date_from,
+                date_to,
+                resources,
+                q="status=='notdone'",
+                fields=fields,
+                limit=2000,
+                max_pages=20,
+            ):
+                rows = []
+
+                for a in page["items"]:
+                    activity_id = str(a.get("activityId") or "").strip()
+                    activity_type = str(a.get("activityType") or "").strip().upper()
+
+                    if not activity_id:
+                        continue
+
+                    if activity_type in TIPOS_DESCONSIDERADOS:
+                        ignored_types += 1
+                        continue
+
+                    rows.append((
+                        activity_id,
+                        activity_type or None,
+                        str(a.get("city") or "") or None,
+                        str(a.get("customerNumber") or "") or None,
+                        str(a.get("customerPhone") or "") or None,
+                        str(a.get("customerName") or "") or None,
+                        str(a.get("apptNumber") or "") or None,
+                        str(a.get("XA_ORIGIN_BUCKET") or "") or None,
+                        a.get("XA_TSK_NOT"),
+                        str(a.get("XA_SER_CLO_IMP_ADA") or "") or None,
+                        str(a.get("resourceId") or "") or None,
+                        str(a.get("date") or "") or None,
+                    ))
+
+                if rows:
+                    result = bulk_insert_ignore(cur, "ofs_atividades_notdone", columns, rows)
+                    inserted += result["inserted"]
+                    skipped += result["ignored"]
 
-            if not activity_id:
-                continue
+            conn.commit()
 
-            if activity_type in TIPOS_DESCONSIDERADOS:
-                ignored_types += 1
-                continue
+        except requests.RequestException as e:
+            conn.rollback()
+            flash(f"❌ Falha ao importar da API: {e}", "danger")
+            return redirect(url_for(redirect_endpoint, dateFrom=date_from, dateTo=date_to, resources=resources))
 
-            cur.execute(sql, (
-                activity_id,
-                activity_type or None,
-                str(a.get("city") or "") or None,
-                str(a.get("customerNumber") or "") or None,
-                str(a.get("customerPhone") or "") or None,
-                str(a.get("customerName") or "") or None,
-                str(a.get("apptNumber") or "") or None,
-                str(a.get("XA_ORIGIN_BUCKET") or "") or None,
-                a.get("XA_TSK_NOT"),
-                str(a.get("XA_SER_CLO_IMP_ADA") or "") or None,
-                str(a.get("resourceId") or "") or None,
-                str(a.get("date") or "") or None,
-            ))
-            if cur.rowcount == 1:
-                inserted += 1
-            else:
-                skipped += 1
+        except Exception:
+            conn.rollback()
+            raise
 
-        conn.commit()
-        cur.close()
-        conn.close()
+        finally:
+            cur.close()
+            conn.close()
 
         flash(
             f"✅ Importação concluída. Novos: {inserted} | Já existiam: {skipped} | Desconsiderados por tipo: {ignored_types}",
@@ -5,6 +5,7 @@ import bcrypt
 from database.connection import get_connection
 from database.audit import audit_log
 from core.auth import login_required, perm_required, current_actor, has_perm
+from services.online_service import remover_usuario_online
 
 
 def init_app(app):
@@ -108,15 +109,7 @@ def init_app(app):
         usuario_id = session.get("usuario_id")
 
         if usuario_id:
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute(
-                "DELETE FROM usuarios_online WHERE usuario_id = %s",
-                (usuario_id,),
-            )
-            conn.commit()
-            cur.close()
-            conn.close()
+            remover_usuario_online(usuario_id)
 
         session.clear()
 
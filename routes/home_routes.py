@@ -1,7 +1,9 @@
-from flask import jsonify, render_template, session
+from flask import Response, jsonify, render_template, request, session
 
 from core.auth import current_actor, has_perm, login_required
 from services.dashboard_operacional_service import (
+    get_dashboard_detail,
+    get_dashboard_detail_version,
     get_dashboard_snapshot_status,
     get_or_start_dashboard_snapshot,
     unlock_dashboard_snapshot,
@@ -46,6 +48,39 @@ def init_app(app):
 
         return jsonify(get_dashboard_snapshot_status())
 
+    @app.route("/dashboard/detail")
+    @login_required
+    def dashboard_detail():
+        if not has_perm("dashboard.operacional_acessar"):
+            return jsonify({
+                "ok": False,
+                "error": "Acesso negado para este recurso.",
+            }), 403
+
+        # Confere a versão antes de ler o blob: o navegador que já tem o
+        # detalhe atual recebe 304 sem o banco enviar o LONGBLOB.
+        updated_at = get_dashboard_detail_version()
+        if updated_at is not None:
+            etag = f'"{updated_at}"'
+            if request.headers.get("If-None-Match") == etag:
+                return Response(status=304, headers={"ETag": etag})
+
+        updated_at, body = get_dashboard_detail()
+
+        if body is None:
+            return jsonify({"ok": False, "error": "Detalhe do dashboard ainda não disponível."}), 404
+
+        etag = f'"{updated_at}"'
+
+        return Response(
+            body,
+            mimetype="application/json",
+            headers={
+                "ETag": etag,
+                "Cache-Control": "private, no-cache",
+            },
+        )
+
     @app.route("/dashboard/destravar", methods=["POST"])
     @login_required
     def dashboard_unlock():
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+
+from flask import Response, jsonify, request
+
+from core.auth import login_required, any_perm
+from core.job_events import latest, wait_for_update
+
+# Cada stream aberto ocupa uma thread do servidor, então o canal vem desligado
+# (todos os fronts ficam no polling de status). Só ligue JOB_EVENTS_ENABLED=true
+# com workers com threads (gunicorn -k gthread --threads N); com workers sync
+# cada aba acompanhando um job prende um worker inteiro. O stream é encerrado
+# antes do timeout padrão do gunicorn e o EventSource reconecta sozinho.
+JOB_EVENTS_ENABLED = os.getenv("JOB_EVENTS_ENABLED", "false").lower() in ("1", "true", "yes")
+HEARTBEAT_SECONDS = int(os.getenv("JOB_EVENTS_HEARTBEAT_SECONDS", "10"))
+STREAM_MAX_SECONDS = int(os.getenv("JOB_EVENTS_STREAM_MAX_SECONDS", "25"))
+RETRY_MS = 3000
+
+# Tipo de job -> permissões aceitas e formato do corpo, igual ao do endpoint
+# de status correspondente (o front usa o mesmo tratamento nos dois casos).
+#   "job": {"ok": True, "job": estado}
+#   "flat": {"ok": True, **estado}
+#   "success": {"success": True, **estado} (DDC)
+# O dashboard operacional não tem canal: a página fica aberta o dia todo e
+# segue no polling de status.
+JOB_EVENT_KINDS = {
+    "relatorios": {
+        "perms": (
+            "relatorios.acessar",
+            "relatorios.redes_acessar",
+            "relatorios.termometro_acessar",
+            "relatorios.recursos_atualizar",
+        ),
+        "body": "job",
+    },
+    "usuarios_export": {
+        "perms": ("ofs.consultar",),
+        "body": "flat",
+    },
+    "desativar_inativos": {
+        "perms": ("ofs.desativar",),
+        "body": "flat",
+    },
+    "erros_import": {
+        "perms": ("ofs.activities_errors",),
+        "body": "job",
+    },
+    "ddc_massivo": {
+        "perms": ("ddc.mensageria",),
+        "body": "success",
+    },
+}
+
+
+def _event_body(kind: str, payload: dict) -> dict:
+    body = JOB_EVENT_KINDS[kind]["body"]
+
+    if body == "job":
+        return {"ok": True, "job": payload}
+    if body == "flat":
+        return {"ok": True, **payload}
+    return {"success": True, **payload}
+
+
+def _sse(event: str, data, event_id=None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _stream_job_events(kind: str, job_id: str, last_event_id: int = 0):
+    """
+    Envia o estado atual e cada atualização publicada pelo job.
+
+    "status" carrega o mesmo corpo do endpoint de status; "final" avisa que o
+    job terminou (o front consulta o status uma última vez e fecha). Na
+    reconexão (Last-Event-ID) o estado já entregue não é reenviado. Se o canal
+    está desligado ou o job não publicou nada neste processo (outro worker,
+    reinício, job antigo), envia "fallback" e o front volta ao polling.
+    """
+    yield f"retry: {RETRY_MS}\n\n"
+
+    channel = latest(kind, job_id) if JOB_EVENTS_ENABLED else None
+    if channel is None:
+        yield _sse("fallback", {"ok": True})
+        return
+
+    started = time.monotonic()
+    version = last_event_id
+
+    while True:
+        if channel["version"] > version:
+            event = "final" if channel["terminal"] else "status"
+            yield _sse(event, _event_body(kind, channel["payload"]), channel["version"])
+
+            if channel["terminal"]:
+                return
+
+            version = channel["version"]
+
+        while True:
+            remaining = STREAM_MAX_SECONDS - (time.monotonic() - started)
+            if remaining <= 0:
+                # O EventSource reconecta sozinho após "retry".
+                return
+
+            channel = wait_for_update(kind, job_id, version, min(HEARTBEAT_SECONDS, remaining))
+            if channel is not None:
+                break
+
+            yield ": ping\n\n"
+
+
+def init_app(app):
+    @app.route("/eventos/jobs/<kind>/<job_id>", methods=["GET"])
+    @login_required
+    def job_events_stream(kind, job_id):
+        config = JOB_EVENT_KINDS.get(kind)
+        job_id = str(job_id or "").strip()
+
+        if not config or not job_id:
+            return jsonify({"ok": False, "error": "Canal de eventos inválido."}), 404
+
+        if not any_perm(*config["perms"]):
+            return jsonify({"ok": False, "error": "Acesso negado para este recurso."}), 403
+
+        try:
+            last_event_id = int(request.headers.get("Last-Event-ID") or 0)
+        except ValueError:
+            last_event_id = 0
+
+        return Response(
+            _stream_job_events(kind, job_id, last_event_id),
+            mimetype="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            },
+        )
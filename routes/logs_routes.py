@@ -14,9 +14,10 @@ from services.logs_service import (
 )
 
 
-def _page_url(endpoint, page):
+def _page_url(endpoint, cursor):
     args = request.args.to_dict(flat=True)
-    args["page"] = page
+    args.pop("page", None)
+    args["cursor"] = cursor
     args.pop("export", None)
     return url_for(endpoint, **args)
 
@@ -35,7 +36,8 @@ def init_app(app):
     def logs_view():
         filtros = build_log_filters(request.args, dashboard=False)
 
-        page = request.args.get("page", 1)
+        cursor = request.args.get("cursor")
+        exact_total = request.args.get("count") == "exact"
         per_page = request.args.get("per_page", 50)
         export = request.args.get("export") == "1"
 
@@ -74,14 +76,15 @@ def init_app(app):
 
         result = fetch_audit_logs(
             filtros,
-            page=page,
+            cursor=cursor,
             per_page=per_page,
+            exact_total=exact_total,
         )
 
         modules, actions = list_filter_options()
 
-        prev_page_url = _page_url("logs_view", result["page"] - 1) if result["has_prev"] else None
-        next_page_url = _page_url("logs_view", result["page"] + 1) if result["has_next"] else None
+        prev_page_url = _page_url("logs_view", result["prev_cursor"]) if result["has_prev"] else None
+        next_page_url = _page_url("logs_view", result["next_cursor"]) if result["has_next"] else None
 
         export_args = _current_args_without_export()
         export_args["export"] = 1
@@ -106,6 +109,7 @@ def init_app(app):
             per_page_options=LOGS_PER_PAGE_OPTIONS,
             pagination={
                 "total": result["total"],
+                "total_is_estimate": result["total_is_estimate"],
                 "page": result["page"],
                 "per_page": result["per_page"],
                 "total_pages": result["total_pages"],
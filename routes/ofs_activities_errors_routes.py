@@ -1,7 +1,6 @@
 from flask import render_template, request, jsonify, send_file, flash, redirect, url_for, session
 from datetime import datetime, date
 from io import BytesIO
-import threading
 import xlsxwriter
 import re
 
@@ -10,11 +9,16 @@ from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 
 from database.connection import get_connection
+from database.pagination import cached_count, fetch_keyset_page
 from core.auth import login_required, perm_required, current_actor
+from core import job_queue
 from core.utils import xlsx_auto_width
 from services.ofs_activities_errors_importer import (
+    ERRO_TIPOS,
+    ERRO_TIPOS_SAP,
+    erro_tipo_filter_sql,
+    erro_tipo_sql,
     validate_max_range_7_days,
-    run_import_job,
 )
 def _normalize_appt_number(value):
     s = str(value or "").strip()
@@ -413,22 +417,32 @@ def init_app(app):
         date_to = (request.args.get("dateTo") or today).strip()
         resources = (request.args.get("resources") or "02").strip()
 
+        erro_tipo = (request.args.get("erroTipo") or "").strip()
+        if erro_tipo not in ERRO_TIPOS:
+            erro_tipo = ""
+
         per_page = 50
-        page = request.args.get("page", default=1, type=int)
-        offset = (page - 1) * per_page
+        cursor_token = request.args.get("cursor")
 
         conn = get_connection()
         cur = conn.cursor(dictionary=True)
 
-        cur.execute("""
+        where_sql = "`date` BETWEEN %s AND %s"
+        params = [date_from, date_to]
+
+        if erro_tipo:
+            tipo_sql, tipo_params = erro_tipo_filter_sql([erro_tipo])
+            where_sql += f" AND {tipo_sql}"
+            params.extend(tipo_params)
+
+        total = cached_count(cur, f"""
             SELECT COUNT(*) AS total
             FROM ofs_activities_errors
-            WHERE `date` BETWEEN %s AND %s
-        """, (date_from, date_to))
-        total = (cur.fetchone() or {}).get("total", 0)
+            WHERE {where_sql}
+        """, params)
         total_pages = max(1, (total + per_page - 1) // per_page)
 
-        cur.execute("""
+        result = fetch_keyset_page(cur, f"""
         SELECT
             activity_id AS activityId,
             `date` AS date,
@@ -444,47 +458,33 @@ def init_app(app):
             sap_error_raw_extracted AS sapErrorRawExtracted,
             sap_response_message AS sapResponseMessage,
             sap_error_category AS sapErrorCategory,
-            CASE
-                WHEN COALESCE(TRIM(xa_sap_crt), '') = '1'
-                AND (
-                        TRIM(COALESCE(xa_res_api_ng_response, '')) LIKE '<![CDATA[%'
-                    OR TRIM(COALESCE(xa_api_ng_dispatch, ''))     LIKE '<![CDATA[%'
-                )
-                    THEN 'Erro SAP/NG'
-
-                WHEN COALESCE(TRIM(xa_sap_crt), '') = '1'
-                    THEN 'Erro SAP'
-
-                WHEN COALESCE(TRIM(xa_sap_crt), '') <> '1'
-                AND (
-                        TRIM(COALESCE(xa_res_api_ng_response, '')) LIKE '<![CDATA[%'
-                    OR TRIM(COALESCE(xa_api_ng_dispatch, ''))     LIKE '<![CDATA[%'
-                )
-                    THEN 'Erro NG'
-
-                ELSE '-'
-            END AS erro_tipo,
+            {erro_tipo_sql()} AS erro_tipo,
             last_seen_at
         FROM ofs_activities_errors
-        WHERE `date` BETWEEN %s AND %s
-        ORDER BY `date` DESC, last_seen_at DESC
-        LIMIT %s OFFSET %s
-        """, (date_from, date_to, per_page, offset))
-
-        items = cur.fetchall()
+        """,
+            where_sql,
+            params,
+            [("`date`", "date"), ("last_seen_at", "last_seen_at"), ("activity_id", "activityId")],
+            per_page,
+            cursor_token,
+        )
 
         cur.close()
         conn.close()
 
         return render_template(
             "ofs_activities_errors/ofs_activities_errors.html",
-            items=items,
+            items=result["items"],
             total=total,
-            page=page,
+            page=result["page"],
             total_pages=total_pages,
+            prev_cursor=result["prev_cursor"],
+            next_cursor=result["next_cursor"],
             date_from=date_from,
             date_to=date_to,
-            resources=resources
+            resources=resources,
+            erro_tipo=erro_tipo,
+            erro_tipos=ERRO_TIPOS,
         )
 
     @app.route("/ofs/activities-errors/<activity_id>", methods=["GET"])
@@ -553,6 +553,16 @@ def init_app(app):
         """, (date_from, date_to))
         total_ng = (cur.fetchone() or {}).get("total_ng", 0)
 
+        # Total por tipo de erro (coluna classificada na importação)
+        cur.execute(f"""
+            SELECT {erro_tipo_sql()} AS erro_tipo, COUNT(*) AS qtd
+            FROM ofs_activities_errors
+            WHERE `date` BETWEEN %s AND %s
+            GROUP BY {erro_tipo_sql()}
+            ORDER BY qtd DESC
+        """, (date_from, date_to))
+        by_erro_tipo = cur.fetchall()
+
         # Top mensagens (considerando dispatch e response juntos)
         cur.execute("""
             SELECT msg, COUNT(*) AS qtd
@@ -643,6 +653,7 @@ def init_app(app):
             date_from=date_from,
             date_to=date_to,
             by_owner=by_owner,
+            by_erro_tipo=by_erro_tipo,
             resources=resources
         )
 
@@ -673,6 +684,15 @@ def init_app(app):
         """, (date_from, date_to))
         total_ng = (cur.fetchone() or {}).get("total_ng", 0)
 
+        cur.execute(f"""
+            SELECT {erro_tipo_sql()} AS erro_tipo, COUNT(*) AS qtd
+            FROM ofs_activities_errors
+            WHERE `date` BETWEEN %s AND %s
+            GROUP BY {erro_tipo_sql()}
+            ORDER BY qtd DESC
+        """, (date_from, date_to))
+        by_erro_tipo = cur.fetchall()
+
         cur.execute("""
             SELECT msg, COUNT(*) AS qtd
             FROM (
@@ -832,7 +852,9 @@ def init_app(app):
         """, (date_from, date_to))
         top_sap_messages = cur.fetchall()
 
-        cur.execute("""
+        sap_filter_sql, sap_filter_params = erro_tipo_filter_sql(ERRO_TIPOS_SAP, alias="e")
+
+        cur.execute(f"""
             SELECT
                 COALESCE(e.activity_type, '-') AS activityType,
                 COALESCE(
@@ -850,7 +872,7 @@ def init_app(app):
                 ON c.activity_type = e.activity_type
                AND c.ativo = 1
             WHERE e.`date` BETWEEN %s AND %s
-              AND COALESCE(TRIM(e.xa_sap_crt), '') = '1'
+              AND {sap_filter_sql}
             GROUP BY
                 COALESCE(e.activity_type, '-'),
                 COALESCE(
@@ -861,7 +883,7 @@ def init_app(app):
                 COALESCE(atm.category, 'customer_home')
             ORDER BY qtd DESC
             LIMIT 20
-        """, (date_from, date_to))
+        """, (date_from, date_to, *sap_filter_params))
         sap_by_activity_type = cur.fetchall()
         cur.close()
         conn.close()
@@ -879,6 +901,7 @@ def init_app(app):
             "date_to": date_to,
             "top_sap_messages": top_sap_messages,
             "sap_by_activity_type": sap_by_activity_type,
+            "by_erro_tipo": by_erro_tipo,
             "debug_marker": "ROTA_NOVA_SAP",
             "resources": resources
         }), 200
@@ -890,11 +913,22 @@ def init_app(app):
         date_from = (request.args.get("dateFrom") or today).strip()
         date_to = (request.args.get("dateTo") or today).strip()
         resources = (request.args.get("resources") or "02").strip()
+        erro_tipo = (request.args.get("erroTipo") or "").strip()
+        if erro_tipo not in ERRO_TIPOS:
+            erro_tipo = ""
 
         conn = get_connection()
         cur = conn.cursor(dictionary=True)
 
-        cur.execute("""
+        erro_tipo_where = ""
+        params = [date_from, date_to]
+
+        if erro_tipo:
+            tipo_sql, tipo_params = erro_tipo_filter_sql([erro_tipo])
+            erro_tipo_where = f"AND {tipo_sql}"
+            params.extend(tipo_params)
+
+        cur.execute(f"""
             SELECT
                 activity_id,
                 city,
@@ -906,10 +940,12 @@ def init_app(app):
                 sap_error_raw_extracted,
                 sap_response_message,
                 sap_error_category,
+                {erro_tipo_sql()} AS erro_tipo,
                 xa_sap_crt_ldg,
                 `date`
             FROM ofs_activities_errors
             WHERE `date` BETWEEN %s AND %s
+            {erro_tipo_where}
             AND activity_type IN (
                     'INS',
                     'SUP_QUA',
@@ -928,7 +964,7 @@ def init_app(app):
                     OR NULLIF(TRIM(xa_sap_crt_ldg), '') IS NOT NULL
             )
             ORDER BY `date` DESC, activity_type, city, appt_number
-        """, (date_from, date_to))
+        """, tuple(params))
 
         rows = cur.fetchall()
         cur.close()
@@ -949,6 +985,7 @@ def init_app(app):
             "sap_error_raw_extracted",
             "sap_response_message",
             "sap_error_category",
+            "erro_tipo",
             "xa_sap_crt_ldg",
             "date",
         ]
@@ -966,6 +1003,7 @@ def init_app(app):
                 row.get("sap_error_raw_extracted"),
                 row.get("sap_response_message"),
                 row.get("sap_error_category"),
+                row.get("erro_tipo"),
                 row.get("xa_sap_crt_ldg"),
                 row.get("date"),
             ])
@@ -1150,23 +1188,28 @@ def init_app(app):
         actor = current_actor()
         username = actor.get("username")
 
+        try:
+            job_queue.ensure_capacity("erros_import", username)
+        except job_queue.JobQueueFull as e:
+            return jsonify({"ok": False, "error": str(e)}), 429
+
         conn = get_connection()
         cur = conn.cursor()
         cur.execute("""
             INSERT INTO ofs_import_jobs (module, status, progress, message, created_by)
-            VALUES ('ofs.activities_errors', 'running', 0, 'Iniciando...', %s)
+            VALUES ('ofs.activities_errors', 'queued', 0, 'Na fila...', %s)
         """, (username,))
         job_id = cur.lastrowid
         conn.commit()
         cur.close()
         conn.close()
 
-        t = threading.Thread(
-            target=run_import_job,
-            args=(job_id, date_from, date_to, resources, username),
-
+        job_queue.submit(
+            "erros_import",
+            job_id,
+            (job_id, date_from, date_to, resources, username),
+            user_key=username,
         )
-        t.start()
 
         return jsonify({"ok": True, "jobId": job_id}), 200
 
@@ -1199,7 +1242,7 @@ def init_app(app):
         cur.execute("""
             UPDATE ofs_import_jobs
             SET cancel_requested=1, message='Cancelamento solicitado...'
-            WHERE id=%s AND module='ofs.activities_errors' AND status='running'
+            WHERE id=%s AND module='ofs.activities_errors' AND status IN ('queued', 'running')
         """, (job_id,))
         conn.commit()
         cur.close()
@@ -1,9 +1,10 @@
 from flask import render_template, request, send_file, redirect, url_for, flash
 from datetime import datetime
 from io import BytesIO
-from urllib.parse import urlencode
 import re
 
+import requests
+
 from openpyxl import Workbook
 
 from database.connection import get_connection
@@ -288,43 +289,12 @@ def init_app(app):
             "date",
         ]
 
-        base_params = {
-            "dateFrom": date_from,
-            "dateTo": date_to,
-            "resources": resources,
-            "fields": ",".join(fields),
-            "limit": 2000,
-            "offset": 0,
-        }
-
-        items = []
-        has_more = True
-        max_pages = 30
-        page = 0
-
-        try:
-            while has_more and page < max_pages:
-                qs = urlencode(base_params, safe="=,'")
-                url = f"{client.base_url}/activities/?{qs}"
-                data = client.authenticated_get(url)
-
-                batch = data.get("items") or []
-                items.extend(batch)
-
-                has_more = bool(data.get("hasMore"))
-                if has_more:
-                    base_params["offset"] = len(items)
-                page += 1
-
-        except Exception as e:
-            flash(f"❌ Falha ao importar da API: {e}", "danger")
-            return redirect(url_for("ofs_atividades_base", dateFrom=date_from, dateTo=date_to, resources=resources))
-
         conn = get_connection()
         cur = conn.cursor()
 
         inserted = 0
         updated = 0
+        total_api = 0
 
         sql = """
             INSERT INTO ofs_atividades_base
@@ -353,35 +323,56 @@ def init_app(app):
                 `date` = VALUES(`date`),
                 last_seen_at = NOW()
         """
-        for a in items:
-            activity_id = str(a.get("activityId") or "").strip()
-            if not activity_id:
-                continue
+        try:
+            for a in client.iter_activities(
+                date_from,
+                date_to,
+                resources,
+                fields=fields,
+                limit=2000,
+                max_pages=30,
+            ):
+                total_api += 1
+
+                activity_id = str(a.get("activityId") or "").strip()
+                if not activity_id:
+                    continue
+
+                appt_number = str(a.get("apptNumber") or "").strip() or None
+                appt_number_norm = normalize_appt_number(appt_number)
+
+                cur.execute(sql, (
+                    activity_id,
+                    str(a.get("city") or "") or None,
+                    str(a.get("activityType") or "") or None,
+                    appt_number,
+                    appt_number_norm or None,
+                    str(a.get("XA_ORIGIN_BUCKET") or "") or None,
+                    str(a.get("resourceId") or "") or None,
+                    str(a.get("status") or "") or None,
+                    str(a.get("XA_ORG_SYS") or "") or None,
+                    str(a.get("date") or "") or None,
+                ))
+
+                if cur.rowcount == 1:
+                    inserted += 1
+                elif cur.rowcount == 2:
+                    updated += 1
+
+            conn.commit()
+
+        except requests.RequestException as e:
+            conn.rollback()
+            flash(f"❌ Falha ao importar da API: {e}", "danger")
+            return redirect(url_for("ofs_atividades_base", dateFrom=date_from, dateTo=date_to, resources=resources))
 
-            appt_number = str(a.get("apptNumber") or "").strip() or None
-            appt_number_norm = normalize_appt_number(appt_number)
+        except Exception:
+            conn.rollback()
+            raise
 
-            cur.execute(sql, (
-                activity_id,
-                str(a.get("city") or "") or None,
-                str(a.get("activityType") or "") or None,
-                appt_number,
-                appt_number_norm or None,
-                str(a.get("XA_ORIGIN_BUCKET") or "") or None,
-                str(a.get("resourceId") or "") or None,
-                str(a.get("status") or "") or None,
-                str(a.get("XA_ORG_SYS") or "") or None,
-                str(a.get("date") or "") or None,
-            ))
-
-            if cur.rowcount == 1:
-                inserted += 1
-            elif cur.rowcount == 2:
-                updated += 1
-
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        flash(f"Importação concluída. Novos: {inserted} | Atualizados: {updated} | Total API: {len(items)}", "success")
+        finally:
+            cur.close()
+            conn.close()
+
+        flash(f"Importação concluída. Novos: {inserted} | Atualizados: {updated} | Total API: {total_api}", "success")
         return redirect(url_for("ofs_atividades_base", dateFrom=date_from, dateTo=date_to, resources=resources))
\ No newline at end of file
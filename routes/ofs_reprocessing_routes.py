@@ -1,12 +1,11 @@
 from flask import render_template, request, jsonify
 from datetime import datetime
-import threading
 
 from database.connection import get_connection
 from core.auth import login_required, perm_required, current_actor
+from core import job_queue
 from services.ofs_reprocessing_service import (
     fetch_reprocessing_targets,
-    run_reprocess_job,
     EXCLUDED_ACTIVITY_TYPES,
 )
 
@@ -193,6 +192,11 @@ def init_app(app):
         actor = current_actor()
         username = actor.get("username") or "desconhecido"
 
+        try:
+            job_queue.ensure_capacity("reprocessamento", username)
+        except job_queue.JobQueueFull as e:
+            return jsonify({"ok": False, "error": str(e)}), 429
+
         conn = get_connection()
         cur = conn.cursor()
 
@@ -226,12 +230,7 @@ def init_app(app):
             cur.close()
             conn.close()
 
-        t = threading.Thread(
-            target=run_reprocess_job,
-            args=(job_id, targets),
-            daemon=True,
-        )
-        t.start()
+        job_queue.submit("reprocessamento", job_id, (job_id, targets), user_key=username)
 
         return jsonify({
             "ok": True,
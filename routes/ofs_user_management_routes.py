@@ -7,13 +7,15 @@ import os
 import json
 import uuid
 import time
-import threading
 from pathlib import Path
 from database.connection import get_connection
 from database.audit import audit_log
 from ofs.client import OFSClient
 from ofs.cleanup import find_stale_users, execute_cleanup
+from services.ofs_resource_hierarchy_service import ensure_resources, get_resource_hierarchy
 from core.auth import login_required, perm_required, current_actor
+from core.job_events import publish as publish_job_event
+from core import job_queue
 
 def _now_iso():
     return datetime.now().isoformat(timespec="seconds")
@@ -49,6 +51,7 @@ def _write_ofs_users_job_status(base_dir: str, job_id: str, payload: dict):
                 os.fsync(f.fileno())
 
             os.replace(tmp_path, paths["status"])
+            publish_job_event("usuarios_export", job_id, payload)
             return
 
         except PermissionError as e:
@@ -153,18 +156,21 @@ def _run_export_usuarios_ofs_job(base_dir: str, job_id: str, actor: dict):
         status_payload["progress_percent"] = 20
         _write_ofs_users_job_status(base_dir, job_id, status_payload)
 
-        hierarchy = client.get_resources_hierarchy_map(
-            progress_callback=on_resources_progress
+        hierarchy, hierarchy_info = get_resource_hierarchy(
+            client=client,
+            progress_callback=on_resources_progress,
         )
 
-        bucket_map = hierarchy["bucket_by_resource"]
-        bucket_name_map = hierarchy["bucket_name_by_resource"]
-
-        bucket_parent_map = hierarchy["bucket_parent_by_resource"]
-        bucket_parent_name_map = hierarchy["bucket_parent_name_by_resource"]
+        # Recursos criados depois do último refresh são buscados um a um.
+        hierarchy, fetched_resources = ensure_resources(
+            hierarchy,
+            (u.get("mainResourceId") or u.get("main_resource_id") for u in usuarios_raw),
+            client=client,
+        )
 
-        bucket_grandparent_map = hierarchy["bucket_grandparent_by_resource"]
-        bucket_grandparent_name_map = hierarchy["bucket_grandparent_name_by_resource"]
+        status_payload["processed_resources"] = len(hierarchy)
+        status_payload["resources_source"] = hierarchy_info.get("source")
+        status_payload["resources_fetched_incremental"] = fetched_resources
 
         status_payload["phase"] = "Mapa de recursos e buckets carregado"
         status_payload["progress_percent"] = 75
@@ -198,14 +204,10 @@ def _run_export_usuarios_ofs_job(base_dir: str, job_id: str, actor: dict):
                 main_res = u.get("mainResourceId") or u.get("main_resource_id")
                 main_res_key = str(main_res) if main_res else ""
 
-                bucket = bucket_map.get(main_res_key, "-") if main_res_key else "-"
-                bucket_name = bucket_name_map.get(main_res_key, "-") if main_res_key else "-"
-
-                bucket_parent = bucket_parent_map.get(main_res_key, "-") if main_res_key else "-"
-                bucket_parent_name = bucket_parent_name_map.get(main_res_key, "-") if main_res_key else "-"
-
-                bucket_grandparent = bucket_grandparent_map.get(main_res_key, "-") if main_res_key else "-"
-                bucket_grandparent_name = bucket_grandparent_name_map.get(main_res_key, "-") if main_res_key else "-"
+                bucket, bucket_parent, bucket_grandparent = hierarchy.bucket_chain(main_res_key, levels=3)
+                bucket_name = hierarchy.name(bucket)
+                bucket_parent_name = hierarchy.name(bucket_parent)
+                bucket_grandparent_name = hierarchy.name(bucket_grandparent)
 
                 writer.writerow([
                     u.get("name", "-"),
@@ -256,7 +258,7 @@ def _run_export_usuarios_ofs_job(base_dir: str, job_id: str, actor: dict):
                     "filename": filename,
                     "total_users": total_users,
                     "processed_resources": status_payload.get("processed_resources"),
-                    "bucket_source": "resources_hierarchy_map",
+                    "bucket_source": f"resources_hierarchy_{hierarchy_info.get('source')}",
                     "hierarchy_levels": 3,
                 },
             )
@@ -367,6 +369,7 @@ def _write_cleanup_status(base_dir: str, job_id: str, payload: dict):
     _ensure_cleanup_dir(base_dir)
     paths = _cleanup_job_paths(base_dir, job_id)
     _write_cleanup_json(paths["status"], payload)
+    publish_job_event("desativar_inativos", job_id, payload)
 
 
 def _read_cleanup_status(base_dir: str, job_id: str):
@@ -866,6 +869,87 @@ def _cleanup_debug_log(base_dir: str, job_id: str, message: str, extra: dict = N
 
     except Exception as e:
         print(f"[cleanup-debug] falha ao gravar log: {e}")
+def _actor_user_key(actor: dict):
+    return (actor or {}).get("id") or (actor or {}).get("username")
+
+
+def _mark_ofs_users_job_queued(position: int, base_dir: str, job_id: str, *args):
+    status = _read_ofs_users_job_status(base_dir, job_id) or {}
+
+    if status.get("status") != "queued":
+        return
+
+    status.update({
+        "queue_position": position,
+        "phase": f"Na fila - posição {position}",
+    })
+    _write_ofs_users_job_status(base_dir, job_id, status)
+
+
+def _mark_cleanup_job_queued(position: int, base_dir: str, job_id: str, *args):
+    status = _read_cleanup_status(base_dir, job_id) or {}
+
+    if status.get("status") != "queued":
+        return
+
+    status.update({
+        "queue_position": position,
+        "phase": f"Na fila - posição {position}",
+    })
+    _write_cleanup_status(base_dir, job_id, status)
+
+
+def _interrupted_status(status: dict) -> dict:
+    status.update({
+        "status": "error",
+        "phase": "Interrompido por reinício do servidor",
+        "finished_at": _now_iso(),
+        "error": "O servidor reiniciou durante a execução. Inicie novamente.",
+    })
+    return status
+
+
+def _mark_ofs_users_job_interrupted(base_dir: str, job_id: str, *args):
+    status = _read_ofs_users_job_status(base_dir, job_id) or {}
+
+    if status.get("status") not in ("queued", "running"):
+        return
+
+    _write_ofs_users_job_status(base_dir, job_id, _interrupted_status(status))
+
+
+def _mark_cleanup_job_interrupted(base_dir: str, job_id: str, *args):
+    status = _read_cleanup_status(base_dir, job_id) or {}
+
+    if status.get("status") not in ("queued", "running"):
+        return
+
+    _write_cleanup_status(base_dir, job_id, _interrupted_status(status))
+
+
+job_queue.register_job(
+    "usuarios_export",
+    "ofs_users",
+    _run_export_usuarios_ofs_job,
+    _mark_ofs_users_job_queued,
+    _mark_ofs_users_job_interrupted,
+)
+job_queue.register_job(
+    "desativar_inativos_simulacao",
+    "ofs_users",
+    _run_cleanup_simulation_job,
+    _mark_cleanup_job_queued,
+    _mark_cleanup_job_interrupted,
+)
+job_queue.register_job(
+    "desativar_inativos_aplicacao",
+    "ofs_users",
+    _run_cleanup_apply_job,
+    _mark_cleanup_job_queued,
+    _mark_cleanup_job_interrupted,
+)
+
+
 def init_app(app):
 
     @app.route("/consultar-usuarios")
@@ -877,6 +961,13 @@ def init_app(app):
     @login_required
     @perm_required("ofs.consultar")
     def iniciar_exportacao_usuarios_ofs():
+        actor = current_actor()
+
+        try:
+            job_queue.ensure_capacity("usuarios_export", _actor_user_key(actor))
+        except job_queue.JobQueueFull as e:
+            return jsonify({"ok": False, "error": str(e)}), 429
+
         job_id = uuid.uuid4().hex
         base_dir = os.path.join(app.instance_path, "reports", "ofs_users")
         filename = f"usuarios_ofs_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id[:8]}.csv"
@@ -894,19 +985,18 @@ def init_app(app):
 
         _write_ofs_users_job_status(base_dir, job_id, status_payload)
 
-        actor = current_actor()
-
-        thread = threading.Thread(
-            target=_run_export_usuarios_ofs_job,
-            args=(base_dir, job_id, actor),
-            daemon=True,
+        job_queue.submit(
+            "usuarios_export",
+            job_id,
+            (base_dir, job_id, actor),
+            user_key=_actor_user_key(actor),
         )
-        thread.start()
 
         return jsonify({
             "ok": True,
             "job_id": job_id,
             "status_url": url_for("status_exportacao_usuarios_ofs", job_id=job_id),
+            "events_url": url_for("job_events_stream", kind="usuarios_export", job_id=job_id),
             "download_url": url_for("download_exportacao_usuarios_ofs", job_id=job_id),
         })
 
@@ -1426,6 +1516,11 @@ def init_app(app):
 
         actor = current_actor()
 
+        try:
+            job_queue.ensure_capacity("desativar_inativos_simulacao", _actor_user_key(actor))
+        except job_queue.JobQueueFull as e:
+            return jsonify({"ok": False, "error": str(e)}), 429
+
         initial_status = {
             "ok": True,
             "job_id": job_id,
@@ -1447,17 +1542,18 @@ def init_app(app):
 
         _write_cleanup_status(base_dir, job_id, initial_status)
 
-        thread = threading.Thread(
-            target=_run_cleanup_simulation_job,
-            args=(base_dir, job_id, actor, config),
-            daemon=True,
+        job_queue.submit(
+            "desativar_inativos_simulacao",
+            job_id,
+            (base_dir, job_id, actor, config),
+            user_key=_actor_user_key(actor),
         )
-        thread.start()
 
         return jsonify({
             "ok": True,
             "job_id": job_id,
             "status_url": url_for("desativar_inativos_status", job_id=job_id),
+            "events_url": url_for("job_events_stream", kind="desativar_inativos", job_id=job_id),
             "download_url": url_for("desativar_inativos_download", job_id=job_id),
         })
 
@@ -1579,6 +1675,11 @@ def init_app(app):
         apply_job_id = uuid.uuid4().hex
         actor = current_actor()
 
+        try:
+            job_queue.ensure_capacity("desativar_inativos_aplicacao", _actor_user_key(actor))
+        except job_queue.JobQueueFull as e:
+            return jsonify({"ok": False, "error": str(e)}), 429
+
         initial_status = {
             "ok": True,
             "job_id": apply_job_id,
@@ -1596,16 +1697,19 @@ def init_app(app):
 
         _write_cleanup_status(base_dir, apply_job_id, initial_status)
 
-        thread = threading.Thread(
-            target=_run_cleanup_apply_job,
-            args=(base_dir, apply_job_id, job_id, actor, candidates),
-            daemon=True,
+        # Aplicação é ação explícita do admin sobre uma simulação pronta.
+        job_queue.submit(
+            "desativar_inativos_aplicacao",
+            apply_job_id,
+            (base_dir, apply_job_id, job_id, actor, candidates),
+            user_key=_actor_user_key(actor),
+            priority=job_queue.PRIORITY_HIGH,
         )
-        thread.start()
 
         return jsonify({
             "ok": True,
             "job_id": apply_job_id,
             "status_url": url_for("desativar_inativos_status", job_id=apply_job_id),
+            "events_url": url_for("job_events_stream", kind="desativar_inativos", job_id=apply_job_id),
             "download_url": url_for("desativar_inativos_download", job_id=apply_job_id),
         })
\ No newline at end of file
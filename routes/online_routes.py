@@ -1,6 +1,7 @@
 from flask import jsonify, session
 
 from core.auth import login_required
+from core.rate_limit import rate_limiter_stats
 from services.online_service import obter_usuarios_online_count, listar_usuarios_online
 
 
@@ -25,4 +26,18 @@ def init_app(app):
         return jsonify({
             "ok": True,
             "usuarios": listar_usuarios_online(),
-        })
\ No newline at end of file
+        })
+
+    @app.route("/status-rate-limits")
+    @login_required
+    def status_rate_limits():
+        if session.get("tipo_id") != 1:
+            return jsonify({
+                "ok": False,
+                "error": "Apenas administrador pode visualizar os limitadores.",
+            }), 403
+
+        return jsonify({
+            "ok": True,
+            "limiters": rate_limiter_stats(),
+        })
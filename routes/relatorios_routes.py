@@ -4,11 +4,13 @@ import requests
 from flask import render_template, request, jsonify, send_file, flash, redirect, url_for
 
 from core.auth import login_required, perm_required, current_actor, has_perm
+from core.job_queue import JobQueueFull
 from database.audit import audit_log
 from services.ofs_os_report_service import (
     RESOURCE_TYPES,
     STATUS_OPTIONS,
     discard_job,
+    estimate_report_job,
     get_xlsx_path,
     list_ofs_os_activity_types,
     list_redes_activity_types,
@@ -85,6 +87,12 @@ def init_app(app):
                 "error": str(e),
             }), 400
 
+        except JobQueueFull as e:
+            return jsonify({
+                "ok": False,
+                "error": str(e),
+            }), 429
+
         except Exception as e:
             return jsonify({
                 "ok": False,
@@ -217,6 +225,13 @@ def init_app(app):
                 payload,
                 can_view_extra_fields=has_perm("relatorios.campos_extras"),
             )
+
+            if payload.get("dryRun"):
+                return jsonify({
+                    "ok": True,
+                    "estimate": estimate_report_job(config),
+                }), 200
+
             job_id = start_redes_report_job(
                 base_dir=_redes_reports_base_dir(),
                 actor=current_actor(),
@@ -234,6 +249,12 @@ def init_app(app):
                 "error": str(e),
             }), 400
 
+        except JobQueueFull as e:
+            return jsonify({
+                "ok": False,
+                "error": str(e),
+            }), 429
+
         except Exception as e:
             return jsonify({
                 "ok": False,
@@ -372,6 +393,12 @@ def init_app(app):
                 "message": "Atualização da lista de recursos iniciada em segundo plano.",
             }), 202
 
+        except JobQueueFull as e:
+            return jsonify({
+                "ok": False,
+                "error": str(e),
+            }), 429
+
         except Exception as e:
             return jsonify({
                 "ok": False,
@@ -441,6 +468,13 @@ def init_app(app):
                 payload,
                 can_view_extra_fields=has_perm("relatorios.campos_extras"),
             )
+
+            if payload.get("dryRun"):
+                return jsonify({
+                    "ok": True,
+                    "estimate": estimate_report_job(config),
+                }), 200
+
             job_id = start_report_job(
                 base_dir=_reports_base_dir(),
                 actor=current_actor(),
@@ -458,6 +492,12 @@ def init_app(app):
                 "error": str(e),
             }), 400
 
+        except JobQueueFull as e:
+            return jsonify({
+                "ok": False,
+                "error": str(e),
+            }), 429
+
         except Exception as e:
             return jsonify({
                 "ok": False,
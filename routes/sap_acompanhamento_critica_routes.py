@@ -1,8 +1,10 @@
 from flask import render_template, request, redirect, url_for, flash, jsonify
 from datetime import datetime
-from urllib.parse import urlencode
+
+import requests
 
 from database.connection import get_connection
+from database.bulk import bulk_insert_ignore
 from ofs.client import OFSClient
 from core.auth import login_required, perm_required
 
@@ -73,76 +75,73 @@ def init_app(app):
             "date",
         ]
 
-        base_params = {
-            "dateFrom": date_from,
-            "dateTo": date_to,
-            "resources": resources,
-            "q": "XA_SAP_CRT==1",
-            "fields": ",".join(fields),
-            "limit": 2000,
-            "offset": 0,
-        }
-
-        items = []
-        has_more = True
-        max_pages = 20
-        page = 0
-
-        try:
-            while has_more and page < max_pages:
-                qs = urlencode(base_params, safe="=,'")
-                url = f"{client.base_url}/activities/?{qs}"
-                data = client.authenticated_get(url)
+        conn = get_connection()
+        cur = conn.cursor()
 
-                batch = data.get("items") or []
-                items.extend(batch)
+        inserted = 0
+        skipped = 0
 
-                has_more = bool(data.get("hasMore"))
-                if has_more:
-                    base_params["offset"] = len(items)
-                page += 1
+        columns = (
+            "activity_id",
+            "city",
+            "activity_type",
+            "appt_number",
+            "origin_bucket",
+            "resource_id",
+            "xa_sap_crt",
+            "xa_sap_crt_ldg",
+            "date",
+        )
 
-        except Exception as e:
+        try:
+            # Cada página é gravada assim que chega (mesma transação).
+            for page in client.iter_activity_pages(
+                date_from,
+                date_to,
+                resources,
+                q="XA_SAP_CRT==1",
+                fields=fields,
+                limit=2000,
+                max_pages=20,
+            ):
+                rows = []
+
+                for a in page["items"]:
+                    activity_id = str(a.get("activityId") or "").strip()
+                    if not activity_id:
+                        continue
+
+                    rows.append((
+                        activity_id,
+                        str(a.get("city") or "") or None,
+                        str(a.get("activityType") or "") or None,
+                        str(a.get("apptNumber") or "") or None,
+                        str(a.get("XA_ORIGIN_BUCKET") or "") or None,
+                        str(a.get("resourceId") or "") or None,
+                        1 if str(a.get("XA_SAP_CRT") or "").strip() == "1" else 0,
+                        a.get("XA_SAP_CRT_LDG"),
+                        str(a.get("date") or "") or None,
+                    ))
+
+                if rows:
+                    result = bulk_insert_ignore(cur, "sap_criticas_atividades", columns, rows)
+                    inserted += result["inserted"]
+                    skipped += result["ignored"]
+
+            conn.commit()
+
+        except requests.RequestException as e:
+            conn.rollback()
             flash(f"❌ Falha ao importar da API: {e}", "danger")
             return redirect(url_for("sap_acompanhamento_critica", dateFrom=date_from, dateTo=date_to, resources=resources))
 
-        conn = get_connection()
-        cur = conn.cursor()
-
-        inserted = 0
-        skipped = 0
+        except Exception:
+            conn.rollback()
+            raise
 
-        sql = """
-            INSERT IGNORE INTO sap_criticas_atividades
-            (activity_id, city, activity_type, appt_number, origin_bucket, resource_id, xa_sap_crt, xa_sap_crt_ldg, `date`)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """
-
-        for a in items:
-            activity_id = str(a.get("activityId") or "").strip()
-            if not activity_id:
-                continue
-
-            cur.execute(sql, (
-                activity_id,
-                str(a.get("city") or "") or None,
-                str(a.get("activityType") or "") or None,
-                str(a.get("apptNumber") or "") or None,
-                str(a.get("XA_ORIGIN_BUCKET") or "") or None,
-                str(a.get("resourceId") or "") or None,
-                1 if str(a.get("XA_SAP_CRT") or "").strip() == "1" else 0,
-                a.get("XA_SAP_CRT_LDG"),
-                str(a.get("date") or "") or None,
-            ))
-
-            if cur.rowcount == 1:
-                inserted += 1
-            else:
-                skipped += 1
-
-        conn.commit()
-        cur.close()
-        conn.close()
+        finally:
+            cur.close()
+            conn.close()
 
         flash(f"✅ Importação concluída. Novos: {inserted} | Já existiam: {skipped}", "success")
         return redirect(url_for("sap_acompanhamento_critica", dateFrom=date_from, dateTo=date_to, resources=resources))
@@ -1,17 +1,29 @@
 import json
 import os
+import queue
+import threading
+import time
 import uuid
 from datetime import datetime, date
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import requests
 
+from core import lookup_cache
 from database.connection import get_connection
+from database.bulk import bulk_insert
 from ofs.client import OFSClient
 
 
 API_LIMIT = 200
 
+# Pipeline da coleta: a busca na OFS, a montagem das tuplas e o INSERT rodam
+# ao mesmo tempo, ligados por filas limitadas (páginas e lotes de linhas em
+# espera), então o período inteiro nunca fica em memória.
+BI_PIPELINE_QUEUE_PAGES = int(os.getenv("BI_PIPELINE_QUEUE_PAGES", "4"))
+BI_PIPELINE_QUEUE_CHUNKS = int(os.getenv("BI_PIPELINE_QUEUE_CHUNKS", "4"))
+BI_INSERT_CHUNK_ROWS = int(os.getenv("BI_INSERT_CHUNK_ROWS", "1000"))
+
 FIELD_CITY = "city"
 
 CLOSE_REASON_FIELDS = [
@@ -349,7 +361,7 @@ def _resolve_activity_types_for_collection(
     return resolved
 
 
-def _load_resource_name_map() -> Dict[str, str]:
+def _query_resource_name_map() -> Dict[str, str]:
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     try:
@@ -374,7 +386,7 @@ def _load_resource_name_map() -> Dict[str, str]:
     return result
 
 
-def _build_type_label_map() -> Dict[str, str]:
+def _query_type_label_map() -> Dict[str, str]:
     type_map = _build_activity_type_map()
     return {
         code: (row.get("label_pt") or code)
@@ -382,6 +394,14 @@ def _build_type_label_map() -> Dict[str, str]:
     }
 
 
+def _load_resource_name_map() -> Dict[str, str]:
+    return lookup_cache.get("ofs_resources.active_names")
+
+
+def _build_type_label_map() -> Dict[str, str]:
+    return lookup_cache.get("activity_types.bi_labels")
+
+
 def _build_query(statuses: Optional[List[str]], activity_types: List[str]) -> str:
     """
     Regra já validada no projeto:
@@ -425,38 +445,35 @@ def _extract_http_error_detail(response: requests.Response) -> str:
     )
 
 
-def _fetch_activities_page(
-    client: OFSClient,
+def _iter_activity_pages_with_types(
     date_from: date,
     date_to: date,
-    q: str,
-    offset: int,
+    statuses: Optional[List[str]],
+    allowed_activity_types: List[str],
     resources: str,
-) -> Dict:
-    params = {
-        "dateFrom": date_from.strftime("%Y-%m-%d"),
-        "dateTo": date_to.strftime("%Y-%m-%d"),
-        "resources": resources,
-        "q": q,
-        "fields": _build_fields_param(),
-        "limit": API_LIMIT,
-        "offset": offset,
-    }
-
-    url = f"{client.base_url}/activities/"
+) -> Iterator[List[Dict]]:
+    """
+    Entrega as atividades página a página, à medida que a OFS responde.
+    """
+    q = _build_query(statuses=statuses, activity_types=allowed_activity_types)
 
-    response = requests.get(
-        url,
-        params=params,
-        headers={"Accept": "application/json"},
-        auth=client.auth,
-        timeout=120,
-    )
+    client = OFSClient()
 
-    if not response.ok:
-        raise BIActivitiesError(_extract_http_error_detail(response))
+    try:
+        for page in client.iter_activity_pages(
+            date_from=date_from.strftime("%Y-%m-%d"),
+            date_to=date_to.strftime("%Y-%m-%d"),
+            resources=resources,
+            q=q,
+            fields=_build_fields_param(),
+            limit=API_LIMIT,
+            timeout=120,
+        ):
+            if page["items"]:
+                yield page["items"]
 
-    return response.json()
+    except requests.HTTPError as exc:
+        raise BIActivitiesError(_extract_http_error_detail(exc.response)) from exc
 
 
 def _fetch_activities_with_types(
@@ -466,26 +483,17 @@ def _fetch_activities_with_types(
     allowed_activity_types: List[str],
     resources: str,
 ) -> List[Dict]:
-    q = _build_query(statuses=statuses, activity_types=allowed_activity_types)
-
-    client = OFSClient()
-
     items: List[Dict] = []
-    offset = 0
-
-    while True:
-        payload = _fetch_activities_page(client, date_from, date_to, q, offset, resources)
-
-        page_items = payload.get("items") or []
-        has_more = bool(payload.get("hasMore"))
 
+    for page_items in _iter_activity_pages_with_types(
+        date_from=date_from,
+        date_to=date_to,
+        statuses=statuses,
+        allowed_activity_types=allowed_activity_types,
+        resources=resources,
+    ):
         items.extend(page_items)
 
-        if not has_more or not page_items:
-            break
-
-        offset += len(page_items)
-
     return items
 
 
@@ -535,9 +543,13 @@ def _prepare_snapshot_rows(
     collected_at: datetime,
     snapshot_date: date,
     job_id: str,
+    type_label_map: Optional[Dict[str, str]] = None,
+    resource_name_map: Optional[Dict[str, str]] = None,
 ) -> List[Tuple]:
-    type_label_map = _build_type_label_map()
-    resource_name_map = _load_resource_name_map()
+    if type_label_map is None:
+        type_label_map = _build_type_label_map()
+    if resource_name_map is None:
+        resource_name_map = _load_resource_name_map()
 
     rows = []
 
@@ -582,6 +594,25 @@ def _prepare_snapshot_rows(
     return rows
 
 
+SNAPSHOT_COLUMNS = (
+    "job_id",
+    "collected_at",
+    "snapshot_date",
+    "activity_id",
+    "appt_number",
+    "status",
+    "activity_type_code",
+    "activity_type_label",
+    "resource_id",
+    "resource_name",
+    "close_reason_id",
+    "close_reason_property",
+    "close_reason",
+    "city",
+    "is_customer_home",
+)
+
+
 def insert_snapshot_rows(rows: List[Tuple]) -> int:
     if not rows:
         return 0
@@ -589,36 +620,204 @@ def insert_snapshot_rows(rows: List[Tuple]) -> int:
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.executemany(
-            """
-            INSERT INTO ofs_activities_bi_snapshot (
-                job_id,
-                collected_at,
-                snapshot_date,
-                activity_id,
-                appt_number,
-                status,
-                activity_type_code,
-                activity_type_label,
-                resource_id,
-                resource_name,
-                close_reason_id,
-                close_reason_property,
-                close_reason,
-                city,
-                is_customer_home
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            rows,
-        )
+        inserted = bulk_insert(cursor, "ofs_activities_bi_snapshot", SNAPSHOT_COLUMNS, rows)
         conn.commit()
-        return cursor.rowcount or 0
+        return inserted
     finally:
         cursor.close()
         conn.close()
 
 
+def _new_stage_stats() -> Dict:
+    return {"seconds": 0.0, "items": 0}
+
+
+def _stage_summary(stats: Dict) -> Dict:
+    seconds = stats["seconds"]
+    summary = dict(stats)
+    summary["seconds"] = round(seconds, 3)
+    summary["per_second"] = round(stats["items"] / seconds, 1) if seconds > 0 else None
+    return summary
+
+
+def _pipeline_put(target: queue.Queue, item, stop_event: threading.Event) -> bool:
+    """put que desiste quando o pipeline foi interrompido (False)."""
+    while not stop_event.is_set():
+        try:
+            target.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _pipeline_get(source: queue.Queue, stop_event: threading.Event):
+    """get que desiste quando o pipeline foi interrompido (None)."""
+    while not stop_event.is_set():
+        try:
+            return source.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return None
+
+
+def _fetch_stage(pages, pages_queue: queue.Queue, stats: Dict, stop_event: threading.Event) -> None:
+    iterator = iter(pages)
+
+    try:
+        while not stop_event.is_set():
+            started = time.monotonic()
+            page_items = next(iterator, None)
+            stats["seconds"] += time.monotonic() - started
+
+            if page_items is None:
+                _pipeline_put(pages_queue, ("end", None), stop_event)
+                return
+
+            stats["pages"] += 1
+            stats["items"] += len(page_items)
+
+            if not _pipeline_put(pages_queue, ("page", page_items), stop_event):
+                return
+
+    except Exception as exc:
+        _pipeline_put(pages_queue, ("error", exc), stop_event)
+
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+
+
+def _insert_stage(rows_queue: queue.Queue, stats: Dict, stop_event: threading.Event, outcome: Dict) -> None:
+    """
+    Insere os lotes numa única transação, que só é confirmada no fim da
+    coleta: job com erro não deixa snapshot pela metade.
+    """
+    conn = None
+    cursor = None
+
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        while True:
+            kind, chunk = rows_queue.get()
+
+            if kind == "abort":
+                conn.rollback()
+                return
+
+            if kind == "end":
+                conn.commit()
+                return
+
+            started = time.monotonic()
+            outcome["inserted"] += bulk_insert(cursor, "ofs_activities_bi_snapshot", SNAPSHOT_COLUMNS, chunk)
+            stats["seconds"] += time.monotonic() - started
+            stats["items"] += len(chunk)
+            stats["chunks"] += 1
+
+    except Exception as exc:
+        outcome["error"] = exc
+        stop_event.set()
+
+        if conn is not None:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+
+def _run_snapshot_pipeline(pages, build_rows) -> Tuple[int, int, Dict]:
+    """
+    Busca (thread própria) -> build_rows(página) nesta thread -> INSERT em
+    lotes de BI_INSERT_CHUNK_ROWS (thread própria). Retorna (buscadas,
+    inseridas, estatísticas por etapa).
+    """
+    pages_queue = queue.Queue(maxsize=max(1, BI_PIPELINE_QUEUE_PAGES))
+    rows_queue = queue.Queue(maxsize=max(1, BI_PIPELINE_QUEUE_CHUNKS))
+    stop_event = threading.Event()
+
+    fetch_stats = {**_new_stage_stats(), "pages": 0}
+    transform_stats = _new_stage_stats()
+    insert_stats = {**_new_stage_stats(), "chunks": 0}
+    outcome = {"inserted": 0, "error": None}
+
+    chunk_size = max(1, BI_INSERT_CHUNK_ROWS)
+    started_at = time.monotonic()
+
+    insert_thread = threading.Thread(
+        target=_insert_stage,
+        args=(rows_queue, insert_stats, stop_event, outcome),
+        name="bi-snapshot-insert",
+        daemon=True,
+    )
+    insert_thread.start()
+
+    threading.Thread(
+        target=_fetch_stage,
+        args=(pages, pages_queue, fetch_stats, stop_event),
+        name="bi-snapshot-fetch",
+        daemon=True,
+    ).start()
+
+    buffer: List[Tuple] = []
+
+    try:
+        while True:
+            event = _pipeline_get(pages_queue, stop_event)
+            if event is None:
+                break
+
+            kind, payload = event
+
+            if kind == "error":
+                raise payload
+
+            if kind == "end":
+                if buffer:
+                    _pipeline_put(rows_queue, ("rows", buffer), stop_event)
+                _pipeline_put(rows_queue, ("end", None), stop_event)
+                break
+
+            started = time.monotonic()
+            buffer.extend(build_rows(payload))
+            transform_stats["seconds"] += time.monotonic() - started
+            transform_stats["items"] += len(payload)
+
+            while len(buffer) >= chunk_size:
+                _pipeline_put(rows_queue, ("rows", buffer[:chunk_size]), stop_event)
+                buffer = buffer[chunk_size:]
+
+        insert_thread.join()
+
+    except Exception:
+        _pipeline_put(rows_queue, ("abort", None), stop_event)
+        raise
+
+    finally:
+        stop_event.set()
+
+    if outcome["error"] is not None:
+        raise outcome["error"]
+
+    stats = {
+        "seconds": round(time.monotonic() - started_at, 3),
+        "fetch": _stage_summary(fetch_stats),
+        "transform": _stage_summary(transform_stats),
+        "insert": _stage_summary(insert_stats),
+    }
+
+    return fetch_stats["items"], outcome["inserted"], stats
+
+
 def run_collection(
     date_from,
     date_to,
@@ -651,26 +850,32 @@ def run_collection(
         collected_at = datetime.now()
         snapshot_date = collected_at.date()
 
-        activities = _fetch_activities_with_types(
-            date_from=df,
-            date_to=dt,
-            statuses=statuses,
-            allowed_activity_types=allowed_activity_types,
-            resources=resources,
-        )
-
-        rows = _prepare_snapshot_rows(
-            activities=activities,
-            collected_at=collected_at,
-            snapshot_date=snapshot_date,
-            job_id=job_id,
+        type_label_map = _build_type_label_map()
+        resource_name_map = _load_resource_name_map()
+
+        # Cada página vira tupla e vai para o INSERT enquanto a próxima
+        # ainda está sendo buscada na OFS.
+        total_fetched, inserted, stages = _run_snapshot_pipeline(
+            _iter_activity_pages_with_types(
+                date_from=df,
+                date_to=dt,
+                statuses=statuses,
+                allowed_activity_types=allowed_activity_types,
+                resources=resources,
+            ),
+            lambda page_items: _prepare_snapshot_rows(
+                activities=page_items,
+                collected_at=collected_at,
+                snapshot_date=snapshot_date,
+                job_id=job_id,
+                type_label_map=type_label_map,
+                resource_name_map=resource_name_map,
+            ),
         )
 
-        inserted = insert_snapshot_rows(rows)
-
         _finish_job_success(
             job_id=job_id,
-            total_fetched=len(activities),
+            total_fetched=total_fetched,
             total_inserted=inserted,
         )
 
@@ -680,9 +885,10 @@ def run_collection(
             "date_from": df.strftime("%Y-%m-%d"),
             "date_to": dt.strftime("%Y-%m-%d"),
             "collected_at": collected_at.strftime("%Y-%m-%d %H:%M:%S"),
-            "total_fetched": len(activities),
+            "total_fetched": total_fetched,
             "total_inserted": inserted,
             "activity_types": allowed_activity_types,
+            "stages": stages,
         }
 
     except Exception as exc:
@@ -901,7 +1107,7 @@ def _fetch_close_reason_enumeration_page(
     base_url = _metadata_base_url(client)
     url = f"{base_url}/properties/{property_code}/enumerationList"
 
-    response = requests.get(
+    response = client.session.get(
         url,
         params={
             "limit": limit,
@@ -1010,6 +1216,7 @@ def sync_close_reason_map() -> Dict:
             })
 
         conn.commit()
+        lookup_cache.invalidate("close_reasons")
 
         return {
             "ok": True,
@@ -1026,4 +1233,8 @@ def sync_close_reason_map() -> Dict:
 
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+lookup_cache.register("ofs_resources.active_names", _query_resource_name_map)
+lookup_cache.register("activity_types.bi_labels", _query_type_label_map)
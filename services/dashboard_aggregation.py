@@ -0,0 +1,198 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+
+
+def parse_end_time(value, cache=None):
+    """Hora de término (time) de um endTime do OFS, com cache opcional por texto."""
+    value = str(value or "").strip()
+
+    if cache is not None and value in cache:
+        return cache[value]
+
+    parsed = None
+    if value:
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
+            try:
+                parsed = datetime.strptime(value[:19], fmt).time()
+                break
+            except ValueError:
+                continue
+
+    if cache is not None:
+        cache[value] = parsed
+
+    return parsed
+
+
+class ActivityColumns:
+    """Atividades já normalizadas em colunas paralelas (uma lista por campo)."""
+
+    __slots__ = ("dates", "types", "statuses", "cities", "end_times")
+
+    def __init__(self):
+        self.dates = []
+        self.types = []
+        self.statuses = []
+        self.cities = []
+        self.end_times = []
+
+    def append(self, item_date, activity_type, status, city, end_time):
+        self.dates.append(item_date)
+        self.types.append(activity_type)
+        self.statuses.append(status)
+        self.cities.append(city)
+        self.end_times.append(end_time)
+
+    def __len__(self):
+        return len(self.dates)
+
+
+def _dictionary_encode(values):
+    """(tabela de valores distintos, índices na tabela) na ordem de aparição."""
+    codes = {}
+    indexes = [codes.setdefault(value, len(codes)) for value in values]
+    return list(codes), indexes
+
+
+def end_minute(value):
+    """Minuto do dia (0-1439) de um endTime "AAAA-MM-DD HH:MM[:SS]", ou None."""
+    value = str(value or "")
+    if len(value) < 16 or value[10] not in " T":
+        return None
+
+    try:
+        hours = int(value[11:13])
+        minutes = int(value[14:16])
+    except ValueError:
+        return None
+
+    if 0 <= hours <= 23 and 0 <= minutes <= 59:
+        return hours * 60 + minutes
+    return None
+
+
+def encode_detail_columns(columns: ActivityColumns, type_info: dict) -> dict:
+    """
+    Formato colunar com dicionário para o detalhe do dashboard.
+
+    Cada coluna de texto vira uma tabela de valores distintos ("codes") mais um
+    array de índices; atributos que dependem só do tipo (código de filtro,
+    rótulo, grupo) ficam uma vez por tipo em vez de uma vez por atividade.
+    type_info: {tipo: (código_filtro, rótulo, grupo)}.
+    """
+    date_codes, date_idx = _dictionary_encode(columns.dates)
+    status_codes, status_idx = _dictionary_encode(columns.statuses)
+    type_codes, type_idx = _dictionary_encode(columns.types)
+    city_codes, city_idx = _dictionary_encode(columns.cities)
+
+    group_codes = []
+    type_groups = []
+    for activity_type in type_codes:
+        group = type_info[activity_type][2]
+        if group not in group_codes:
+            group_codes.append(group)
+        type_groups.append(group_codes.index(group))
+
+    return {
+        "version": 1,
+        "size": len(columns),
+        "codes": {
+            "date": date_codes,
+            "status": status_codes,
+            "type": type_codes,
+            "city": city_codes,
+            "group": group_codes,
+        },
+        "types": {
+            "filter_code": [type_info[t][0] for t in type_codes],
+            "label": [type_info[t][1] for t in type_codes],
+            "group": type_groups,
+        },
+        "columns": {
+            "date": date_idx,
+            "status": status_idx,
+            "type": type_idx,
+            "city": city_idx,
+            "end_minute": [end_minute(value) for value in columns.end_times],
+        },
+    }
+
+
+class ActivityCube:
+    """
+    Contagens do dashboard em um único passe sobre as colunas.
+
+    Células (data, tipo, status, até_o_corte) e (data, cidade, status) são
+    contadas de uma vez; "até_o_corte" só é calculado para a data de
+    comparação (mesmo dia da semana passada), com endTime convertido uma vez
+    por texto. Os indicadores saem das células, sem reler as atividades.
+    """
+
+    def __init__(self, columns: ActivityColumns, cutoff_date=None, cutoff_time=None):
+        if cutoff_time is None:
+            cuts = [False] * len(columns)
+        else:
+            time_cache = {}
+
+            def within(end_time):
+                end = parse_end_time(end_time, time_cache)
+                return end is not None and end <= cutoff_time
+
+            cuts = [
+                item_date == cutoff_date and within(end_time)
+                for item_date, end_time in zip(columns.dates, columns.end_times)
+            ]
+
+        self.cells = Counter(zip(columns.dates, columns.types, columns.statuses, cuts))
+        self.city_cells = Counter(zip(columns.dates, columns.cities, columns.statuses))
+
+    def _iter(self, item_date, codes=None, status=None, until_cutoff=False):
+        for (cell_date, activity_type, cell_status, within_cutoff), total in self.cells.items():
+            if cell_date != item_date:
+                continue
+            if codes is not None and activity_type not in codes:
+                continue
+            if status is not None and cell_status != status:
+                continue
+            if until_cutoff and not within_cutoff:
+                continue
+
+            yield activity_type, cell_status, total
+
+    def count(self, item_date, codes=None, status=None, until_cutoff=False):
+        return sum(total for _, _, total in self._iter(item_date, codes, status, until_cutoff))
+
+    def by_status(self, item_date, codes=None):
+        result = defaultdict(int)
+        for _, status, total in self._iter(item_date, codes):
+            result[status] += total
+        return result
+
+    def by_type(self, item_date, codes=None, status=None, key=None):
+        """Totais por tipo; key(tipo) permite agrupar códigos (ex.: suportes)."""
+        result = defaultdict(int)
+        for activity_type, _, total in self._iter(item_date, codes, status):
+            result[key(activity_type) if key else activity_type] += total
+        return result
+
+    def by_date(self, codes=None, status=None):
+        result = defaultdict(int)
+        for (cell_date, activity_type, cell_status, _), total in self.cells.items():
+            if codes is not None and activity_type not in codes:
+                continue
+            if status is not None and cell_status != status:
+                continue
+            result[cell_date] += total
+        return result
+
+    def by_city(self, item_date, statuses=("completed", "notdone")):
+        """{cidade: {"total": n, <status>: n, ...}} na ordem de primeira aparição."""
+        result = {}
+        for (cell_date, city, status), total in self.city_cells.items():
+            if cell_date != item_date:
+                continue
+            stats = result.setdefault(city, {"total": 0, **{s: 0 for s in statuses}})
+            stats["total"] += total
+            if status in stats:
+                stats[status] += total
+        return result
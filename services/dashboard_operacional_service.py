@@ -1,27 +1,46 @@
+import hashlib
 import json
 import os
+import socket
 import threading
+import uuid
+import zlib
 from collections import defaultdict
+from contextlib import closing
 from datetime import date, datetime, timedelta
 from typing import List
 from zoneinfo import ZoneInfo
-import requests
 
+from database.bulk import bulk_upsert
 from database.connection import get_connection
+from database.schema import ensure_column, ensure_table
 from ofs.client import OFSClient
+from ofs.activity_id_set import ActivityIdSet
+from ofs.shards import build_activity_shards, iter_activity_shards
+from services.dashboard_aggregation import ActivityColumns, ActivityCube, encode_detail_columns
 from services.online_service import obter_usuarios_online_count
 from services.ofs_os_report_service import (
     API_LIMIT,
     REQUEST_TIMEOUT,
     _build_or_equals_query,
     _iter_date_strings,
-    _normalize_items_payload,
 )
 
 
 SNAPSHOT_KEY = "home_dashboard"
 SNAPSHOT_TTL_MINUTES = 15
-RUNNING_STALE_MINUTES = 15
+
+# Atualização agendada: cada worker roda um agendador leve, mas só quem
+# detém o lease no banco consulta o OFS. O snapshot é renovado antes de
+# vencer e a home sempre recebe o último snapshot pronto.
+REFRESHER_ENABLED = os.getenv("DASHBOARD_REFRESHER_ENABLED", "true").lower() not in ("0", "false", "no")
+REFRESH_CHECK_SECONDS = int(os.getenv("DASHBOARD_REFRESH_CHECK_SECONDS", "30"))
+REFRESH_AHEAD_SECONDS = int(os.getenv("DASHBOARD_REFRESH_AHEAD_SECONDS", "120"))
+REFRESH_RETRY_SECONDS = int(os.getenv("DASHBOARD_REFRESH_RETRY_SECONDS", "120"))
+LEASE_TTL_SECONDS = int(os.getenv("DASHBOARD_LEASE_TTL_SECONDS", "90"))
+LEASE_HEARTBEAT_SECONDS = int(os.getenv("DASHBOARD_LEASE_HEARTBEAT_SECONDS", "20"))
+LEASE_KEY = "dashboard_refresh"
+LEASE_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
 DEFAULT_RESOURCES = "02"
 SUPPORT_ACTIVITY_CODES = {"SUP", "SUP_QUA", "SUP_REP"}
 SUPPORT_ACTIVITY_FILTER_CODE = "SUPORTE"
@@ -39,6 +58,26 @@ STATUS_OPTIONS = [
 REDES_CODES = {"INF_COR", "INF_PRE", "MAN_COR", "MAN_PRE"}
 DASHBOARD_TIMEZONE = os.getenv("DASHBOARD_TIMEZONE", "America/Sao_Paulo")
 
+# Dias já encerrados não mudam mais: ficam em cache e só o dia atual é
+# consultado de novo no OFS. A carência cobre baixas feitas logo após a
+# meia-noite; o dia só é considerado fechado depois dela.
+DAY_CACHE_CLOSE_GRACE_HOURS = int(os.getenv("DASHBOARD_DAY_CACHE_GRACE_HOURS", "3"))
+DAY_CACHE_KEEP_DAYS = 15
+DASHBOARD_FIELDS = [
+    "activityId",
+    "apptNumber",
+    "activityType",
+    "status",
+    "resourceId",
+    "city",
+    "date",
+    "endTime",
+    "XA_AV_CLI",
+    "XA_AV_CLI_CAT",
+    "XA_AV_CLI_SUB_CAT",
+    "XA_AV_CLI_CON",
+]
+
 def _now():
     return datetime.now(ZoneInfo(DASHBOARD_TIMEZONE)).replace(tzinfo=None)
 
@@ -76,7 +115,15 @@ def _json_loads(value):
         return None
 
 
+_snapshot_table_ready = False
+
+
 def _ensure_snapshot_table():
+    global _snapshot_table_ready
+
+    if _snapshot_table_ready:
+        return
+
     conn = get_connection()
     cur = conn.cursor()
 
@@ -96,7 +143,11 @@ def _ensure_snapshot_table():
             )
             """
         )
+        # Detalhe por atividade (colunar, zlib) fica fora do payload_json:
+        # a home lê só os indicadores e o navegador busca o detalhe à parte.
+        ensure_column(cur, "dashboard_operacional_snapshot", "detail_blob", "LONGBLOB NULL")
         conn.commit()
+        _snapshot_table_ready = True
     finally:
         cur.close()
         conn.close()
@@ -140,79 +191,158 @@ def _load_snapshot():
         conn.close()
 
 
-def _running_is_stale(snapshot):
-    if not snapshot or snapshot.get("status") != "running":
-        return False
-
-    started_at = snapshot.get("started_at")
-    if not started_at:
+def _snapshot_needs_refresh(snapshot):
+    """Sem snapshot, falho (após a espera de nova tentativa) ou perto de vencer."""
+    if not snapshot:
         return True
 
-    return (_now() - started_at) > timedelta(minutes=RUNNING_STALE_MINUTES)
-
+    now = _now()
 
-def _snapshot_is_valid(snapshot):
-    if not snapshot or snapshot.get("status") != "completed":
-        return False
+    # Depois de uma falha, espera antes de tentar de novo.
+    if snapshot.get("status") == "failed":
+        finished_at = snapshot.get("finished_at")
+        if finished_at and (now - finished_at).total_seconds() < REFRESH_RETRY_SECONDS:
+            return False
 
     expires_at = snapshot.get("expires_at")
     if not expires_at:
-        return False
+        return True
 
-    return expires_at > _now()
+    return (expires_at - now).total_seconds() <= REFRESH_AHEAD_SECONDS
 
 
-def _try_mark_running():
-    stale_limit = _now() - timedelta(minutes=RUNNING_STALE_MINUTES)
+def _ensure_lease_table(cur):
+    ensure_table(
+        cur,
+        "dashboard_operacional_lease",
+        """
+        CREATE TABLE IF NOT EXISTS dashboard_operacional_lease (
+            lease_key VARCHAR(80) NOT NULL PRIMARY KEY,
+            owner VARCHAR(120) NULL,
+            expires_at DATETIME NOT NULL,
+            heartbeat_at DATETIME NULL
+        )
+        """
+    )
+
+
+def _acquire_lease(owner: str = LEASE_OWNER) -> bool:
+    """Pega o lease se estiver livre ou vencido. Usa o relógio do banco (igual entre nós)."""
     conn = get_connection()
     cur = conn.cursor()
 
     try:
-        try:
-            cur.execute(
-                """
-                INSERT INTO dashboard_operacional_snapshot (
-                    snapshot_key,
-                    status,
-                    started_at,
-                    updated_at,
-                    expires_at,
-                    error_text
-                )
-                VALUES (%s, 'running', %s, %s, NULL, NULL)
-                """,
-                (SNAPSHOT_KEY, _now(), _now()),
-            )
-            conn.commit()
-            return True
+        _ensure_lease_table(cur)
+        cur.execute(
+            """
+            INSERT IGNORE INTO dashboard_operacional_lease (lease_key, owner, expires_at)
+            VALUES (%s, NULL, '2000-01-01 00:00:00')
+            """,
+            (LEASE_KEY,),
+        )
+        cur.execute(
+            """
+            UPDATE dashboard_operacional_lease
+            SET
+                owner = %s,
+                expires_at = NOW() + INTERVAL %s SECOND,
+                heartbeat_at = NOW()
+            WHERE lease_key = %s
+              AND (owner IS NULL OR owner = %s OR expires_at < NOW())
+            """,
+            (owner, LEASE_TTL_SECONDS, LEASE_KEY, owner),
+        )
+        acquired = cur.rowcount > 0
+        conn.commit()
+        return acquired
+    finally:
+        cur.close()
+        conn.close()
 
-        except Exception as exc:
-            if getattr(exc, "errno", None) != 1062:
-                conn.rollback()
-                raise
 
-            conn.rollback()
+def _renew_lease(owner: str = LEASE_OWNER) -> bool:
+    """Heartbeat. False quando o lease foi perdido (vencido e tomado por outro nó)."""
+    conn = get_connection()
+    cur = conn.cursor()
 
+    try:
         cur.execute(
             """
-            UPDATE dashboard_operacional_snapshot
+            UPDATE dashboard_operacional_lease
             SET
-                status = 'running',
-                started_at = %s,
-                error_text = NULL
-            WHERE snapshot_key = %s
-              AND (
-                    status <> 'running'
-                    OR started_at IS NULL
-                    OR started_at < %s
-                  )
+                expires_at = NOW() + INTERVAL %s SECOND,
+                heartbeat_at = NOW()
+            WHERE lease_key = %s
+              AND owner = %s
             """,
-            (_now(), SNAPSHOT_KEY, stale_limit),
+            (LEASE_TTL_SECONDS, LEASE_KEY, owner),
+        )
+        cur.execute(
+            "SELECT owner FROM dashboard_operacional_lease WHERE lease_key = %s",
+            (LEASE_KEY,),
         )
-        changed = cur.rowcount > 0
+        row = cur.fetchone()
         conn.commit()
-        return changed
+        return bool(row) and row[0] == owner
+    finally:
+        cur.close()
+        conn.close()
 
+
+def _release_lease(owner: str = LEASE_OWNER, force: bool = False):
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        _ensure_lease_table(cur)
+        where_owner = "" if force else "AND owner = %s"
+        params = (LEASE_KEY,) if force else (LEASE_KEY, owner)
+
+        cur.execute(
+            f"""
+            UPDATE dashboard_operacional_lease
+            SET
+                owner = NULL,
+                expires_at = NOW() - INTERVAL 1 SECOND
+            WHERE lease_key = %s
+              {where_owner}
+            """,
+            params,
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _mark_running():
+    """Marca o início da atualização sem apagar o payload atual (segue servido)."""
+    now = _now()
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(
+            """
+            INSERT INTO dashboard_operacional_snapshot (
+                snapshot_key,
+                status,
+                started_at,
+                updated_at,
+                expires_at,
+                error_text
+            )
+            VALUES (%s, 'running', %s, %s, NULL, NULL)
+            ON DUPLICATE KEY UPDATE
+                status = 'running',
+                started_at = VALUES(started_at),
+                error_text = NULL,
+                updated_at = updated_at
+            """,
+            (SNAPSHOT_KEY, now, now),
+        )
+        conn.commit()
     finally:
         cur.close()
         conn.close()
@@ -220,6 +350,7 @@ def _try_mark_running():
 def _update_progress(percent: int, message: str):
     percent = max(0, min(int(percent or 0), 99))
     message = str(message or "").strip()[:255]
+    now = _now()
 
     conn = get_connection()
     cur = conn.cursor()
@@ -235,15 +366,18 @@ def _update_progress(percent: int, message: str):
             WHERE snapshot_key = %s
               AND status = 'running'
             """,
-            (percent, message, _now(), SNAPSHOT_KEY),
+            (percent, message, now, SNAPSHOT_KEY),
         )
         conn.commit()
     finally:
         cur.close()
         conn.close()
-def _finish_success(payload):
+def _finish_success(payload, detail=None):
     now = _now()
     expires_at = now + timedelta(minutes=SNAPSHOT_TTL_MINUTES)
+    detail_blob = zlib.compress(_json_dumps(detail).encode("utf-8"), 6) if detail is not None else None
+
+    _ensure_snapshot_table()
 
     conn = get_connection()
     cur = conn.cursor()
@@ -255,22 +389,24 @@ def _finish_success(payload):
                 snapshot_key,
                 status,
                 payload_json,
+                detail_blob,
                 error_text,
                 updated_at,
                 expires_at,
                 started_at,
                 finished_at
             )
-            VALUES (%s, 'completed', %s, NULL, %s, %s, NULL, %s)
+            VALUES (%s, 'completed', %s, %s, NULL, %s, %s, NULL, %s)
             ON DUPLICATE KEY UPDATE
                 status = 'completed',
                 payload_json = VALUES(payload_json),
+                detail_blob = VALUES(detail_blob),
                 error_text = NULL,
                 updated_at = VALUES(updated_at),
                 expires_at = VALUES(expires_at),
                 finished_at = VALUES(finished_at)
             """,
-            (SNAPSHOT_KEY, _json_dumps(payload), now, expires_at, now),
+            (SNAPSHOT_KEY, _json_dumps(payload), detail_blob, now, expires_at, now),
         )
         conn.commit()
     finally:
@@ -278,6 +414,69 @@ def _finish_success(payload):
         conn.close()
 
 
+def get_dashboard_detail_version():
+    """
+    updated_at (texto) do detalhe atual, sem ler o blob, ou None se ainda não
+    existir. Serve para responder 304 antes de carregar o detalhe.
+    """
+    _ensure_snapshot_table()
+
+    conn = get_connection()
+    cur = conn.cursor(dictionary=True)
+
+    try:
+        cur.execute(
+            """
+            SELECT updated_at
+            FROM dashboard_operacional_snapshot
+            WHERE snapshot_key = %s
+              AND detail_blob IS NOT NULL
+            """,
+            (SNAPSHOT_KEY,),
+        )
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+    if not row:
+        return None
+
+    return _dt_text(row.get("updated_at"))
+
+
+def get_dashboard_detail():
+    """
+    Detalhe colunar do snapshot atual para o navegador.
+
+    Retorna (updated_at em texto, JSON em bytes) ou (None, None) se ainda não
+    existir. O JSON não é parseado aqui: só descompactado e repassado.
+    """
+    _ensure_snapshot_table()
+
+    conn = get_connection()
+    cur = conn.cursor(dictionary=True)
+
+    try:
+        cur.execute(
+            """
+            SELECT updated_at, detail_blob
+            FROM dashboard_operacional_snapshot
+            WHERE snapshot_key = %s
+            """,
+            (SNAPSHOT_KEY,),
+        )
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+    if not row or not row.get("detail_blob"):
+        return None, None
+
+    return _dt_text(row.get("updated_at")), zlib.decompress(row["detail_blob"])
+
+
 def _finish_failure(error_text):
     now = _now()
 
@@ -364,94 +563,218 @@ def _load_activity_type_maps():
     }
 
 
-def _fetch_dashboard_activities(date_from: str, date_to: str, activity_codes: List[str]) -> List[dict]:
-    if not activity_codes:
-        return []
+def _dashboard_resources():
+    return (os.getenv("DASHBOARD_OFS_RESOURCES") or DEFAULT_RESOURCES).strip()
+
+
+def _day_cache_signature(activity_codes: List[str]) -> str:
+    """Muda quando tipos, resources ou campos mudam; invalida os dias em cache."""
+    raw = "|".join([
+        ",".join(sorted(activity_codes)),
+        _dashboard_resources(),
+        ",".join(DASHBOARD_FIELDS),
+        ",".join(STATUS_OPTIONS),
+    ])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _ensure_day_cache_table(cur):
+    ensure_table(
+        cur,
+        "dashboard_operacional_day_cache",
+        """
+        CREATE TABLE IF NOT EXISTS dashboard_operacional_day_cache (
+            day DATE NOT NULL PRIMARY KEY,
+            signature CHAR(40) NOT NULL,
+            items_blob LONGBLOB NOT NULL,
+            item_count INT NOT NULL DEFAULT 0,
+            fetched_at DATETIME NOT NULL
+        )
+        """
+    )
 
-    client = OFSClient()
-    url = f"{client.base_url}/activities/"
-    headers = {"Accept": "application/json"}
-    resources = (os.getenv("DASHBOARD_OFS_RESOURCES") or DEFAULT_RESOURCES).strip()
-
-    fields = [
-        "activityId",
-        "apptNumber",
-        "activityType",
-        "status",
-        "resourceId",
-        "city",
-        "date",
-        "endTime",
-        "XA_AV_CLI",
-        "XA_AV_CLI_CAT",
-        "XA_AV_CLI_SUB_CAT",
-        "XA_AV_CLI_CON",
+
+def _day_is_closed(day_text: str, fetched_at) -> bool:
+    day_end = datetime.strptime(day_text, "%Y-%m-%d") + timedelta(days=1)
+    return fetched_at >= day_end + timedelta(hours=DAY_CACHE_CLOSE_GRACE_HOURS)
+
+
+def _load_cached_days(days: List[str], signature: str) -> dict:
+    """Retorna {dia: itens} apenas para dias fechados com a mesma assinatura."""
+    if not days:
+        return {}
+
+    conn = get_connection()
+    cur = conn.cursor(dictionary=True)
+
+    try:
+        _ensure_day_cache_table(cur)
+        placeholders = ", ".join(["%s"] * len(days))
+        cur.execute(
+            f"""
+            SELECT day, signature, items_blob, fetched_at
+            FROM dashboard_operacional_day_cache
+            WHERE day IN ({placeholders})
+            """,
+            tuple(days),
+        )
+        rows = cur.fetchall() or []
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+    cached = {}
+
+    for row in rows:
+        day_text = _date_text(row.get("day"))
+
+        if row.get("signature") != signature:
+            continue
+        if not row.get("fetched_at") or not _day_is_closed(day_text, row["fetched_at"]):
+            continue
+
+        try:
+            cached[day_text] = json.loads(zlib.decompress(row["items_blob"]).decode("utf-8"))
+        except Exception as exc:
+            print(f"[WARN] Cache do dashboard ilegível para {day_text}: {exc}")
+
+    return cached
+
+
+def _store_cached_days(items_by_day: dict, signature: str):
+    """Grava os dias consultados que já podem ser tratados como fechados."""
+    now = _now()
+    rows = [
+        (
+            day_text,
+            signature,
+            zlib.compress(_json_dumps(items).encode("utf-8"), 6),
+            len(items),
+            now,
+        )
+        for day_text, items in items_by_day.items()
+        if _day_is_closed(day_text, now)
     ]
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        _ensure_day_cache_table(cur)
+
+        if rows:
+            bulk_upsert(
+                cur,
+                "dashboard_operacional_day_cache",
+                ("day", "signature", "items_blob", "item_count", "fetched_at"),
+                rows,
+                key_columns=("day",),
+                chunk_size=1,
+            )
+
+        cur.execute(
+            "DELETE FROM dashboard_operacional_day_cache WHERE day < %s",
+            (_today() - timedelta(days=DAY_CACHE_KEEP_DAYS),),
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _fetch_dashboard_activities(days: List[str], activity_codes: List[str]) -> dict:
+    """Consulta os dias informados no OFS. Retorna {dia: itens}."""
+    items_by_day = {day: [] for day in days}
+
+    if not activity_codes or not days:
+        return items_by_day
+
+    client = OFSClient()
+
     q = (
         f"{_build_or_equals_query('status', STATUS_OPTIONS)} "
         f"and {_build_or_equals_query('activityType', activity_codes)}"
     )
 
-    all_items = []
-    seen_activity_ids = set()
+    seen_activity_ids = ActivityIdSet()
 
-    days = list(_iter_date_strings(date_from, date_to))
     total_days = max(len(days), 1)
+    resource_list = [resource.strip() for resource in _dashboard_resources().split(",") if resource.strip()]
+    shards = build_activity_shards(days, resource_list)
+    cache_stats = {"cache_hits": 0, "cache_misses": 0}
+
+    with closing(iter_activity_shards(
+        client,
+        shards,
+        q=q,
+        fields=DASHBOARD_FIELDS,
+        limit=API_LIMIT,
+        timeout=REQUEST_TIMEOUT,
+        cache_stats=cache_stats,
+    )) as shard_pages:
+        for shard, page_data in shard_pages:
+            day = shard["day"]
+
+            for item in page_data["items"]:
+                activity_id = str(item.get("activityId") or "").strip()
+
+                if activity_id and not seen_activity_ids.add(activity_id):
+                    continue
+
+                items_by_day[day].append(item)
+
+            finished_days = shard["index"]
+            if not page_data["has_more"]:
+                finished_days += 1
 
-    for day_index, day in enumerate(days, start=1):
-        offset = 0
-        page = 1
-        while True:
-            day_base_percent = 10 + int(((day_index - 1) / total_days) * 75)
             _update_progress(
-                day_base_percent,
-                f"Consultando OFS - {day} - página {page}",
-            )
-            params = [
-                ("dateFrom", day),
-                ("dateTo", day),
-                ("resources", resources),
-                ("q", q),
-                ("fields", ",".join(fields)),
-                ("limit", str(API_LIMIT)),
-                ("offset", str(offset)),
-            ]
-
-            response = requests.get(
-                url,
-                headers=headers,
-                params=params,
-                auth=client.auth,
-                timeout=REQUEST_TIMEOUT,
+                10 + int((finished_days / total_days) * 75),
+                f"Consultando OFS - {day} - página {page_data['page']} "
+                f"({finished_days} de {total_days} dia(s) concluído(s); "
+                f"cache: {cache_stats['cache_hits']} acerto(s), {cache_stats['cache_misses']} falta(s))",
             )
-            response.raise_for_status()
+    return items_by_day
 
-            data = response.json()
-            items = _normalize_items_payload(data)
 
-            if not items:
-                break
+def _load_dashboard_activities(date_from: str, date_to: str, activity_codes: List[str]) -> List[dict]:
+    """
+    Junta dias fechados do cache com os dias que precisam ir ao OFS
+    (normalmente só o dia atual).
+    """
+    days = list(_iter_date_strings(date_from, date_to))
+    signature = _day_cache_signature(activity_codes)
 
-            for item in items:
-                activity_id = str(item.get("activityId") or "").strip()
+    try:
+        cached = _load_cached_days(days, signature)
+    except Exception as exc:
+        print(f"[WARN] Falha ao ler cache diário do dashboard: {exc}")
+        cached = {}
 
-                if activity_id:
-                    if activity_id in seen_activity_ids:
-                        continue
-                    seen_activity_ids.add(activity_id)
+    missing_days = [day for day in days if day not in cached]
 
-                all_items.append(item)
+    if cached:
+        _update_progress(10, f"{len(cached)} dia(s) reaproveitado(s) do cache; consultando {len(missing_days)} no OFS")
 
-            has_more = bool(data.get("hasMore")) if isinstance(data, dict) else False
-            if not has_more:
-                break
+    fetched = _fetch_dashboard_activities(missing_days, activity_codes)
+
+    try:
+        _store_cached_days(fetched, signature)
+    except Exception as exc:
+        print(f"[WARN] Falha ao gravar cache diário do dashboard: {exc}")
+
+    all_items = []
+    seen_activity_ids = ActivityIdSet()
+
+    for day in days:
+        for item in cached.get(day) or fetched.get(day) or []:
+            activity_id = str(item.get("activityId") or "").strip()
+
+            if activity_id and not seen_activity_ids.add(activity_id):
+                continue
+
+            all_items.append(item)
 
-            offset += len(items)
-            page += 1
-        _update_progress(
-            10 + int((day_index / total_days) * 75),
-            f"Dia {day_index} de {total_days} concluído",
-        )
     return all_items
 
 
@@ -472,53 +795,6 @@ def _variation_percent(today_total, last_week_total):
 
     return round(((today_total - last_week_total) / last_week_total) * 100, 1)
 
-def _parse_ofs_datetime(value):
-    value = str(value or "").strip()
-    if not value:
-        return None
-
-    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
-        try:
-            return datetime.strptime(value[:19], fmt)
-        except ValueError:
-            continue
-
-    return None
-
-
-def _item_finished_until_time(item, until_time):
-    if until_time is None:
-        return True
-
-    end_dt = _parse_ofs_datetime(item.get("endTime"))
-    if not end_dt:
-        return False
-
-    return end_dt.time() <= until_time
-
-def _count_by_status(rows, date_value, allowed_codes, status_value, until_time=None):
-    total = 0
-    status_value = str(status_value or "").strip().lower()
-
-    for item in rows:
-        if str(item.get("date") or "").strip() != date_value:
-            continue
-        if str(item.get("status") or "").strip().lower() != status_value:
-            continue
-        if str(item.get("activityType") or "").strip() not in allowed_codes:
-            continue
-        if not _item_finished_until_time(item, until_time):
-            continue
-
-        total += 1
-
-    return total
-
-
-def _count_completed(rows, date_value, allowed_codes, until_time=None):
-    return _count_by_status(rows, date_value, allowed_codes, "completed", until_time)
-
-
 def _list_from_counter(counter, key_name, total_name="total", limit=None):
     rows = [
         {
@@ -675,102 +951,65 @@ def _build_payload(rows, activity_maps):
     b2c_codes = activity_maps["b2c_codes"]
     redes_codes = activity_maps["redes_codes"]
 
-    today_by_status = defaultdict(int)
-    b2c_by_type_today = defaultdict(int)
-    redes_by_type_today = defaultdict(int)
-    city_stats = {}
-    all_notdone_by_day = defaultdict(int)
-    dashboard_rows = []
+    columns = ActivityColumns()
+    today_rows = []
+    type_info = {}
 
     for item in rows:
         item_date = str(item.get("date") or "").strip()
         status = str(item.get("status") or "nao_informado").strip().lower() or "nao_informado"
         activity_type = str(item.get("activityType") or "").strip()
-        activity_type_filter_code = _dashboard_type_filter_code(activity_type)
-        activity_type_label = _dashboard_type_label(activity_type, labels)
         city = str(item.get("city") or "Não informado").strip() or "Não informado"
+        end_time = str(item.get("endTime") or "").strip()
+
+        # Rótulo, código de filtro e grupo dependem só do tipo.
+        info = type_info.get(activity_type)
+        if info is None:
+            info = type_info[activity_type] = (
+                _dashboard_type_filter_code(activity_type),
+                _dashboard_type_label(activity_type, labels),
+                (
+                    "redes"
+                    if activity_type in redes_codes
+                    else "b2c"
+                    if activity_type in b2c_codes
+                    else "outros"
+                ),
+            )
 
-        dashboard_rows.append({
-            "date": item_date,
-            "status": status,
-            "activityType": activity_type,
-            "activityTypeFilterCode": activity_type_filter_code,
-            "activityTypeLabel": activity_type_label,
-            "city": city,
-            "endTime": str(item.get("endTime") or "").strip(),
-            "apptNumber": str(item.get("apptNumber") or "").strip(),
-            "customerRating": str(item.get("XA_AV_CLI") or "").strip(),
-            "customerRatingCategory": str(item.get("XA_AV_CLI_CAT") or "").strip(),
-            "customerRatingSubcategory": str(item.get("XA_AV_CLI_SUB_CAT") or "").strip(),
-            "customerRatingCompleted": str(item.get("XA_AV_CLI_CON") or "").strip(),
-            "group": (
-                "redes"
-                if activity_type in redes_codes
-                else "b2c"
-                if activity_type in b2c_codes
-                else "outros"
-            ),
-        })
-
-        if status == "notdone":
-            all_notdone_by_day[item_date] += 1
-
-        if item_date != today_text:
-            continue
+        columns.append(item_date, activity_type, status, city, end_time)
 
-        today_by_status[status] += 1
+        if item_date == today_text:
+            today_rows.append(item)
 
-        if activity_type in b2c_codes:
-            b2c_by_type_today[activity_type_filter_code] += 1
+    cube = ActivityCube(columns, cutoff_date=last_week_text, cutoff_time=comparison_until_time)
 
-        if activity_type in redes_codes:
-            redes_by_type_today[activity_type] += 1
+    today_by_status = cube.by_status(today_text)
+    b2c_by_type_today = cube.by_type(today_text, b2c_codes, key=_dashboard_type_filter_code)
+    redes_by_type_today = cube.by_type(today_text, redes_codes)
+    all_notdone_by_day = cube.by_date(status="notdone")
+    b2c_completed_by_day = cube.by_date(b2c_codes, "completed")
+    redes_completed_by_day = cube.by_date(redes_codes, "completed")
 
-        if city not in city_stats:
-            city_stats[city] = {
-                "city": city,
-                "total": 0,
-                "completed": 0,
-                "notdone": 0,
-            }
+    city_stats = {
+        city: {
+            "city": city,
+            "total": stats["total"],
+            "completed": stats["completed"],
+            "notdone": stats["notdone"],
+        }
+        for city, stats in cube.by_city(today_text).items()
+    }
 
-        city_stats[city]["total"] += 1
-        if status == "completed":
-            city_stats[city]["completed"] += 1
-        if status == "notdone":
-            city_stats[city]["notdone"] += 1
-
-    b2c_completed_today = _count_completed(rows, today_text, b2c_codes)
-    redes_completed_today = _count_completed(rows, today_text, redes_codes)
-    b2c_completed_last_week = _count_completed(
-        rows,
-        last_week_text,
-        b2c_codes,
-        comparison_until_time,
-    )
-    redes_completed_last_week = _count_completed(
-        rows,
-        last_week_text,
-        redes_codes,
-        comparison_until_time,
-    )
+    b2c_completed_today = cube.count(today_text, b2c_codes, "completed")
+    redes_completed_today = cube.count(today_text, redes_codes, "completed")
+    b2c_completed_last_week = cube.count(last_week_text, b2c_codes, "completed", until_cutoff=True)
+    redes_completed_last_week = cube.count(last_week_text, redes_codes, "completed", until_cutoff=True)
 
-    b2c_notdone_today = _count_by_status(rows, today_text, b2c_codes, "notdone")
-    redes_notdone_today = _count_by_status(rows, today_text, redes_codes, "notdone")
-    b2c_notdone_last_week = _count_by_status(
-        rows,
-        last_week_text,
-        b2c_codes,
-        "notdone",
-        comparison_until_time,
-    )
-    redes_notdone_last_week = _count_by_status(
-        rows,
-        last_week_text,
-        redes_codes,
-        "notdone",
-        comparison_until_time,
-    )
+    b2c_notdone_today = cube.count(today_text, b2c_codes, "notdone")
+    redes_notdone_today = cube.count(today_text, redes_codes, "notdone")
+    b2c_notdone_last_week = cube.count(last_week_text, b2c_codes, "notdone", until_cutoff=True)
+    redes_notdone_last_week = cube.count(last_week_text, redes_codes, "notdone", until_cutoff=True)
 
     last_7_days = []
     for day_offset in range(7):
@@ -779,8 +1018,8 @@ def _build_payload(rows, activity_maps):
 
         last_7_days.append({
             "date": current_text,
-            "b2c_completed": _count_completed(rows, current_text, b2c_codes),
-            "redes_completed": _count_completed(rows, current_text, redes_codes),
+            "b2c_completed": int(b2c_completed_by_day.get(current_text, 0)),
+            "redes_completed": int(redes_completed_by_day.get(current_text, 0)),
             "notdone": int(all_notdone_by_day.get(current_text, 0)),
         })
 
@@ -827,7 +1066,7 @@ def _build_payload(rows, activity_maps):
         key=lambda item: item["label"],
     )
 
-    return {
+    payload = {
         "generated_at": _dt_text(_now()),
         "periods": {
             "today": today_text,
@@ -856,12 +1095,19 @@ def _build_payload(rows, activity_maps):
         "last_7_days": last_7_days,
         "top_cities": top_cities[:10],
         "activity_options": activity_options,
-        "dashboard_rows": dashboard_rows,
-        "customer_thermometer": _build_customer_thermometer(rows, today_text),
+        "customer_thermometer": _build_customer_thermometer(today_rows, today_text),
     }
 
+    return payload, encode_detail_columns(columns, type_info)
+
+
+def refresh_dashboard_snapshot(lease_owner=None):
+    """
+    Consulta o OFS, monta o payload e grava o snapshot.
 
-def refresh_dashboard_snapshot():
+    Com lease_owner, só grava se o lease ainda for deste processo (outro nó
+    pode ter assumido se o heartbeat atrasou).
+    """
     try:
         _update_progress(3, "Carregando tipos de atividade")
         activity_maps = _load_activity_type_maps()
@@ -872,35 +1118,112 @@ def refresh_dashboard_snapshot():
         date_to = _date_text(today)
 
         _update_progress(8, "Iniciando consulta no OFS")
-        rows = _fetch_dashboard_activities(date_from, date_to, activity_codes)
+        rows = _load_dashboard_activities(date_from, date_to, activity_codes)
 
         _update_progress(90, "Montando indicadores do dashboard")
-        payload = _build_payload(rows, activity_maps)
+        payload, detail = _build_payload(rows, activity_maps)
+
+        if lease_owner and not _renew_lease(lease_owner):
+            print("[WARN] Lease do dashboard perdido durante a atualização; snapshot descartado.")
+            return
 
         _update_progress(98, "Salvando snapshot do dashboard")
-        _finish_success(payload)
+        _finish_success(payload, detail)
 
     except Exception as exc:
         _finish_failure(str(exc))
 
-def _start_background_refresh():
-    thread = threading.Thread(target=refresh_dashboard_snapshot, daemon=True)
-    thread.start()
+_refresher = None
+_refresher_lock = threading.Lock()
+_refresher_wakeup = threading.Event()
 
 
-def get_or_start_dashboard_snapshot():
-    snapshot = _load_snapshot()
+def _heartbeat_loop(stop: threading.Event, owner: str):
+    while not stop.wait(LEASE_HEARTBEAT_SECONDS):
+        try:
+            if not _renew_lease(owner):
+                return
+        except Exception as exc:
+            print(f"[WARN] Falha no heartbeat do lease do dashboard: {exc}")
+
+
+def _refresh_if_due() -> bool:
+    """Uma rodada do agendador. Retorna True se este processo atualizou o snapshot."""
+    if not _snapshot_needs_refresh(_load_snapshot()):
+        return False
+
+    if not _acquire_lease():
+        return False
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat_loop,
+        args=(stop, LEASE_OWNER),
+        name="dashboard-lease-heartbeat",
+        daemon=True,
+    )
+    heartbeat.start()
+
+    try:
+        # Outro nó pode ter terminado entre a leitura e o lease.
+        snapshot = _load_snapshot()
+        if not _snapshot_needs_refresh(snapshot):
+            return False
+
+        _mark_running()
+        refresh_dashboard_snapshot(lease_owner=LEASE_OWNER)
+        return True
+    finally:
+        stop.set()
+        heartbeat.join(timeout=5)
+        _release_lease()
+
+
+def _refresher_loop():
+    while True:
+        try:
+            _refresh_if_due()
+        except Exception as exc:
+            print(f"[WARN] Falha no agendador do dashboard: {exc}")
+
+        _refresher_wakeup.wait(REFRESH_CHECK_SECONDS)
+        _refresher_wakeup.clear()
 
-    if _snapshot_is_valid(snapshot):
-        return _serialize_snapshot(snapshot)
 
-    if snapshot and snapshot.get("status") == "running" and not _running_is_stale(snapshot):
-        return _serialize_snapshot(snapshot)
+def start_dashboard_refresher():
+    """Sobe o agendador deste processo (idempotente)."""
+    global _refresher
 
-    if _try_mark_running():
-        _start_background_refresh()
+    if not REFRESHER_ENABLED:
+        return
+
+    if _refresher is not None and _refresher.is_alive():
+        return
+
+    with _refresher_lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(
+                target=_refresher_loop,
+                name="dashboard-refresher",
+                daemon=True,
+            )
+            _refresher.start()
+
+
+def get_or_start_dashboard_snapshot():
+    """
+    Devolve o último snapshot pronto, mesmo vencido (stale-while-revalidate).
+
+    A atualização nunca roda na requisição: se o snapshot precisa ser
+    renovado, só acorda o agendador, que disputa o lease no banco.
+    """
+    start_dashboard_refresher()
 
     snapshot = _load_snapshot()
+
+    if _snapshot_needs_refresh(snapshot):
+        _refresher_wakeup.set()
+
     return _serialize_snapshot(snapshot)
 
 
@@ -938,6 +1261,8 @@ def get_dashboard_snapshot_status():
         "progress_message": serialized["progress_message"],
         "progress_updated_at": serialized["progress_updated_at"],
     }
+
+
 def unlock_dashboard_snapshot() -> dict:
     now = _now()
 
@@ -964,12 +1289,15 @@ def unlock_dashboard_snapshot() -> dict:
             ),
         )
         conn.commit()
-
-        return {
-            "ok": True,
-            "message": "Atualização destravada. Abra o dashboard novamente para iniciar uma nova atualização.",
-        }
-
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+    _release_lease(force=True)
+    start_dashboard_refresher()
+    _refresher_wakeup.set()
+
+    return {
+        "ok": True,
+        "message": "Atualização destravada. Uma nova atualização será iniciada automaticamente.",
+    }
\ No newline at end of file
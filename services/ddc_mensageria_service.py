@@ -3,10 +3,15 @@ import os
 import threading
 import time
 import uuid
+from collections import deque
+from datetime import datetime
 from typing import Optional, List, Tuple
 
 import requests
 
+from core import job_queue
+from core.job_events import publish as publish_job_event
+from core.rate_limit import call_with_rate_limit
 from database.connection import get_connection
 
 
@@ -139,7 +144,9 @@ def _send_ddc_request(activity_id: str) -> dict:
     }
 
     def _do_request(token: str):
-        return requests.post(
+        return call_with_rate_limit(
+            "oic",
+            requests.post,
             OIC_DDC_URL,
             json=payload,
             headers={
@@ -419,7 +426,7 @@ def _mark_job_error(job_id: int, message: str):
         conn.close()
 
 
-def _process_mass_job(job_id: int):
+def _process_mass_job(job_id: int, job_uuid: Optional[str] = None):
     conn = get_connection()
     cur = conn.cursor(dictionary=True)
 
@@ -440,8 +447,27 @@ def _process_mass_job(job_id: int):
 
     _set_job_running(job_id)
 
+    # Estado publicado para o SSE no mesmo formato de get_job_status
+    # (logs mais recentes primeiro, no máximo 100), sem reler o banco.
+    progress = {
+        "job_id": job_uuid,
+        "status": "running",
+        "total": len(items),
+        "processed": 0,
+        "success_count": 0,
+        "error_count": 0,
+        "percent": 0,
+    }
+    logs = deque(maxlen=100)
+
+    def publish_progress():
+        if job_uuid:
+            publish_job_event("ddc_massivo", job_uuid, {**progress, "logs": list(logs)})
+
+    publish_progress()
+
     try:
-        for idx, item in enumerate(items):
+        for item in items:
             job_item_id = int(item["id"])
             activity_id = str(item["activity_id"]).strip()
 
@@ -461,13 +487,28 @@ def _process_mass_job(job_id: int):
                 message=message,
             )
 
-            if idx < len(items) - 1:
-                time.sleep(1)
+            processed_at = datetime.now()
+            progress["processed"] += 1
+            progress["success_count" if result["success"] else "error_count"] += 1
+            progress["percent"] = int(progress["processed"] * 100 / progress["total"] + 0.5)
+            logs.appendleft({
+                "activity_id": activity_id,
+                "status": "success" if result["success"] else "error",
+                "status_code": result["status_code"],
+                "message": message,
+                "processed_at": processed_at,
+                "timestamp": processed_at.strftime("%H:%M:%S"),
+            })
+            publish_progress()
 
         _finish_job(job_id, "finished")
+        progress["status"] = "finished"
+        publish_progress()
 
     except Exception as e:
         _mark_job_error(job_id, f"Falha no processamento do lote: {str(e)}")
+        progress["status"] = "error"
+        publish_progress()
         raise
 
 
@@ -477,14 +518,14 @@ def start_massive_job(usuario_id: Optional[int], ids: List[str]) -> dict:
     if not clean_ids:
         raise DDCMensageriaError("Nenhum ID válido foi informado para o envio massivo.")
 
+    try:
+        job_queue.ensure_capacity("ddc_massivo", usuario_id)
+    except job_queue.JobQueueFull as e:
+        raise DDCMensageriaError(str(e))
+
     job_id, job_uuid = _create_job(usuario_id=usuario_id, ids=clean_ids)
 
-    thread = threading.Thread(
-        target=_process_mass_job,
-        args=(job_id,),
-        daemon=True,
-    )
-    thread.start()
+    job_queue.submit("ddc_massivo", job_uuid, (job_id, job_uuid), user_key=usuario_id)
 
     return {
         "success": True,
@@ -564,4 +605,11 @@ def get_job_status(job_uuid: str) -> dict:
         }
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+def _mark_mass_job_interrupted(job_id: int, *args):
+    _mark_job_error(job_id, "Interrompido por reinício do servidor; itens não enviados ficaram pendentes.")
+
+
+job_queue.register_job("ddc_massivo", "ddc", _process_mass_job, on_interrupted=_mark_mass_job_interrupted)
@@ -7,6 +7,7 @@ import json
 from openpyxl import Workbook
 
 from database.connection import get_connection
+from database.pagination import approximate_table_rows, cached_count, fetch_keyset_page
 from core.utils import xlsx_auto_width
 
 
@@ -269,38 +270,45 @@ def list_filter_options():
         conn.close()
 
 
-def fetch_audit_logs(filters, page=1, per_page=DEFAULT_LOGS_PER_PAGE):
-    page = _safe_int(page, 1, minimum=1)
+def fetch_audit_logs(filters, cursor=None, per_page=DEFAULT_LOGS_PER_PAGE, exact_total=False):
+    """
+    Página de audit_log por keyset (created_at, id), navegada por cursor opaco.
+
+    O total é opcional no custo: sem filtros usa a estimativa do InnoDB;
+    com filtros (ou exact_total) faz COUNT(*) com cache curto por filtro.
+    """
     per_page = _safe_int(per_page, DEFAULT_LOGS_PER_PAGE, minimum=25, maximum=200)
 
     if per_page not in LOGS_PER_PAGE_OPTIONS:
         per_page = DEFAULT_LOGS_PER_PAGE
 
     where_sql, params = _audit_where(filters)
+    has_filters = bool(params)
 
     conn = get_connection()
     cur = conn.cursor(dictionary=True)
 
     try:
-        cur.execute(
-            f"""
-            SELECT COUNT(*) AS total
-            FROM audit_log
-            WHERE {where_sql}
-            """,
-            tuple(params),
-        )
-        total = int((cur.fetchone() or {}).get("total") or 0)
+        total_is_estimate = not has_filters and not exact_total
+
+        if total_is_estimate:
+            total = approximate_table_rows(cur, "audit_log")
+        else:
+            total = cached_count(
+                cur,
+                f"""
+                SELECT COUNT(*) AS total
+                FROM audit_log
+                WHERE {where_sql}
+                """,
+                params,
+            )
 
         total_pages = max(1, ceil(total / per_page)) if total else 1
 
-        if page > total_pages:
-            page = total_pages
-
-        offset = (page - 1) * per_page
-
-        cur.execute(
-            f"""
+        result = fetch_keyset_page(
+            cur,
+            """
             SELECT
                 id,
                 created_at,
@@ -312,31 +320,42 @@ def fetch_audit_logs(filters, page=1, per_page=DEFAULT_LOGS_PER_PAGE):
                 entity_ref,
                 api_response
             FROM audit_log
-            WHERE {where_sql}
-            ORDER BY created_at DESC, id DESC
-            LIMIT %s OFFSET %s
             """,
-            tuple(params + [per_page, offset]),
+            where_sql,
+            params,
+            [("created_at", "created_at"), ("id", "id")],
+            per_page,
+            cursor,
         )
 
-        logs = cur.fetchall()
+        logs = result["items"]
+        page = result["page"]
 
         for row in logs:
             row["api_response_text"] = _json_text(row.get("api_response"))
 
-        page_start = offset + 1 if total else 0
-        page_end = min(offset + per_page, total) if total else 0
+        offset = (page - 1) * per_page
+        page_start = offset + 1 if logs else 0
+        page_end = offset + len(logs)
+
+        # A estimativa pode ficar abaixo do que já foi navegado.
+        if total_is_estimate and page_end > total:
+            total = page_end
+        total_pages = max(total_pages, page)
 
         return {
             "logs": logs,
             "total": total,
+            "total_is_estimate": total_is_estimate,
             "page": page,
             "per_page": per_page,
             "total_pages": total_pages,
             "page_start": page_start,
             "page_end": page_end,
-            "has_prev": page > 1,
-            "has_next": page < total_pages,
+            "has_prev": result["has_prev"],
+            "has_next": result["has_next"],
+            "prev_cursor": result["prev_cursor"],
+            "next_cursor": result["next_cursor"],
         }
 
     finally:
@@ -1,12 +1,105 @@
 import traceback
 import re
 from datetime import datetime, timedelta
-from urllib.parse import urlencode
 
 from database.connection import get_connection
+from database.bulk import bulk_upsert
+from database.schema import ensure_column, ensure_index
+from core import job_queue
+from core.job_events import publish as publish_job_event
 from ofs.client import OFSClient
 from services.sap_error_parser import parse_sap_error, _extract_message
 
+ERRO_TIPO_SAP_NG = "Erro SAP/NG"
+ERRO_TIPO_SAP = "Erro SAP"
+ERRO_TIPO_NG = "Erro NG"
+ERRO_TIPO_NONE = "-"
+
+ERRO_TIPOS = (ERRO_TIPO_SAP_NG, ERRO_TIPO_SAP, ERRO_TIPO_NG, ERRO_TIPO_NONE)
+
+# Tipos em que XA_SAP_CRT = '1'.
+ERRO_TIPOS_SAP = (ERRO_TIPO_SAP_NG, ERRO_TIPO_SAP)
+
+
+def _is_cdata(value) -> bool:
+    return str(value or "").strip().upper().startswith("<![CDATA[")
+
+
+def classify_erro_tipo(xa_sap_crt, ng_response_raw, ng_dispatch_raw) -> str:
+    """Mesma regra do antigo CASE da listagem, calculada uma vez na importação."""
+    sap = str(xa_sap_crt or "").strip() == "1"
+    ng = _is_cdata(ng_response_raw) or _is_cdata(ng_dispatch_raw)
+
+    if sap and ng:
+        return ERRO_TIPO_SAP_NG
+    if sap:
+        return ERRO_TIPO_SAP
+    if ng:
+        return ERRO_TIPO_NG
+    return ERRO_TIPO_NONE
+
+
+def erro_tipo_sql(alias: str = "") -> str:
+    """
+    Expressão SQL do tipo de erro. Usa a coluna erro_tipo e, nas linhas que
+    ainda estão com '-' (importadas antes da coluna e não classificadas pelo
+    tools/backfill_erro_tipo.py), cai na regra antiga sobre xa_sap_crt e os
+    CDATA do NG, a mesma de classify_erro_tipo.
+    """
+    p = f"{alias}." if alias else ""
+    sap = f"COALESCE(TRIM({p}xa_sap_crt), '') = '1'"
+    ng = (
+        f"(TRIM(COALESCE({p}xa_res_api_ng_response, '')) LIKE '<![CDATA[%'"
+        f" OR TRIM(COALESCE({p}xa_api_ng_dispatch, '')) LIKE '<![CDATA[%')"
+    )
+
+    return (
+        f"CASE"
+        f" WHEN {p}erro_tipo <> '{ERRO_TIPO_NONE}' THEN {p}erro_tipo"
+        f" WHEN {sap} AND {ng} THEN '{ERRO_TIPO_SAP_NG}'"
+        f" WHEN {sap} THEN '{ERRO_TIPO_SAP}'"
+        f" WHEN {ng} THEN '{ERRO_TIPO_NG}'"
+        f" ELSE '{ERRO_TIPO_NONE}'"
+        f" END"
+    )
+
+
+def erro_tipo_filter_sql(erro_tipos, alias: str = ""):
+    """
+    Filtro por tipo de erro com a mesma regra de erro_tipo_sql. O IN na
+    coluna (com '-') deixa o índice (date, erro_tipo) cortar as linhas antes
+    de avaliar a regra antiga. Retorna (sql, params).
+    """
+    p = f"{alias}." if alias else ""
+    erro_tipos = list(erro_tipos)
+    placeholders = ", ".join(["%s"] * len(erro_tipos))
+
+    sql = (
+        f"{p}erro_tipo IN ({placeholders}, '{ERRO_TIPO_NONE}')"
+        f" AND {erro_tipo_sql(alias)} IN ({placeholders})"
+    )
+    return sql, erro_tipos + erro_tipos
+
+
+def ensure_erro_tipo_column(cur) -> bool:
+    """
+    Coluna erro_tipo + índice (date, erro_tipo). Retorna True se a coluna
+    acabou de ser criada. Só para as ferramentas de deploy (tools/apply_schema.py
+    e tools/backfill_erro_tipo.py): o app não faz DDL em tempo de requisição.
+
+    A coluna vai no fim da tabela: ADD COLUMN ... AFTER reconstrói a tabela
+    inteira no MySQL anterior ao 8.0.29.
+    """
+    created = ensure_column(
+        cur,
+        "ofs_activities_errors",
+        "erro_tipo",
+        "VARCHAR(20) NOT NULL DEFAULT '-'",
+    )
+    ensure_index(cur, "ofs_activities_errors", "idx_errors_date_tipo", ["date", "erro_tipo"])
+    return created
+
+
 def normalize_appt_number(value):
     s = str(value or "").strip()
     if not s:
@@ -72,6 +165,13 @@ def job_update(job_id: int, **fields):
     cur.close()
     conn.close()
 
+    publish_job_event(
+        "erros_import",
+        job_id,
+        {"id": job_id, **fields, "updated_at": datetime.now()},
+        merge=True,
+    )
+
 
 def iter_days(date_from: str, date_to: str):
 
@@ -107,50 +207,32 @@ def run_import_job(job_id: int, date_from: str, date_to: str, resources: str, ac
 
         total_inserted = 0
         total_updated = 0
+        total_removed = 0
         total_api_items = 0
 
-        job_update(job_id, message="Iniciando importação...", progress=1)
-
-        sql = """
-            INSERT INTO ofs_activities_errors
-            (
-                activity_id,
-                `date`,
-                city,
-                activity_type,
-                appt_number,
-                status,
-                xa_res_api_ng_response,
-                xa_api_ng_dispatch,
-                xa_sap_crt_ldg,
-                xa_sap_crt,
-                sap_error_raw_extracted,
-                ng_dispatch_message,
-                ng_response_message,
-                sap_response_message,
-                sap_error_category,
-                appt_number_norm,
-                last_seen_at
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-            ON DUPLICATE KEY UPDATE
-                `date` = VALUES(`date`),
-                city = VALUES(city),
-                activity_type = VALUES(activity_type),
-                appt_number = VALUES(appt_number),
-                status = VALUES(status),
-                xa_res_api_ng_response = VALUES(xa_res_api_ng_response),
-                xa_api_ng_dispatch = VALUES(xa_api_ng_dispatch),
-                xa_sap_crt_ldg = VALUES(xa_sap_crt_ldg),
-                xa_sap_crt = VALUES(xa_sap_crt),
-                sap_error_raw_extracted = VALUES(sap_error_raw_extracted),
-                ng_dispatch_message = VALUES(ng_dispatch_message),
-                ng_response_message = VALUES(ng_response_message),
-                sap_response_message = VALUES(sap_response_message),
-                sap_error_category = VALUES(sap_error_category),
-                appt_number_norm = VALUES(appt_number_norm),
-                last_seen_at = NOW()
-        """
+        job_update(job_id, status="running", message="Iniciando importação...", progress=1)
+
+        columns = (
+            "activity_id",
+            "date",
+            "city",
+            "activity_type",
+            "appt_number",
+            "status",
+            "xa_res_api_ng_response",
+            "xa_api_ng_dispatch",
+            "xa_sap_crt_ldg",
+            "xa_sap_crt",
+            "sap_error_raw_extracted",
+            "ng_dispatch_message",
+            "ng_response_message",
+            "sap_response_message",
+            "sap_error_category",
+            "appt_number_norm",
+            "erro_tipo",
+        )
+
+        max_pages = 30
 
         for day_index, day in enumerate(days, start=1):
 
@@ -163,104 +245,61 @@ def run_import_job(job_id: int, date_from: str, date_to: str, resources: str, ac
                 )
                 return
 
-            items = []
-            has_more = True
-            page = 0
-            max_pages = 30
-            offset = 0
-
-            while has_more and page < max_pages:
-
-                if job_should_cancel(job_id):
-                    job_update(
-                        job_id,
-                        status="canceled",
-                        message="Operação cancelada pelo usuário.",
-                        progress=0,
-                    )
-                    return
-
-                base_params = {
-                    "dateFrom": day,
-                    "dateTo": day,
-                    "resources": resources,
-                    "q": "status == 'notdone' OR status == 'completed'",
-                    "fields": ",".join(fields),
-                    "limit": 2000,
-                    "offset": offset,
-                }
-
-                qs = urlencode(base_params, safe="=,'")
-                url = f"{client.base_url}/activities/?{qs}"
-
-                data = client.authenticated_get(url)
-                batch = data.get("items") or []
-
-                items.extend(batch)
-
-                has_more = bool(data.get("hasMore"))
-                offset = len(items)
-                page += 1
-
-                pct_base = int(((day_index - 1) / max(1, total_days)) * 80)
-                pct_page = int((page / max(1, max_pages)) * (80 / max(1, total_days)))
-                progress = min(75, pct_base + pct_page + 5)
-
-                job_update(
-                    job_id,
-                    progress=progress,
-                    message=f"API: dia {day} | página {page}/{max_pages}",
-                )
-
-            total_api_items += len(items)
-
-            job_update(
-                job_id,
-                message=f"Gravando dia {day} no banco ({len(items)} itens)...",
-                progress=min(85, 5 + int((day_index / max(1, total_days)) * 80)),
-            )
-
+            # O dia é regravado numa única transação, mas cada página da API
+            # já é persistida assim que chega (sem acumular o dia em memória).
+            # As linhas que sumiram da API saem só depois do crawl (DELETE por
+            # last_seen_at), para não segurar o lock do dia durante o HTTP.
             conn = get_connection()
             cur = conn.cursor()
 
             try:
-                cur.execute(
-                    """
-                    DELETE FROM ofs_activities_errors
-                    WHERE `date` = %s
-                    """,
-                    (day,),
-                )
+                cur.execute("SELECT NOW()")
+                day_started_at = cur.fetchone()[0]
 
                 inserted_day = 0
                 updated_day = 0
+                day_api_items = 0
+                canceled = False
 
-                for idx, a in enumerate(items, start=1):
+                for page_data in client.iter_activity_pages(
+                    day,
+                    day,
+                    resources,
+                    q="status == 'notdone' OR status == 'completed'",
+                    fields=fields,
+                    limit=2000,
+                    max_pages=max_pages,
+                ):
+                    batch = page_data["items"]
+                    page = page_data["page"]
+                    day_api_items += len(batch)
 
-                    activity_id = str(a.get("activityId") or "").strip()
-                    if not activity_id:
-                        continue
+                    rows = []
 
-                    appt_number = str(a.get("apptNumber") or "").strip() or None
-                    appt_number_norm = normalize_appt_number(appt_number)
+                    for a in batch:
 
-                    ng_dispatch_raw = a.get("XA_API_NG_DISPATCH")
-                    ng_response_raw = a.get("XA_RES_API_NG_RESPONSE")
+                        activity_id = str(a.get("activityId") or "").strip()
+                        if not activity_id:
+                            continue
 
-                    ng_dispatch_msg = _extract_message(ng_dispatch_raw)
-                    ng_response_msg = _extract_message(ng_response_raw)
+                        appt_number = str(a.get("apptNumber") or "").strip() or None
+                        appt_number_norm = normalize_appt_number(appt_number)
 
-                    sap_raw = a.get("XA_SAP_CRT_LDG")
-                    xa_sap_crt = str(a.get("XA_SAP_CRT") or "").strip() or None
+                        ng_dispatch_raw = a.get("XA_API_NG_DISPATCH")
+                        ng_response_raw = a.get("XA_RES_API_NG_RESPONSE")
 
-                    sap_info = parse_sap_error(
-                        raw_value=sap_raw,
-                        xa_sap_crt=xa_sap_crt,
-                    )
+                        ng_dispatch_msg = _extract_message(ng_dispatch_raw)
+                        ng_response_msg = _extract_message(ng_response_raw)
+
+                        sap_raw = a.get("XA_SAP_CRT_LDG")
+                        xa_sap_crt = str(a.get("XA_SAP_CRT") or "").strip() or None
+
+                        sap_info = parse_sap_error(
+                            raw_value=sap_raw,
+                            xa_sap_crt=xa_sap_crt,
+                        )
 
-                    cur.execute(
-                        sql,
-                        (
+                        rows.append((
                             activity_id,
                             str(a.get("date") or "").strip() or None,
                             str(a.get("city") or "").strip() or None,
@@ -277,18 +316,67 @@ def run_import_job(job_id: int, date_from: str, date_to: str, resources: str, ac
                             sap_info["sap_response_message"],
                             sap_info["sap_error_category"],
                             appt_number_norm or None,
-                        ),
+                            classify_erro_tipo(xa_sap_crt, ng_response_raw, ng_dispatch_raw),
+                        ))
+
+                    result = bulk_upsert(
+                        cur,
+                        "ofs_activities_errors",
+                        columns,
+                        rows,
+                        key_columns=("activity_id",),
+                        extra_values={"last_seen_at": "NOW()"},
                     )
+                    inserted_day += result["inserted"]
+                    updated_day += result["updated"]
 
-                    if cur.rowcount == 1:
-                        inserted_day += 1
-                    elif cur.rowcount == 2:
-                        updated_day += 1
+                    pct_base = int(((day_index - 1) / max(1, total_days)) * 80)
+                    pct_page = int((page / max(1, max_pages)) * (80 / max(1, total_days)))
+                    progress = min(75, pct_base + pct_page + 5)
+
+                    job_update(
+                        job_id,
+                        progress=progress,
+                        message=f"API: dia {day} | página {page}/{max_pages} | {day_api_items} itens gravados",
+                    )
+
+                    if job_should_cancel(job_id):
+                        canceled = True
+                        break
+
+                if canceled:
+                    conn.rollback()
+                    job_update(
+                        job_id,
+                        status="canceled",
+                        message="Operação cancelada pelo usuário.",
+                        progress=0,
+                    )
+                    return
+
+                total_api_items += day_api_items
+
+                job_update(
+                    job_id,
+                    message=f"Gravando dia {day} no banco ({day_api_items} itens)...",
+                    progress=min(85, 5 + int((day_index / max(1, total_days)) * 80)),
+                )
+
+                cur.execute(
+                    """
+                    DELETE FROM ofs_activities_errors
+                    WHERE `date` = %s
+                      AND (last_seen_at < %s OR last_seen_at IS NULL)
+                    """,
+                    (day, day_started_at),
+                )
+                removed_day = max(0, cur.rowcount)
 
                 conn.commit()
 
                 total_inserted += inserted_day
                 total_updated += updated_day
+                total_removed += removed_day
 
             except Exception:
                 conn.rollback()
@@ -305,6 +393,7 @@ def run_import_job(job_id: int, date_from: str, date_to: str, resources: str, ac
             message=(
                 f"Concluído. Novos: {total_inserted} | "
                 f"Atualizados: {total_updated} | "
+                f"Removidos: {total_removed} | "
                 f"Total API: {total_api_items}"
             ),
         )
@@ -317,4 +406,26 @@ def run_import_job(job_id: int, date_from: str, date_to: str, resources: str, ac
             status="error",
             message=f"{type(e).__name__}: {str(e)[:220]}",
             progress=0,
-        )
\ No newline at end of file
+        )
+
+
+def _mark_import_job_queued(position: int, job_id: int, *args):
+    job_update(job_id, status="queued", message=f"Na fila - posição {position}")
+
+
+def _mark_import_job_interrupted(job_id: int, *args):
+    job_update(
+        job_id,
+        status="error",
+        message="Interrompido por reinício do servidor. Rode a importação novamente.",
+        progress=0,
+    )
+
+
+job_queue.register_job(
+    "erros_import",
+    "ofs_import",
+    run_import_job,
+    _mark_import_job_queued,
+    _mark_import_job_interrupted,
+)
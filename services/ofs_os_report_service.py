@@ -1,24 +1,52 @@
+import hashlib
 import json
+import math
 import os
 import time
-import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple
 
-import requests
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
 from database.connection import get_connection
 from database.audit import audit_log
+from database.bulk import bulk_insert, bulk_update
 from ofs.client import OFSClient
-from core.utils import xlsx_auto_width
+from ofs.activity_id_set import ActivityIdSet
+from ofs.shards import SHARD_WORKERS, build_activity_shards, count_activity_shards, iter_activity_shards
+from services.ofs_resource_hierarchy_service import store_resource_hierarchy
+from core.xlsx_writer import StreamingXlsxWriter
+from core.job_events import publish as publish_job_event
+from core import job_queue, job_status_store, lookup_cache
 
 
 REQUEST_TIMEOUT = 60
 API_LIMIT = 2000
 
+# Quebra cada dia também por recurso (um shard por recurso selecionado).
+# Útil quando um único dia com muitos recursos estoura o tempo limite do OFS.
+REPORT_SHARD_BY_RESOURCE = os.getenv("OFS_REPORT_SHARD_BY_RESOURCE", "false").lower() in ("1", "true", "yes")
+
+# Relatórios com mais dias que isso entram na fila com prioridade baixa.
+LONG_REPORT_DAYS = int(os.getenv("OFS_REPORT_LONG_DAYS", "7"))
+
+# Estimativa antes de enfileirar (sonda limit=1 por shard). Acima de
+# OFS_REPORT_MAX_ESTIMATED_ROWS a extração é recusada (0 desliga); acima de
+# OFS_REPORT_LOW_PRIORITY_ROWS entra com prioridade baixa.
+REPORT_ESTIMATE_ENABLED = os.getenv("OFS_REPORT_ESTIMATE_ENABLED", "true").lower() not in ("0", "false", "no")
+REPORT_MAX_ESTIMATED_ROWS = int(os.getenv("OFS_REPORT_MAX_ESTIMATED_ROWS", "600000"))
+REPORT_LOW_PRIORITY_ROWS = int(os.getenv("OFS_REPORT_LOW_PRIORITY_ROWS", "150000"))
+# Tempo médio de uma página de API_LIMIT atividades, para a previsão de término.
+REPORT_SECONDS_PER_PAGE = float(os.getenv("OFS_REPORT_SECONDS_PER_PAGE", "3"))
+# A estimativa roda dentro do POST (recusa e prioridade saem dela antes de
+# enfileirar), então o prazo é curto: dias já consultados saem do cache e, se
+# as sondas não couberem no prazo, o job segue sem estimativa. Shards além do
+# teto de sondas são extrapolados pela média dos que foram contados.
+REPORT_ESTIMATE_TIMEOUT_SECONDS = float(os.getenv("OFS_REPORT_ESTIMATE_TIMEOUT_SECONDS", "3"))
+REPORT_ESTIMATE_MAX_PROBES = int(os.getenv("OFS_REPORT_ESTIMATE_MAX_PROBES", "62"))
+
 RESOURCE_TYPES = {
     "BK": "Bucket",
     "ESTADO": "Estado",
@@ -38,6 +66,19 @@ RESOURCE_TYPES_OFS = {
     "TCV": "Técnico Vero",
 }
 
+RESOURCE_TABLE_COLUMNS = (
+    "resource_id",
+    "resource_type",
+    "resource_type_label",
+    "name",
+    "status",
+)
+
+# Status gravado para recursos que deixaram de vir do OFS na sincronização.
+# Diferente do "inactive" do próprio OFS: a linha fica (os relatórios antigos
+# ainda resolvem o nome), mas sai da lista de seleção de recursos.
+RESOURCE_MISSING_STATUS = "missing"
+
 ESTADO_RESOURCE_IDS = {
     "GO",
     "MG",
@@ -319,96 +360,67 @@ def _thermometer_conclusion(value):
     return value
 
 
-def _fetch_thermometer_activities(client: OFSClient, config: dict, base_dir: str, job_id: str, status_payload: dict) -> List[dict]:
-    url = f"{client.base_url}/activities/"
-    headers = {"Accept": "application/json"}
-    resources_param = ",".join(config["resources"])
+def _fetch_thermometer_activities(client: OFSClient, config: dict, base_dir: str, job_id: str, status_payload: dict, on_item) -> int:
+    """Entrega a on_item cada atividade avaliada (sem duplicadas). Retorna o total."""
     status_query = _build_or_equals_query("status", config["statuses"])
     activity_type_query = _build_or_equals_query("activityType", config["activity_types"])
     combined_query = f"{status_query} and {activity_type_query}"
 
-    all_items = []
-    seen_activity_ids = set()
+    total_rows = 0
+    seen_activity_ids = ActivityIdSet()
     date_list = list(_iter_date_strings(config["date_from"], config["date_to"]))
     total_days = len(date_list)
+    day_indexes = {day: index for index, day in enumerate(date_list, start=1)}
+    shards = build_activity_shards(date_list, config["resources"])
+    cache_stats = {"cache_hits": 0, "cache_misses": 0}
+
+    with closing(iter_activity_shards(
+        client,
+        shards,
+        q=combined_query,
+        fields=THERMOMETER_API_FIELDS,
+        limit=API_LIMIT,
+        timeout=REQUEST_TIMEOUT,
+        cache_stats=cache_stats,
+    )) as shard_pages:
+        for shard, page_data in shard_pages:
+            day = shard["day"]
+
+            for item in page_data["items"]:
+                activity_id = str(item.get("activityId") or "").strip()
 
-    for day_index, day in enumerate(date_list, start=1):
-        offset = 0
-        page = 1
-
-        while True:
-            params = [
-                ("dateFrom", day),
-                ("dateTo", day),
-                ("resources", resources_param),
-                ("q", combined_query),
-                ("fields", ",".join(THERMOMETER_API_FIELDS)),
-                ("limit", str(API_LIMIT)),
-                ("offset", str(offset)),
-            ]
+                if activity_id and not seen_activity_ids.add(activity_id):
+                    continue
+
+                if _has_customer_rating(item):
+                    on_item(item)
+                    total_rows += 1
 
             status_payload.update({
                 "status": "running",
-                "phase": f"Consultando termômetro - {day} - página {page}",
-                "rows_so_far": len(all_items),
+                "phase": f"Consultando termômetro - {day} - página {page_data['page']}",
+                "rows_so_far": total_rows,
                 "current_day": day,
-                "current_day_index": day_index,
+                "current_day_index": day_indexes[day],
                 "total_days": total_days,
-                "offset": offset,
-                "page": page,
+                "offset": page_data["offset"],
+                "page": page_data["page"],
+                **cache_stats,
             })
             _write_job_status(base_dir, job_id, status_payload)
 
-            resp = requests.get(
-                url,
-                headers=headers,
-                params=params,
-                auth=client.auth,
-                timeout=REQUEST_TIMEOUT,
-            )
-            resp.raise_for_status()
-
-            data = resp.json()
-            items = _normalize_items_payload(data)
+    return total_rows
 
-            if not items:
-                break
-
-            for item in items:
-                activity_id = str(item.get("activityId") or "").strip()
-
-                if activity_id:
-                    if activity_id in seen_activity_ids:
-                        continue
-                    seen_activity_ids.add(activity_id)
-
-                if _has_customer_rating(item):
-                    all_items.append(item)
-
-            has_more = bool(data.get("hasMore")) if isinstance(data, dict) else False
-            if not has_more:
-                break
-
-            offset += len(items)
-            page += 1
-
-    return all_items
-
-
-def _build_thermometer_xlsx(rows: List[dict], output_path: str):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Termômetro Cliente"
-    ws.append(THERMOMETER_HEADERS)
 
+def _thermometer_row_builder():
     resource_name_map = _load_resource_name_map()
     activity_type_label_map = _load_activity_type_label_map()
 
-    for item in rows:
+    def build_row(item: dict) -> list:
         resource_id = str(item.get("resourceId") or "").strip()
         activity_type = str(item.get("activityType") or "").strip()
 
-        ws.append([
+        return [
             item.get("apptNumber") or "",
             item.get("XA_AV_CLI") or "",
             item.get("XA_AV_CLI_CAT") or "",
@@ -422,27 +434,9 @@ def _build_thermometer_xlsx(rows: List[dict], output_path: str):
             item.get("XA_TSK_NOT") or "",
             item.get("date") or "",
             item.get("XA_REQ_CRE_DAT") or "",
-        ])
-
-    header_fill = PatternFill("solid", fgColor="1F4E78")
-    header_font = Font(color="FFFFFF", bold=True)
-    thin = Side(style="thin", color="D9E2F3")
-    border = Border(left=thin, right=thin, top=thin, bottom=thin)
-
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        cell.border = border
-
-    for row in ws.iter_rows(min_row=2):
-        for cell in row:
-            cell.border = border
-            cell.alignment = Alignment(vertical="top")
+        ]
 
-    ws.freeze_panes = "A2"
-    xlsx_auto_width(ws)
-    wb.save(output_path)
+    return build_row
 
 
 def _run_thermometer_report_job(base_dir: str, job_id: str, actor: dict, config: dict):
@@ -466,25 +460,32 @@ def _run_thermometer_report_job(base_dir: str, job_id: str, actor: dict, config:
 
     try:
         client = OFSClient()
-        rows = _fetch_thermometer_activities(client, config, base_dir, job_id, status_payload)
-
-        status_payload.update({
-            "status": "running",
-            "phase": "Gerando XLSX",
-            "rows_so_far": len(rows),
-            "total_rows": len(rows),
-        })
-        _write_job_status(base_dir, job_id, status_payload)
+        build_row = _thermometer_row_builder()
+
+        with StreamingXlsxWriter(_job_xlsx_path(base_dir, job_id), "Termômetro Cliente", THERMOMETER_HEADERS) as xlsx:
+            total_rows = _fetch_thermometer_activities(
+                client,
+                config,
+                base_dir,
+                job_id,
+                status_payload,
+                lambda item: xlsx.write_row(build_row(item)),
+            )
 
-        output_path = _job_xlsx_path(base_dir, job_id)
-        _build_thermometer_xlsx(rows, output_path)
+            status_payload.update({
+                "status": "running",
+                "phase": "Consulta OFS concluída. Finalizando XLSX.",
+                "rows_so_far": total_rows,
+                "total_rows": total_rows,
+            })
+            _write_job_status(base_dir, job_id, status_payload)
 
         status_payload.update({
             "status": "completed",
             "phase": "Relatório do termômetro concluído",
             "finished_at": _now_iso(),
-            "rows_so_far": len(rows),
-            "total_rows": len(rows),
+            "rows_so_far": total_rows,
+            "total_rows": total_rows,
             "download_ready": True,
         })
         _write_job_status(base_dir, job_id, status_payload)
@@ -501,7 +502,7 @@ def _run_thermometer_report_job(base_dir: str, job_id: str, actor: dict, config:
                 "dateFrom": config["date_from"],
                 "dateTo": config["date_to"],
                 "resources": config["resources"],
-                "total_rows": len(rows),
+                "total_rows": total_rows,
                 "filename": filename,
             },
         )
@@ -518,6 +519,7 @@ def _run_thermometer_report_job(base_dir: str, job_id: str, actor: dict, config:
 
 def start_thermometer_report_job(base_dir: str, actor: dict, config: dict) -> str:
     _ensure_dir(base_dir)
+    job_queue.ensure_capacity("relatorio_termometro", _report_user_key(actor))
     job_id = uuid.uuid4().hex
 
     _write_job_status(base_dir, job_id, {
@@ -531,12 +533,13 @@ def start_thermometer_report_job(base_dir: str, actor: dict, config: dict) -> st
         "error": None,
     })
 
-    thread = threading.Thread(
-        target=_run_thermometer_report_job,
-        args=(base_dir, job_id, actor, config),
-        daemon=True,
+    job_queue.submit(
+        "relatorio_termometro",
+        job_id,
+        (base_dir, job_id, actor, config),
+        user_key=_report_user_key(actor),
+        priority=_report_priority(config),
     )
-    thread.start()
 
     return job_id
 def _field_allowed_for_user(
@@ -609,46 +612,59 @@ def _job_xlsx_path(base_dir: str, job_id: str) -> str:
 
 
 def _write_job_status(base_dir: str, job_id: str, payload: dict):
-    _ensure_dir(base_dir)
-
-    path = _job_status_path(base_dir, job_id)
-
+    """
+    Atualiza o status do job. Fica em memória e vai para disco de forma
+    espaçada (core.job_status_store); mudança de status grava na hora.
+    """
     payload["job_id"] = job_id
     payload["updated_at"] = _now_iso()
 
-    tmp_path = os.path.join(
-        base_dir,
-        f"{job_id}.{uuid.uuid4().hex}.json.tmp"
-    )
+    data = job_status_store.write(_job_status_path(base_dir, job_id), payload)
+    publish_job_event("relatorios", job_id, data)
 
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
 
-    last_error = None
+def _report_user_key(actor: dict):
+    return (actor or {}).get("id") or (actor or {}).get("username")
 
-    for attempt in range(12):
-        try:
-            os.replace(tmp_path, path)
-            return
 
-        except PermissionError as e:
-            last_error = e
-            time.sleep(0.15 * (attempt + 1))
+def _report_priority(config: dict, estimate: dict = None) -> int:
+    total_days = len(list(_iter_date_strings(config["date_from"], config["date_to"])))
+    if total_days > LONG_REPORT_DAYS:
+        return job_queue.PRIORITY_LOW
+    if estimate and REPORT_LOW_PRIORITY_ROWS and estimate["expected_rows"] > REPORT_LOW_PRIORITY_ROWS:
+        return job_queue.PRIORITY_LOW
+    return job_queue.PRIORITY_NORMAL
 
-        except OSError as e:
-            last_error = e
-            time.sleep(0.15 * (attempt + 1))
 
-    try:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
-    except Exception:
-        pass
+def _mark_report_queued(position: int, base_dir: str, job_id: str, *args):
+    status = read_job_status(base_dir, job_id)
 
-    raise last_error
+    if status.get("status") != "queued":
+        return
 
+    status.update({
+        "queue_position": position,
+        "phase": f"Na fila - posição {position}",
+    })
+    _write_job_status(base_dir, job_id, status)
 
-def _load_resource_name_map() -> Dict[str, str]:
+
+def _mark_report_interrupted(base_dir: str, job_id: str, *args):
+    status = read_job_status(base_dir, job_id)
+
+    if status.get("status") not in ("queued", "running"):
+        return
+
+    status.update({
+        "status": "failed",
+        "phase": "Interrompido por reinício do servidor",
+        "finished_at": _now_iso(),
+        "error": "O servidor reiniciou durante a execução. Gere o relatório novamente.",
+    })
+    _write_job_status(base_dir, job_id, status)
+
+
+def _query_resource_name_map() -> Dict[str, str]:
     conn = get_connection()
     cur = conn.cursor(dictionary=True)
 
@@ -678,7 +694,7 @@ def _load_resource_name_map() -> Dict[str, str]:
         cur.close()
         conn.close()
 
-def _load_resource_status_map() -> Dict[str, str]:
+def _query_resource_status_map() -> Dict[str, str]:
     conn = get_connection()
     cur = conn.cursor(dictionary=True)
 
@@ -704,6 +720,8 @@ def _load_resource_status_map() -> Dict[str, str]:
                 mapping[resource_id] = "Ativo"
             elif status == "inactive":
                 mapping[resource_id] = "Inativo"
+            elif status == RESOURCE_MISSING_STATUS:
+                mapping[resource_id] = "Removido do OFS"
             elif status:
                 mapping[resource_id] = status
             else:
@@ -715,7 +733,7 @@ def _load_resource_status_map() -> Dict[str, str]:
         cur.close()
         conn.close()
 
-def _load_activity_type_label_map() -> Dict[str, str]:
+def _query_activity_type_label_map() -> Dict[str, str]:
     mapping = {}
 
     for item in list_activity_types():
@@ -780,7 +798,7 @@ def _fetch_property_enumeration_page(
     base_url = _metadata_base_url(client)
     url = f"{base_url}/properties/{property_code}/enumerationList"
 
-    response = requests.get(
+    response = client.session.get(
         url,
         params={
             "limit": limit,
@@ -880,6 +898,8 @@ def sync_task_type_map(actor: dict = None) -> dict:
         cur.close()
         conn.close()
 
+    lookup_cache.invalidate("task_types")
+
     try:
         audit_log(
             actor_user_id=actor.get("id"),
@@ -908,7 +928,7 @@ def sync_task_type_map(actor: dict = None) -> dict:
     }
 
 
-def _load_task_type_name_map() -> Dict[str, str]:
+def _query_task_type_name_map() -> Dict[str, str]:
     """
     Carrega o mapa local de XA_TSK_TYP:
       label/ID -> name_br
@@ -948,7 +968,7 @@ def _load_task_type_name_map() -> Dict[str, str]:
         cur.close()
         conn.close()
 
-def _load_close_reason_name_map() -> Dict[Tuple[str, str], str]:
+def _query_close_reason_name_map() -> Dict[Tuple[str, str], str]:
     """
     Carrega o mapa de motivos de fechamento.
 
@@ -989,9 +1009,34 @@ def _load_close_reason_name_map() -> Dict[Tuple[str, str], str]:
         cur.close()
         conn.close()
 
+
+def _load_resource_name_map() -> Dict[str, str]:
+    return lookup_cache.get("ofs_resources.names")
+
+
+def _load_resource_status_map() -> Dict[str, str]:
+    return lookup_cache.get("ofs_resources.status")
+
+
+def _load_activity_type_label_map() -> Dict[str, str]:
+    return lookup_cache.get("activity_types.labels")
+
+
+def _load_task_type_name_map() -> Dict[str, str]:
+    return lookup_cache.get("task_types.names")
+
+
+def _load_close_reason_name_map() -> Dict[Tuple[str, str], str]:
+    return lookup_cache.get("close_reasons.names")
+
+
 def read_job_status(base_dir: str, job_id: str) -> dict:
     path = _job_status_path(base_dir, job_id)
 
+    cached = job_status_store.read(path)
+    if cached is not None:
+        return cached
+
     if not os.path.exists(path):
         return {}
 
@@ -1016,7 +1061,11 @@ def read_job_status(base_dir: str, job_id: str) -> dict:
 
     print(f"[WARN] Falha ao ler status do job {job_id}: {last_error}")
     return {}
+
+
 def discard_job(base_dir: str, job_id: str):
+    job_status_store.discard(_job_status_path(base_dir, job_id))
+
     for path in [_job_status_path(base_dir, job_id), _job_xlsx_path(base_dir, job_id)]:
         if os.path.exists(path):
             os.remove(path)
@@ -1041,12 +1090,13 @@ def list_resources_grouped() -> Dict[str, List[dict]]:
                 name,
                 status
             FROM relatorios_ofs_resources
+            WHERE status <> %s
             ORDER BY
                 resource_type_label ASC,
                 CASE WHEN status = 'active' THEN 1 ELSE 2 END,
                 name ASC,
                 resource_id ASC
-        """)
+        """, (RESOURCE_MISSING_STATUS,))
         rows = cur.fetchall()
 
         for row in rows:
@@ -1234,109 +1284,216 @@ def validate_redes_report_payload(payload: dict, can_view_extra_fields: bool = F
 
     return config
 
-def sync_resources_from_ofs(actor: dict) -> Tuple[int, int]:
-    client = OFSClient()
-
-    url = f"{client.base_url}/resources"
-    headers = {"Accept": "application/json"}
 
-    limit = 100
-    offset = 0
+RESOURCE_PAGE_LIMIT = 100
+RESOURCE_MAX_PAGES = 500
+RESOURCE_FIELDS = "resourceId,status,resourceType,name,parentResourceId,XR_PARENT_RESOURCE"
 
-    all_rows = []
+# Páginas de /resources consultadas em paralelo quando o OFS informa o total.
+RESOURCE_SYNC_WORKERS = int(os.getenv("OFS_RESOURCE_SYNC_WORKERS", "4"))
 
-    raw_total = 0
-    active_total = 0
-    inactive_total = 0
-    allowed_type_total = 0
-    ignored_type = {}
 
-    while True:
-        params = {
-            "fields": "resourceId,status,resourceType,name",
-            "limit": limit,
+def _fetch_resource_page(client: OFSClient, offset: int) -> dict:
+    resp = client.session.get(
+        f"{client.base_url}/resources",
+        headers={"Accept": "application/json"},
+        params={
+            "fields": RESOURCE_FIELDS,
+            "limit": RESOURCE_PAGE_LIMIT,
             "offset": offset,
-        }
+        },
+        auth=client.auth,
+        timeout=REQUEST_TIMEOUT,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _iter_resource_pages(client: OFSClient, on_request=None):
+    """
+    Gera (página, offset, itens, total_esperado) de /resources, em ordem.
+
+    A primeira página é consultada sozinha; se ela trouxer o total, as
+    demais saem em paralelo (RESOURCE_SYNC_WORKERS). Sem total, ou se o
+    total estiver desatualizado e a última página vier cheia, segue uma
+    página por vez. on_request(página, offset, total) é chamado antes de
+    cada página esperada.
+
+    No paralelo, uma página curta antes do total esperado quer dizer que a
+    lista mudou no meio da consulta (os offsets andaram e recursos podem ter
+    ficado de fora): levanta RuntimeError em vez de devolver um crawl
+    incompleto, que desativaria recursos que ainda existem.
+    """
+    if on_request:
+        on_request(1, 0, None)
+
+    data = _fetch_resource_page(client, 0)
+    total_expected = _extract_total_from_resource_payload(data)
+    items = _normalize_items_payload(data)
+
+    yield 1, 0, items, total_expected
 
-        resp = requests.get(
-            url,
-            headers=headers,
-            params=params,
-            auth=client.auth,
-            timeout=REQUEST_TIMEOUT,
+    if len(items) < RESOURCE_PAGE_LIMIT:
+        return
+
+    page = 2
+    offset = RESOURCE_PAGE_LIMIT
+
+    if total_expected and total_expected > offset and RESOURCE_SYNC_WORKERS > 1:
+        offsets = list(range(offset, total_expected, RESOURCE_PAGE_LIMIT))[:RESOURCE_MAX_PAGES - 1]
+        executor = ThreadPoolExecutor(
+            max_workers=min(RESOURCE_SYNC_WORKERS, len(offsets)),
+            thread_name_prefix="ofs-resources",
         )
-        resp.raise_for_status()
 
-        data = resp.json()
-        items = _normalize_items_payload(data)
+        try:
+            futures = [executor.submit(_fetch_resource_page, client, value) for value in offsets]
+
+            for value, future in zip(offsets, futures):
+                if on_request:
+                    on_request(page, value, total_expected)
+
+                items = _normalize_items_payload(future.result())
+
+                if len(items) < RESOURCE_PAGE_LIMIT and value + len(items) < total_expected:
+                    raise RuntimeError(
+                        "A lista de recursos do OFS mudou durante a consulta "
+                        f"(página {page} incompleta, esperado {total_expected}). Tente novamente."
+                    )
+
+                yield page, value, items, total_expected
+
+                if len(items) < RESOURCE_PAGE_LIMIT:
+                    return
+
+                page += 1
+                offset = value + RESOURCE_PAGE_LIMIT
+
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    while True:
+        if page > RESOURCE_MAX_PAGES:
+            raise RuntimeError("Limite máximo de páginas atingido ao consultar recursos OFS.")
+
+        if on_request:
+            on_request(page, offset, total_expected)
+
+        items = _normalize_items_payload(_fetch_resource_page(client, offset))
 
         if not items:
-            break
+            return
 
-        raw_total += len(items)
+        yield page, offset, items, total_expected
 
-        for item in items:
-            resource_id = str(item.get("resourceId") or "").strip()
-            status = str(item.get("status") or "").strip().lower()
-            resource_type = str(item.get("resourceType") or "").strip()
-            name = str(item.get("name") or "").strip()
+        if len(items) < RESOURCE_PAGE_LIMIT:
+            return
 
-            if not resource_id:
-                continue
+        offset += RESOURCE_PAGE_LIMIT
+        page += 1
 
-            if not status:
-                status = "unknown"
 
-            if status == "active":
-                active_total += 1
-            else:
-                inactive_total += 1
+def _new_resource_sync_stats() -> dict:
+    return {
+        "raw_total": 0,
+        "active_total": 0,
+        "inactive_total": 0,
+        "allowed_type_total": 0,
+        "ignored_type": {},
+    }
 
-            if resource_type not in RESOURCE_TYPES_OFS:
-                ignored_type[resource_type or "-"] = ignored_type.get(resource_type or "-", 0) + 1
-                continue
 
-            allowed_type_total += 1
+def _collect_resource_rows(items: List[dict], rows: Dict[str, tuple], stats: dict):
+    """Converte os itens de uma página em linhas da tabela (chave resource_id)."""
+    stats["raw_total"] += len(items)
 
-            all_rows.append({
-                "resource_id": resource_id,
-                "resource_type": resource_type,
-                "resource_type_label": RESOURCE_TYPES_OFS[resource_type],
-                "name": name or None,
-                "status": status,
-            })
+    for item in items:
+        resource_id = str(item.get("resourceId") or "").strip()
+        status = str(item.get("status") or "").strip().lower()
+        resource_type = str(item.get("resourceType") or "").strip()
+        name = str(item.get("name") or "").strip()
 
-        if len(items) < limit:
-            break
+        if not resource_id:
+            continue
+
+        if not status:
+            status = "unknown"
+
+        if status == "active":
+            stats["active_total"] += 1
+        else:
+            stats["inactive_total"] += 1
+
+        if resource_type not in RESOURCE_TYPES_OFS:
+            ignored_type = stats["ignored_type"]
+            ignored_type[resource_type or "-"] = ignored_type.get(resource_type or "-", 0) + 1
+            continue
 
-        offset += limit
+        stats["allowed_type_total"] += 1
 
+        rows[resource_id] = (
+            resource_id,
+            resource_type,
+            RESOURCE_TYPES_OFS[resource_type],
+            name or None,
+            status,
+        )
+
+
+def _resource_row_hash(row) -> str:
+    return hashlib.sha1(
+        json.dumps([None if value is None else str(value) for value in row]).encode("utf-8")
+    ).hexdigest()
+
+
+def _apply_resource_rows(rows: Dict[str, tuple]) -> dict:
+    """
+    Aplica na relatorios_ofs_resources só a diferença para o que já está
+    gravado: insere os novos, atualiza os que mudaram (comparando o hash da
+    linha) e marca como inativos os que sumiram do OFS. A transação só
+    escreve o que mudou, em lotes.
+    """
     conn = get_connection()
     cur = conn.cursor()
 
     try:
-        cur.execute("DELETE FROM relatorios_ofs_resources")
+        cur.execute(f"SELECT {', '.join(RESOURCE_TABLE_COLUMNS)} FROM relatorios_ofs_resources")
 
-        sql = """
-            INSERT INTO relatorios_ofs_resources
-            (
-                resource_id,
-                resource_type,
-                resource_type_label,
-                name,
-                status
-            )
-            VALUES (%s, %s, %s, %s, %s)
-        """
-
-        for row in all_rows:
-            cur.execute(sql, (
-                row["resource_id"],
-                row["resource_type"],
-                row["resource_type_label"],
-                row["name"],
-                row["status"],
-            ))
+        stored = {}
+        stored_status = {}
+
+        for row in cur.fetchall():
+            resource_id = str(row[0] or "").strip()
+            if not resource_id:
+                continue
+            stored[resource_id] = _resource_row_hash(row)
+            stored_status[resource_id] = str(row[4] or "").strip().lower()
+
+        to_insert = []
+        to_update = []
+
+        for resource_id, row in rows.items():
+            stored_hash = stored.get(resource_id)
+
+            if stored_hash is None:
+                to_insert.append(row)
+            elif stored_hash != _resource_row_hash(row):
+                to_update.append(row)
+
+        to_deactivate = [
+            (resource_id, RESOURCE_MISSING_STATUS)
+            for resource_id, status in stored_status.items()
+            if resource_id not in rows and status != RESOURCE_MISSING_STATUS
+        ]
+
+        if to_insert:
+            bulk_insert(cur, "relatorios_ofs_resources", RESOURCE_TABLE_COLUMNS, to_insert)
+
+        if to_update:
+            bulk_update(cur, "relatorios_ofs_resources", "resource_id", RESOURCE_TABLE_COLUMNS[1:], to_update)
+
+        if to_deactivate:
+            bulk_update(cur, "relatorios_ofs_resources", "resource_id", ("status",), to_deactivate)
 
         conn.commit()
 
@@ -1348,6 +1505,44 @@ def sync_resources_from_ofs(actor: dict) -> Tuple[int, int]:
         cur.close()
         conn.close()
 
+    return {
+        "inserted": len(to_insert),
+        "updated": len(to_update),
+        "deactivated": len(to_deactivate),
+        "unchanged": len(rows) - len(to_insert) - len(to_update),
+    }
+
+
+def _store_resource_hierarchy_from_sync(items: List[dict]):
+    """
+    Aproveita o crawl da sincronização para renovar o cache de hierarquia
+    usado na exportação de usuários. Falha aqui não derruba a sincronização.
+    """
+    try:
+        store_resource_hierarchy(items, full_refresh=True)
+    except Exception as e:
+        print(f"[WARN] Falha ao atualizar cache de hierarquia de recursos: {e}")
+
+
+def sync_resources_from_ofs(actor: dict) -> Tuple[int, int]:
+    client = OFSClient()
+
+    rows = {}
+    hierarchy_items = []
+    stats = _new_resource_sync_stats()
+    offset = 0
+
+    for _, offset, items, _ in _iter_resource_pages(client):
+        hierarchy_items.extend(items)
+        _collect_resource_rows(items, rows, stats)
+
+    changes = _apply_resource_rows(rows)
+
+    _store_resource_hierarchy_from_sync(hierarchy_items)
+
+    if changes["inserted"] or changes["updated"] or changes["deactivated"]:
+        lookup_cache.invalidate("ofs_resources")
+
     audit_log(
         actor_user_id=actor.get("id"),
         actor_username=actor.get("username"),
@@ -1356,19 +1551,20 @@ def sync_resources_from_ofs(actor: dict) -> Tuple[int, int]:
         entity_type="ofs_resources",
         summary="Atualizou lista de recursos OFS para relatórios",
         meta={
-            "raw_total_from_api": raw_total,
-            "active_total": active_total,
-            "inactive_total": inactive_total,
-            "allowed_type_total": allowed_type_total,
-            "inserted_total": len(all_rows),
-            "ignored_type": ignored_type,
+            "raw_total_from_api": stats["raw_total"],
+            "active_total": stats["active_total"],
+            "inactive_total": stats["inactive_total"],
+            "allowed_type_total": stats["allowed_type_total"],
+            "inserted_total": len(rows),
+            "changes": changes,
+            "ignored_type": stats["ignored_type"],
             "resource_types_allowed": list(RESOURCE_TYPES_OFS.keys()),
-            "limit": limit,
+            "limit": RESOURCE_PAGE_LIMIT,
             "last_offset": offset,
         },
     )
 
-    return len(all_rows), raw_total
+    return len(rows), stats["raw_total"]
 def _validate_dates(date_from: str, date_to: str):
     try:
         dt_from = datetime.strptime(date_from, "%Y-%m-%d").date()
@@ -1479,7 +1675,8 @@ def _validate_resources(resource_ids: list) -> List[str]:
             SELECT resource_id
             FROM relatorios_ofs_resources
             WHERE resource_id IN ({placeholders})
-        """, selected)
+              AND status <> %s
+        """, [*selected, RESOURCE_MISSING_STATUS])
 
         valid = {row[0] for row in cur.fetchall()}
 
@@ -1570,88 +1767,112 @@ def _first_filled(item: dict, keys: list):
     return ""
 
 
-def _row_value(
-    item: dict,
+def _memoized(translate):
+    """Traduz cada valor bruto distinto uma vez só (nomes, tipos e motivos se repetem muito)."""
+    cache = {}
+
+    def lookup(raw):
+        try:
+            return cache[raw]
+        except KeyError:
+            value = cache[raw] = translate(raw)
+            return value
+        except TypeError:
+            return translate(raw)
+
+    return lookup
+
+
+def _compile_report_column(
     field_key: str,
-    resource_name_map: Dict[str, str] = None,
-    resource_status_map: Dict[str, str] = None,
-    activity_type_label_map: Dict[str, str] = None,
-    close_reason_name_map: Dict[Tuple[str, str], str] = None,
-    task_type_name_map: Dict[str, str] = None,
+    resource_name_map: Dict[str, str],
+    resource_status_map: Dict[str, str],
+    activity_type_label_map: Dict[str, str],
+    close_reason_name_map: Dict[Tuple[str, str], str],
+    task_type_name_map: Dict[str, str],
     report_type: str = "ofs_os",
 ):
+    """Devolve item -> valor da célula para um campo do relatório."""
     if field_key == "customerName":
-        return _first_name(item.get("customerName"))
+        return lambda item: _first_name(item.get("customerName"))
+
     if field_key == "customerNameFull":
-        return str(item.get("customerName") or "").strip()
+        return lambda item: str(item.get("customerName") or "").strip()
+
     if field_key == "fechamento_atividade":
-        for closure_field in _closure_fields_for_report(report_type):
-            raw_value = item.get(closure_field)
+        closure_fields = tuple(_closure_fields_for_report(report_type))
 
-            if raw_value is None:
-                continue
+        def translate_closure(raw_values):
+            for closure_field, raw_value in zip(closure_fields, raw_values):
+                if raw_value is None:
+                    continue
 
-            label = str(raw_value).strip()
+                label = str(raw_value).strip()
 
-            if not label:
-                continue
+                if not label:
+                    continue
 
-            if close_reason_name_map:
-                translated = close_reason_name_map.get((closure_field, label))
-                if translated:
-                    return translated
+                return close_reason_name_map.get((closure_field, label)) or label
 
-            return label
+            return ""
 
-        return ""
+        closure = _memoized(translate_closure)
+        return lambda item: closure(tuple(item.get(field) for field in closure_fields))
 
     if field_key == "resourceName":
-        resource_id = str(item.get("resourceId") or "").strip()
-        if not resource_id:
-            return "Técnico não encontrado na base"
+        def translate_resource_name(raw):
+            resource_id = str(raw or "").strip()
+
+            if not resource_id:
+                return "Técnico não encontrado na base"
 
-        if resource_name_map and resource_id in resource_name_map:
-            return resource_name_map[resource_id] or "Técnico não encontrado na base"
+            return resource_name_map.get(resource_id) or "Técnico não encontrado na base"
 
-        return "Técnico não encontrado na base"
+        resource_name = _memoized(translate_resource_name)
+        return lambda item: resource_name(item.get("resourceId"))
 
     if field_key == "resourceStatus":
-        resource_id = str(item.get("resourceId") or "").strip()
+        def translate_resource_status(raw):
+            resource_id = str(raw or "").strip()
 
-        if not resource_id:
-            return "Não encontrado"
+            if not resource_id or resource_id not in resource_status_map:
+                return "Não encontrado"
 
-        if resource_status_map and resource_id in resource_status_map:
             return resource_status_map[resource_id]
 
-        return "Não encontrado"
+        resource_status = _memoized(translate_resource_status)
+        return lambda item: resource_status(item.get("resourceId"))
 
     if field_key == "activityType":
-        activity_code = str(item.get("activityType") or "").strip()
+        def translate_activity_type(raw):
+            activity_code = str(raw or "").strip()
 
-        if not activity_code:
-            return ""
+            if not activity_code:
+                return ""
 
-        if activity_type_label_map and activity_code in activity_type_label_map:
-            return activity_type_label_map[activity_code]
+            return activity_type_label_map.get(activity_code, activity_code)
+
+        activity_type = _memoized(translate_activity_type)
+        return lambda item: activity_type(item.get("activityType"))
 
-        return activity_code
     if field_key == TASK_TYPE_PROPERTY_CODE:
-        raw_value = str(item.get(TASK_TYPE_PROPERTY_CODE) or "").strip()
+        def translate_task_type(raw):
+            raw_value = str(raw or "").strip()
 
-        if not raw_value:
-            return ""
+            if not raw_value:
+                return ""
 
-        if task_type_name_map and raw_value in task_type_name_map:
-            return task_type_name_map[raw_value]
+            return task_type_name_map.get(raw_value, raw_value)
 
-        return raw_value
-    value = item.get(field_key)
+        task_type = _memoized(translate_task_type)
+        return lambda item: task_type(item.get(TASK_TYPE_PROPERTY_CODE))
 
-    if value is None:
-        return ""
+    def plain(item):
+        value = item.get(field_key)
+        return "" if value is None else value
+
+    return plain
 
-    return value
 
 def _build_or_equals_query(field_name: str, values: List[str]) -> str:
     cleaned = []
@@ -1673,10 +1894,140 @@ def _build_or_equals_query(field_name: str, values: List[str]) -> str:
     parts = [f"{field_name}=='{value}'" for value in cleaned]
     return "(" + " OR ".join(parts) + ")"
 
-def _fetch_activities(client: OFSClient, config: dict, base_dir: str, job_id: str, status_payload: dict) -> List[dict]:
-    url = f"{client.base_url}/activities/"
-    headers = {"Accept": "application/json"}
+def _report_query(config: dict) -> str:
+    status_query = _build_or_equals_query("status", config["statuses"])
+    activity_type_query = _build_or_equals_query("activityType", config["activity_types"])
+
+    # IMPORTANTE:
+    # O OFS deve receber apenas UM parâmetro q contendo a expressão completa.
+    return f"{status_query} and {activity_type_query}"
+
+
+def _report_shards(config: dict) -> List[dict]:
+    date_list = list(_iter_date_strings(config["date_from"], config["date_to"]))
 
+    return build_activity_shards(
+        date_list,
+        config["resources"],
+        split_resources=config.get("shard_by_resource", REPORT_SHARD_BY_RESOURCE),
+    )
+
+
+def estimate_report_job(config: dict) -> dict:
+    """
+    Estima linhas, páginas e tempo de uma extração sem baixá-la: usa a
+    contagem em cache de cada dia ou uma sonda limit=1 no OFS, dentro de
+    REPORT_ESTIMATE_TIMEOUT_SECONDS e no máximo REPORT_ESTIMATE_MAX_PROBES
+    sondas. Shards sem contagem (OFS sem total, teto de sondas ou prazo)
+    ficam em unknown_days e entram na soma pela média dos contados
+    (approximate=True).
+    """
+    shards = _report_shards(config)
+    stats = {"count_cache_hits": 0, "probes": 0, "skipped_probes": 0, "timed_out": False}
+
+    counts = count_activity_shards(
+        OFSClient(),
+        shards,
+        q=_report_query(config),
+        timeout=min(REQUEST_TIMEOUT, REPORT_ESTIMATE_TIMEOUT_SECONDS),
+        stats=stats,
+        deadline_seconds=REPORT_ESTIMATE_TIMEOUT_SECONDS,
+        max_probes=REPORT_ESTIMATE_MAX_PROBES,
+    )
+
+    daily_counts = {}
+    unknown_days = []
+    unknown_shards = 0
+    counted_rows = 0
+    expected_pages = 0
+
+    for shard in shards:
+        day = shard["day"]
+        count = counts.get(shard["index"])
+
+        if count is None:
+            if day not in unknown_days:
+                unknown_days.append(day)
+            unknown_shards += 1
+            continue
+
+        daily_counts[day] = daily_counts.get(day, 0) + count
+        counted_rows += count
+        expected_pages += max(1, math.ceil(count / API_LIMIT))
+
+    expected_rows = counted_rows
+    counted_shards = len(shards) - unknown_shards
+
+    if unknown_shards:
+        average_rows = counted_rows / counted_shards if counted_shards else 0
+        expected_rows += int(average_rows * unknown_shards)
+        expected_pages += unknown_shards * max(1, math.ceil(average_rows / API_LIMIT))
+
+    parallel = max(1, min(SHARD_WORKERS, len(shards)))
+    eta_seconds = int(math.ceil(expected_pages / parallel) * REPORT_SECONDS_PER_PAGE)
+
+    if REPORT_MAX_ESTIMATED_ROWS and expected_rows > REPORT_MAX_ESTIMATED_ROWS:
+        decision = "reject"
+    elif REPORT_LOW_PRIORITY_ROWS and expected_rows > REPORT_LOW_PRIORITY_ROWS:
+        decision = "low_priority"
+    else:
+        decision = "ok"
+
+    return {
+        "expected_rows": expected_rows,
+        "counted_rows": counted_rows,
+        "approximate": bool(unknown_shards),
+        "expected_pages": expected_pages,
+        "eta_seconds": eta_seconds,
+        "total_shards": len(shards),
+        "daily_counts": daily_counts,
+        "unknown_days": unknown_days,
+        "max_rows": REPORT_MAX_ESTIMATED_ROWS,
+        "low_priority_rows": REPORT_LOW_PRIORITY_ROWS,
+        "decision": decision,
+        **stats,
+    }
+
+
+def _estimate_before_start(config: dict):
+    """
+    Estimativa usada ao iniciar o job. Recusa (ValueError) acima do limite;
+    se a sonda falhar ou estourar o prazo, o job segue sem estimativa.
+    """
+    if not REPORT_ESTIMATE_ENABLED:
+        return None
+
+    try:
+        estimate = estimate_report_job(config)
+    except Exception as e:
+        print(f"[WARN] Falha ao estimar extração do OFS: {e}")
+        return None
+
+    if estimate["timed_out"]:
+        print(f"[WARN] Estimativa da extração do OFS passou de {REPORT_ESTIMATE_TIMEOUT_SECONDS}s; seguindo sem estimativa.")
+        return None
+
+    if estimate["decision"] == "reject":
+        raise ValueError(
+            f"A extração deve retornar cerca de {estimate['expected_rows']} linhas, "
+            f"acima do limite de {REPORT_MAX_ESTIMATED_ROWS}. Reduza o período ou os filtros."
+        )
+
+    return estimate
+
+
+def _fetch_activities(
+    client: OFSClient,
+    config: dict,
+    base_dir: str,
+    job_id: str,
+    status_payload: dict,
+    on_item,
+) -> int:
+    """
+    Consulta o OFS e entrega cada atividade (já sem duplicadas) para on_item,
+    na ordem em que as páginas chegam; nada é acumulado aqui. Retorna o total.
+    """
     api_fields = _api_fields_for_selected(
         config["fields"],
         report_type=config.get("report_type", "ofs_os"),
@@ -1687,229 +2038,196 @@ def _fetch_activities(client: OFSClient, config: dict, base_dir: str, job_id: st
         if required_field not in api_fields:
             api_fields.append(required_field)
 
-    resources_param = ",".join(config["resources"])
 
-    status_query = _build_or_equals_query("status", config["statuses"])
-    activity_type_query = _build_or_equals_query("activityType", config["activity_types"])
-
-    # IMPORTANTE:
-    # O OFS deve receber apenas UM parâmetro q contendo a expressão completa.
-    combined_query = f"{status_query} and {activity_type_query}"
+    combined_query = _report_query(config)
 
-    all_items = []
-    seen_activity_ids = set()
+    total_rows = 0
+    seen_activity_ids = ActivityIdSet()
 
     daily_counts = {}
     daily_raw_counts = {}
     duplicate_activity_ids = 0
     total_raw_rows = 0
     total_pages_processed = 0
+    cache_stats = {"cache_hits": 0, "cache_misses": 0}
 
     date_list = list(_iter_date_strings(config["date_from"], config["date_to"]))
     total_days = len(date_list)
+    day_indexes = {day: index for index, day in enumerate(date_list, start=1)}
 
-    for day_index, day in enumerate(date_list, start=1):
-        offset = 0
-        page = 1
-        day_count = 0
-        day_raw_count = 0
-
-        while True:
-            params = [
-                ("dateFrom", day),
-                ("dateTo", day),
-                ("resources", resources_param),
-                ("q", combined_query),
-                ("fields", ",".join(api_fields)),
-                ("limit", str(API_LIMIT)),
-                ("offset", str(offset)),
-            ]
-
-            status_payload.update({
-                "status": "running",
-                "phase": f"Consultando OFS - {day} - página {page}, offset {offset}",
-                "rows_so_far": len(all_items),
-                "raw_rows_so_far": total_raw_rows,
-                "q": combined_query,
-                "current_day": day,
-                "current_day_index": day_index,
-                "total_days": total_days,
-                "offset": offset,
-                "page": page,
-                "total_pages_processed": total_pages_processed,
-                "daily_counts": daily_counts,
-                "daily_raw_counts": daily_raw_counts,
-                "duplicate_activity_ids": duplicate_activity_ids,
-            })
-            _write_job_status(base_dir, job_id, status_payload)
+    shards = _report_shards(config)
+    total_shards = len(shards)
 
-            resp = requests.get(
-                url,
-                headers=headers,
-                params=params,
-                auth=client.auth,
-                timeout=REQUEST_TIMEOUT,
-            )
-            resp.raise_for_status()
+    status_payload.update({
+        "status": "running",
+        "phase": f"Consultando OFS - {total_days} dia(s) em {total_shards} consulta(s) paralela(s)",
+        "q": combined_query,
+        "total_days": total_days,
+        "total_shards": total_shards,
+        "shards_done": 0,
+        **cache_stats,
+    })
+    _write_job_status(base_dir, job_id, status_payload)
 
-            data = resp.json()
-            items = _normalize_items_payload(data)
+    with closing(iter_activity_shards(
+        client,
+        shards,
+        q=combined_query,
+        fields=api_fields,
+        limit=API_LIMIT,
+        timeout=REQUEST_TIMEOUT,
+        cache_stats=cache_stats,
+    )) as shard_pages:
+        for shard, page_data in shard_pages:
+            day = shard["day"]
+            items = page_data["items"]
+            page = page_data["page"]
+            offset = page_data["offset"]
 
             returned_count = len(items)
-            day_raw_count += returned_count
+            daily_raw_counts[day] = daily_raw_counts.get(day, 0) + returned_count
+            daily_counts.setdefault(day, 0)
             total_raw_rows += returned_count
             total_pages_processed += 1
 
             for item in items:
                 activity_id = str(item.get("activityId") or "").strip()
 
-                if activity_id:
-                    if activity_id in seen_activity_ids:
-                        duplicate_activity_ids += 1
-                        continue
-
-                    seen_activity_ids.add(activity_id)
-
-                all_items.append(item)
-                day_count += 1
+                if activity_id and not seen_activity_ids.add(activity_id):
+                    duplicate_activity_ids += 1
+                    continue
 
-            daily_counts[day] = day_count
-            daily_raw_counts[day] = day_raw_count
+                on_item(item)
+                total_rows += 1
+                daily_counts[day] += 1
 
             status_payload.update({
                 "status": "running",
                 "phase": f"Processando OFS - {day} - página {page}",
-                "rows_so_far": len(all_items),
+                "rows_so_far": total_rows,
                 "raw_rows_so_far": total_raw_rows,
                 "current_day": day,
-                "current_day_index": day_index,
+                "current_day_index": day_indexes[day],
                 "total_days": total_days,
+                "shards_done": shard["index"],
+                "total_shards": total_shards,
                 "offset": offset,
                 "page": page,
                 "total_pages_processed": total_pages_processed,
                 "daily_counts": daily_counts,
                 "daily_raw_counts": daily_raw_counts,
                 "duplicate_activity_ids": duplicate_activity_ids,
+                **cache_stats,
             })
             _write_job_status(base_dir, job_id, status_payload)
 
-            has_more = bool(data.get("hasMore")) if isinstance(data, dict) else False
-
-            if not has_more:
-                break
-
-            if returned_count <= 0:
+            if page_data["has_more"] and returned_count <= 0:
                 raise RuntimeError(
                     f"A API informou hasMore=true para o dia {day}, mas não retornou itens. "
                     "A consulta pode estar pesada demais ou excedendo o tempo limite do OFS."
                 )
 
-            offset += returned_count
-            page += 1
-
     status_payload.update({
         "status": "running",
-        "phase": "Consulta OFS concluída. Preparando XLSX.",
-        "rows_so_far": len(all_items),
-        "total_rows": len(all_items),
+        "phase": "Consulta OFS concluída. Finalizando XLSX.",
+        "shards_done": total_shards,
+        "rows_so_far": total_rows,
+        "total_rows": total_rows,
         "raw_rows_so_far": total_raw_rows,
         "total_raw_rows": total_raw_rows,
         "total_pages_processed": total_pages_processed,
         "daily_counts": daily_counts,
         "daily_raw_counts": daily_raw_counts,
         "duplicate_activity_ids": duplicate_activity_ids,
+        **cache_stats,
     })
     _write_job_status(base_dir, job_id, status_payload)
 
-    return all_items
+    return total_rows
 
-def _build_activity_report_summary(rows: List[dict]) -> dict:
+class _ActivityReportSummary:
     """
-    Monta resumo visual para relatórios operacionais.
+    Resumo visual para relatórios operacionais, acumulado atividade a
+    atividade enquanto a extração roda (as linhas não ficam em memória).
 
     Usado inicialmente no relatório de Redes.
     """
-    resource_name_map = _load_resource_name_map()
-    activity_type_label_map = _load_activity_type_label_map()
 
-    by_status = {}
-    by_resource = {}
-    by_activity_type = {}
+    def __init__(self):
+        self.resource_name_map = _load_resource_name_map()
+        self.activity_type_label_map = _load_activity_type_label_map()
+
+        self.total = 0
+        self.by_status = {}
+        self.by_resource = {}
+        self.by_activity_type = {}
 
-    for item in rows:
+    def add(self, item: dict):
         status = str(item.get("status") or "Não informado").strip() or "Não informado"
         resource_id = str(item.get("resourceId") or "").strip()
         activity_type_code = str(item.get("activityType") or "").strip()
 
-        by_status[status] = by_status.get(status, 0) + 1
+        self.total += 1
+        self.by_status[status] = self.by_status.get(status, 0) + 1
 
-        activity_type_label = activity_type_label_map.get(activity_type_code, activity_type_code or "Não informado")
-        by_activity_type[activity_type_label] = by_activity_type.get(activity_type_label, 0) + 1
+        activity_type_label = self.activity_type_label_map.get(activity_type_code, activity_type_code or "Não informado")
+        self.by_activity_type[activity_type_label] = self.by_activity_type.get(activity_type_label, 0) + 1
 
         resource_key = resource_id or "sem_resource"
-        resource_name = resource_name_map.get(resource_id, "Técnico não encontrado na base")
 
-        if resource_key not in by_resource:
-            by_resource[resource_key] = {
+        if resource_key not in self.by_resource:
+            self.by_resource[resource_key] = {
                 "resource_id": resource_id or "-",
-                "resource_name": resource_name,
+                "resource_name": self.resource_name_map.get(resource_id, "Técnico não encontrado na base"),
                 "total": 0,
                 "by_status": {},
             }
 
-        by_resource[resource_key]["total"] += 1
-        by_resource[resource_key]["by_status"][status] = (
-            by_resource[resource_key]["by_status"].get(status, 0) + 1
+        resource = self.by_resource[resource_key]
+        resource["total"] += 1
+        resource["by_status"][status] = resource["by_status"].get(status, 0) + 1
+
+    def result(self) -> dict:
+        by_resource_list = list(self.by_resource.values())
+        by_resource_list.sort(
+            key=lambda item: (
+                int(item.get("total") or 0),
+                str(item.get("resource_name") or "")
+            ),
+            reverse=True,
         )
 
-    by_resource_list = list(by_resource.values())
-    by_resource_list.sort(
-        key=lambda item: (
-            int(item.get("total") or 0),
-            str(item.get("resource_name") or "")
-        ),
-        reverse=True,
-    )
+        by_activity_type_list = [
+            {
+                "label": label,
+                "total": total,
+            }
+            for label, total in self.by_activity_type.items()
+        ]
+        by_activity_type_list.sort(key=lambda item: item["total"], reverse=True)
 
-    by_activity_type_list = [
-        {
-            "label": label,
-            "total": total,
+        by_status_list = [
+            {
+                "status": status,
+                "total": total,
+            }
+            for status, total in self.by_status.items()
+        ]
+        by_status_list.sort(key=lambda item: item["total"], reverse=True)
+
+        return {
+            "total": self.total,
+            "by_status": self.by_status,
+            "by_status_list": by_status_list,
+            "by_resource": by_resource_list,
+            "by_activity_type": by_activity_type_list,
         }
-        for label, total in by_activity_type.items()
-    ]
-    by_activity_type_list.sort(key=lambda item: item["total"], reverse=True)
-
-    by_status_list = [
-        {
-            "status": status,
-            "total": total,
-        }
-        for status, total in by_status.items()
-    ]
-    by_status_list.sort(key=lambda item: item["total"], reverse=True)
-
-    return {
-        "total": len(rows),
-        "by_status": by_status,
-        "by_status_list": by_status_list,
-        "by_resource": by_resource_list,
-        "by_activity_type": by_activity_type_list,
-    }
-
-def _build_xlsx(
-    rows: List[dict],
-    selected_fields: List[str],
-    output_path: str,
-    report_type: str = "ofs_os",
-):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Relatório OS OFS"
-
-    headers = [FIELD_MAP[key]["xlsx_header"] for key in selected_fields]
-    ws.append(headers)
 
+def _report_row_builder(selected_fields: List[str], report_type: str = "ofs_os"):
+    """
+    Carrega os mapas de tradução uma vez e compila cada campo selecionado
+    num extrator próprio; devolve item -> valores da linha.
+    """
     resource_name_map = _load_resource_name_map()
     resource_status_map = (
         _load_resource_status_map()
@@ -1931,43 +2249,34 @@ def _build_xlsx(
         if TASK_TYPE_PROPERTY_CODE in selected_fields
         else {}
     )
-    for item in rows:
-        ws.append([
-            _row_value(
-                item,
-                key,
-                resource_name_map=resource_name_map,
-                resource_status_map=resource_status_map,
-                activity_type_label_map=activity_type_label_map,
-                close_reason_name_map=close_reason_name_map,
-                task_type_name_map=task_type_name_map,
-                report_type=report_type,
-            )
-            for key in selected_fields
-        ])
 
-    header_fill = PatternFill("solid", fgColor="1F4E78")
-    header_font = Font(color="FFFFFF", bold=True)
-    thin = Side(style="thin", color="D9E2F3")
-    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    columns = tuple(
+        _compile_report_column(
+            key,
+            resource_name_map=resource_name_map,
+            resource_status_map=resource_status_map,
+            activity_type_label_map=activity_type_label_map,
+            close_reason_name_map=close_reason_name_map,
+            task_type_name_map=task_type_name_map,
+            report_type=report_type,
+        )
+        for key in selected_fields
+    )
+
+    def build_row(item: dict) -> list:
+        return [column(item) for column in columns]
 
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        cell.border = border
+    return build_row
 
-    for row in ws.iter_rows(min_row=2):
-        for cell in row:
-            cell.border = border
-            cell.alignment = Alignment(vertical="top")
 
-    ws.freeze_panes = "A2"
-    xlsx_auto_width(ws)
+def _report_xlsx_headers(selected_fields: List[str]) -> List[str]:
+    return [FIELD_MAP[key]["xlsx_header"] for key in selected_fields]
+
 
-    wb.save(output_path)
 def _run_report_job(base_dir: str, job_id: str, actor: dict, config: dict):
     filename = f"relatorio_os_ofs_{config['date_from']}_{config['date_to']}_{job_id[:8]}.xlsx"
+    # A estimativa foi gravada no status da fila, ao iniciar o job.
+    estimate = read_job_status(base_dir, job_id).get("estimate")
 
     status_payload = {
         "status": "running",
@@ -1984,6 +2293,7 @@ def _run_report_job(base_dir: str, job_id: str, actor: dict, config: dict):
         "activity_types": config["activity_types"],
         "fields": config["fields"],
         "error": None,
+        "estimate": estimate,
     }
 
     _write_job_status(base_dir, job_id, status_payload)
@@ -2009,30 +2319,29 @@ def _run_report_job(base_dir: str, job_id: str, actor: dict, config: dict):
 
         client = OFSClient()
         config["report_type"] = "ofs_os"
-        rows = _fetch_activities(client, config, base_dir, job_id, status_payload)
-
-        status_payload.update({
-            "status": "running",
-            "phase": "Gerando XLSX",
-            "rows_so_far": len(rows),
-            "total_rows": len(rows),
-            "total_raw_rows": status_payload.get("total_raw_rows"),
-            "duplicate_activity_ids": status_payload.get("duplicate_activity_ids"),
-            "total_pages_processed": status_payload.get("total_pages_processed"),
-            "daily_counts": status_payload.get("daily_counts"),
-            "daily_raw_counts": status_payload.get("daily_raw_counts"),
-        })
-        _write_job_status(base_dir, job_id, status_payload)
-
-        output_path = _job_xlsx_path(base_dir, job_id)
-        _build_xlsx(rows, config["fields"], output_path, report_type="ofs_os")
+        build_row = _report_row_builder(config["fields"], report_type="ofs_os")
+
+        # As linhas vão para o XLSX conforme as páginas chegam.
+        with StreamingXlsxWriter(
+            _job_xlsx_path(base_dir, job_id),
+            "Relatório OS OFS",
+            _report_xlsx_headers(config["fields"]),
+        ) as xlsx:
+            total_rows = _fetch_activities(
+                client,
+                config,
+                base_dir,
+                job_id,
+                status_payload,
+                on_item=lambda item: xlsx.write_row(build_row(item)),
+            )
 
         status_payload.update({
             "status": "completed",
             "phase": "Extração concluída",
             "finished_at": _now_iso(),
-            "rows_so_far": len(rows),
-            "total_rows": len(rows),
+            "rows_so_far": total_rows,
+            "total_rows": total_rows,
             "download_ready": True,
         })
         _write_job_status(base_dir, job_id, status_payload)
@@ -2052,7 +2361,7 @@ def _run_report_job(base_dir: str, job_id: str, actor: dict, config: dict):
                 "resources": config["resources"],
                 "activity_types": config["activity_types"],
                 "fields": config["fields"],
-                "total_rows": len(rows),
+                "total_rows": total_rows,
                 "total_raw_rows": status_payload.get("total_raw_rows"),
                 "duplicate_activity_ids": status_payload.get("duplicate_activity_ids"),
                 "total_pages_processed": status_payload.get("total_pages_processed"),
@@ -2092,6 +2401,7 @@ def _run_report_job(base_dir: str, job_id: str, actor: dict, config: dict):
 
 def _run_redes_report_job(base_dir: str, job_id: str, actor: dict, config: dict):
     filename = f"relatorio_redes_{config['date_from']}_{config['date_to']}_{job_id[:8]}.xlsx"
+    estimate = read_job_status(base_dir, job_id).get("estimate")
 
     status_payload = {
         "status": "running",
@@ -2109,6 +2419,7 @@ def _run_redes_report_job(base_dir: str, job_id: str, actor: dict, config: dict)
         "fields": config["fields"],
         "summary": None,
         "error": None,
+        "estimate": estimate,
     }
 
     _write_job_status(base_dir, job_id, status_payload)
@@ -2134,39 +2445,29 @@ def _run_redes_report_job(base_dir: str, job_id: str, actor: dict, config: dict)
 
         client = OFSClient()
         config["report_type"] = "redes"
-        rows = _fetch_activities(client, config, base_dir, job_id, status_payload)
-
-        status_payload.update({
-            "status": "running",
-            "phase": "Gerando resumo de Redes",
-            "rows_so_far": len(rows),
-            "total_rows": len(rows),
-            "total_raw_rows": status_payload.get("total_raw_rows"),
-            "duplicate_activity_ids": status_payload.get("duplicate_activity_ids"),
-            "total_pages_processed": status_payload.get("total_pages_processed"),
-            "daily_counts": status_payload.get("daily_counts"),
-            "daily_raw_counts": status_payload.get("daily_raw_counts"),
-        })
-        _write_job_status(base_dir, job_id, status_payload)
+        build_row = _report_row_builder(config["fields"], report_type="redes")
+        summary = _ActivityReportSummary()
 
-        summary_payload = _build_activity_report_summary(rows)
+        def on_item(item):
+            summary.add(item)
+            xlsx.write_row(build_row(item))
 
-        status_payload.update({
-            "status": "running",
-            "phase": "Gerando XLSX",
-            "summary": summary_payload,
-        })
-        _write_job_status(base_dir, job_id, status_payload)
+        # Resumo e XLSX são montados conforme as páginas chegam.
+        with StreamingXlsxWriter(
+            _job_xlsx_path(base_dir, job_id),
+            "Relatório OS OFS",
+            _report_xlsx_headers(config["fields"]),
+        ) as xlsx:
+            total_rows = _fetch_activities(client, config, base_dir, job_id, status_payload, on_item=on_item)
 
-        output_path = _job_xlsx_path(base_dir, job_id)
-        _build_xlsx(rows, config["fields"], output_path, report_type="redes")
+        summary_payload = summary.result()
 
         status_payload.update({
             "status": "completed",
             "phase": "Extração de Redes concluída",
             "finished_at": _now_iso(),
-            "rows_so_far": len(rows),
-            "total_rows": len(rows),
+            "rows_so_far": total_rows,
+            "total_rows": total_rows,
             "summary": summary_payload,
             "download_ready": True,
         })
@@ -2187,7 +2488,7 @@ def _run_redes_report_job(base_dir: str, job_id: str, actor: dict, config: dict)
                 "resources": config["resources"],
                 "activity_types": config["activity_types"],
                 "fields": config["fields"],
-                "total_rows": len(rows),
+                "total_rows": total_rows,
                 "total_raw_rows": status_payload.get("total_raw_rows"),
                 "duplicate_activity_ids": status_payload.get("duplicate_activity_ids"),
                 "total_pages_processed": status_payload.get("total_pages_processed"),
@@ -2229,6 +2530,8 @@ def _run_redes_report_job(base_dir: str, job_id: str, actor: dict, config: dict)
 
 def start_redes_report_job(base_dir: str, actor: dict, config: dict) -> str:
     _ensure_dir(base_dir)
+    job_queue.ensure_capacity("relatorio_redes", _report_user_key(actor))
+    estimate = _estimate_before_start(config)
 
     job_id = uuid.uuid4().hex
 
@@ -2242,20 +2545,24 @@ def start_redes_report_job(base_dir: str, actor: dict, config: dict) -> str:
         "filename": None,
         "summary": None,
         "error": None,
+        "estimate": estimate,
     }
     _write_job_status(base_dir, job_id, initial_payload)
 
-    thread = threading.Thread(
-        target=_run_redes_report_job,
-        args=(base_dir, job_id, actor, config),
-        daemon=True,
+    job_queue.submit(
+        "relatorio_redes",
+        job_id,
+        (base_dir, job_id, actor, config),
+        user_key=_report_user_key(actor),
+        priority=_report_priority(config, estimate),
     )
-    thread.start()
 
     return job_id
 
 def start_report_job(base_dir: str, actor: dict, config: dict) -> str:
     _ensure_dir(base_dir)
+    job_queue.ensure_capacity("relatorio_ofs_os", _report_user_key(actor))
+    estimate = _estimate_before_start(config)
 
     job_id = uuid.uuid4().hex
 
@@ -2268,15 +2575,17 @@ def start_report_job(base_dir: str, actor: dict, config: dict) -> str:
         "total_rows": 0,
         "filename": None,
         "error": None,
+        "estimate": estimate,
     }
     _write_job_status(base_dir, job_id, initial_payload)
 
-    thread = threading.Thread(
-        target=_run_report_job,
-        args=(base_dir, job_id, actor, config),
-        daemon=True,
+    job_queue.submit(
+        "relatorio_ofs_os",
+        job_id,
+        (base_dir, job_id, actor, config),
+        user_key=_report_user_key(actor),
+        priority=_report_priority(config, estimate),
     )
-    thread.start()
 
     return job_id
 
@@ -2369,182 +2678,76 @@ def _resource_percent(raw_total: int, total_expected):
 def _sync_resources_from_ofs_with_progress(base_dir: str, job_id: str, actor: dict, status_payload: dict):
     client = OFSClient()
 
-    url = f"{client.base_url}/resources"
-    headers = {"Accept": "application/json"}
-
-    limit = 100
+    rows = {}
+    hierarchy_items = []
+    stats = _new_resource_sync_stats()
     offset = 0
-    page = 1
-    max_pages = 500
-
-    all_rows = []
-
-    raw_total = 0
-    active_total = 0
-    inactive_total = 0
-    allowed_type_total = 0
-    ignored_type = {}
     total_expected = None
 
-    while True:
-        params = {
-            "fields": "resourceId,status,resourceType,name",
-            "limit": limit,
-            "offset": offset,
-        }
-
+    def on_request(page, page_offset, total):
         status_payload.update({
             "status": "running",
             "phase": f"Consultando recursos no OFS - página {page}",
-            "percent": _resource_percent(raw_total, total_expected),
-            "raw_total_from_api": raw_total,
-            "inserted_so_far": len(all_rows),
+            "percent": _resource_percent(stats["raw_total"], total),
+            "raw_total_from_api": stats["raw_total"],
+            "inserted_so_far": len(rows),
             "page": page,
-            "offset": offset,
-            "total_expected": total_expected,
+            "offset": page_offset,
+            "total_expected": total,
         })
         _write_job_status(base_dir, job_id, status_payload)
 
-        resp = requests.get(
-            url,
-            headers=headers,
-            params=params,
-            auth=client.auth,
-            timeout=REQUEST_TIMEOUT,
-        )
-        resp.raise_for_status()
-
-        data = resp.json()
-
-        if total_expected is None:
-            total_expected = _extract_total_from_resource_payload(data)
-
-        items = _normalize_items_payload(data)
-
-        if not items:
-            break
-
-        raw_total += len(items)
-
-        for item in items:
-            resource_id = str(item.get("resourceId") or "").strip()
-            status = str(item.get("status") or "").strip().lower()
-            resource_type = str(item.get("resourceType") or "").strip()
-            name = str(item.get("name") or "").strip()
-
-            if not resource_id:
-                continue
-
-            if not status:
-                status = "unknown"
-
-            if status == "active":
-                active_total += 1
-            else:
-                inactive_total += 1
-
-            if resource_type not in RESOURCE_TYPES_OFS:
-                ignored_type[resource_type or "-"] = ignored_type.get(resource_type or "-", 0) + 1
-                continue
-
-            allowed_type_total += 1
-
-            all_rows.append({
-                "resource_id": resource_id,
-                "resource_type": resource_type,
-                "resource_type_label": RESOURCE_TYPES_OFS[resource_type],
-                "name": name or None,
-                "status": status,
-            })
+    for page, offset, items, total_expected in _iter_resource_pages(client, on_request=on_request):
+        hierarchy_items.extend(items)
+        _collect_resource_rows(items, rows, stats)
 
         status_payload.update({
             "status": "running",
             "phase": f"Processando recursos - página {page}",
-            "percent": _resource_percent(raw_total, total_expected),
-            "raw_total_from_api": raw_total,
-            "inserted_so_far": len(all_rows),
+            "percent": _resource_percent(stats["raw_total"], total_expected),
+            "raw_total_from_api": stats["raw_total"],
+            "inserted_so_far": len(rows),
             "page": page,
             "offset": offset,
             "total_expected": total_expected,
-            "active_total": active_total,
-            "inactive_total": inactive_total,
+            "active_total": stats["active_total"],
+            "inactive_total": stats["inactive_total"],
         })
         _write_job_status(base_dir, job_id, status_payload)
 
-        if len(items) < limit:
-            break
-
-        offset += limit
-        page += 1
-
-        if page > max_pages:
-            raise RuntimeError("Limite máximo de páginas atingido ao consultar recursos OFS.")
-
     status_payload.update({
         "status": "running",
         "phase": "Atualizando tabela de recursos no banco",
         "percent": 96,
-        "raw_total_from_api": raw_total,
-        "inserted_so_far": len(all_rows),
-        "active_total": active_total,
-        "inactive_total": inactive_total,
+        "raw_total_from_api": stats["raw_total"],
+        "inserted_so_far": len(rows),
+        "active_total": stats["active_total"],
+        "inactive_total": stats["inactive_total"],
     })
     _write_job_status(base_dir, job_id, status_payload)
 
-    conn = get_connection()
-    cur = conn.cursor()
-
-    try:
-        cur.execute("DELETE FROM relatorios_ofs_resources")
+    changes = _apply_resource_rows(rows)
 
-        sql = """
-            INSERT INTO relatorios_ofs_resources
-            (
-                resource_id,
-                resource_type,
-                resource_type_label,
-                name,
-                status
-            )
-            VALUES (%s, %s, %s, %s, %s)
-        """
-
-        values = [
-            (
-                row["resource_id"],
-                row["resource_type"],
-                row["resource_type_label"],
-                row["name"],
-                row["status"],
-            )
-            for row in all_rows
-        ]
+    _store_resource_hierarchy_from_sync(hierarchy_items)
 
-        if values:
-            cur.executemany(sql, values)
-
-        conn.commit()
-
-    except Exception:
-        conn.rollback()
-        raise
-
-    finally:
-        cur.close()
-        conn.close()
+    if changes["inserted"] or changes["updated"] or changes["deactivated"]:
+        lookup_cache.invalidate("ofs_resources")
 
     return {
-        "raw_total_from_api": raw_total,
-        "active_total": active_total,
-        "inactive_total": inactive_total,
-        "allowed_type_total": allowed_type_total,
-        "inserted_total": len(all_rows),
-        "ignored_type": ignored_type,
+        "raw_total_from_api": stats["raw_total"],
+        "active_total": stats["active_total"],
+        "inactive_total": stats["inactive_total"],
+        "allowed_type_total": stats["allowed_type_total"],
+        "inserted_total": len(rows),
+        "changes": changes,
+        "ignored_type": stats["ignored_type"],
         "resource_types_allowed": list(RESOURCE_TYPES_OFS.keys()),
-        "limit": limit,
+        "limit": RESOURCE_PAGE_LIMIT,
         "last_offset": offset,
         "total_expected": total_expected,
     }
+
+
 def _run_resource_sync_job(base_dir: str, job_id: str, actor: dict):
     status_payload = {
         "status": "running",
@@ -2627,6 +2830,7 @@ def _run_resource_sync_job(base_dir: str, job_id: str, actor: dict):
 
 def start_resource_sync_job(base_dir: str, actor: dict):
     _ensure_dir(base_dir)
+    job_queue.ensure_capacity("relatorio_recursos_sync", _report_user_key(actor))
 
     job_id = uuid.uuid4().hex
 
@@ -2648,15 +2852,27 @@ def start_resource_sync_job(base_dir: str, actor: dict):
     }
     _write_job_status(base_dir, job_id, initial_payload)
 
-    thread = threading.Thread(
-        target=_run_resource_sync_job,
-        args=(base_dir, job_id, actor),
-        daemon=True,
+    job_queue.submit(
+        "relatorio_recursos_sync",
+        job_id,
+        (base_dir, job_id, actor),
+        user_key=_report_user_key(actor),
     )
-    thread.start()
 
     return job_id, None
 
 
 def read_resource_sync_job_status(base_dir: str, job_id: str) -> dict:
-    return read_job_status(base_dir, job_id)
\ No newline at end of file
+    return read_job_status(base_dir, job_id)
+
+
+job_queue.register_job("relatorio_ofs_os", "ofs_report", _run_report_job, _mark_report_queued, _mark_report_interrupted)
+job_queue.register_job("relatorio_redes", "ofs_report", _run_redes_report_job, _mark_report_queued, _mark_report_interrupted)
+job_queue.register_job("relatorio_termometro", "ofs_report", _run_thermometer_report_job, _mark_report_queued, _mark_report_interrupted)
+job_queue.register_job("relatorio_recursos_sync", "ofs_sync", _run_resource_sync_job, _mark_report_queued, _mark_report_interrupted)
+
+lookup_cache.register("ofs_resources.names", _query_resource_name_map)
+lookup_cache.register("ofs_resources.status", _query_resource_status_map)
+lookup_cache.register("activity_types.labels", _query_activity_type_label_map)
+lookup_cache.register("task_types.names", _query_task_type_name_map)
+lookup_cache.register("close_reasons.names", _query_close_reason_name_map)
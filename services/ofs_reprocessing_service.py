@@ -1,9 +1,10 @@
 import os
-import time
 import requests
 from datetime import date
 from requests.auth import HTTPBasicAuth
 
+from core import job_queue
+from core.rate_limit import call_with_rate_limit
 from database.connection import get_connection
 
 
@@ -17,7 +18,6 @@ ASSERTION = os.getenv("OIC_ASSERTION", "").strip()
 
 GRANT_TYPE = "urn:ietf:params:oauth:grant-type:jwt-bearer"
 TIMEOUT = 30
-DELAY_SECONDS = 1.5
 
 EXCLUDED_ACTIVITY_TYPES = (
     "LUNCH",
@@ -103,7 +103,10 @@ def send_event(token, activity_id, event_type):
         "Accept": "application/json",
     }
 
-    return requests.post(
+    # Ritmo controlado pelo limitador compartilhado do OIC (core/rate_limit.py).
+    return call_with_rate_limit(
+        "oic",
+        requests.post,
         API_URL,
         json=body,
         headers=headers,
@@ -341,9 +344,6 @@ def run_reprocess_job(job_id, targets):
             )
             conn.commit()
 
-            if index < total:
-                time.sleep(DELAY_SECONDS)
-
         update_job_progress(
             cur,
             job_id,
@@ -365,4 +365,37 @@ def run_reprocess_job(job_id, targets):
 
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+def _mark_reprocess_job_queued(position: int, job_id, *args):
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        update_job_progress(cur, job_id, 0, f"Na fila - posição {position}")
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _mark_reprocess_job_interrupted(job_id, *args):
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        update_job_progress(cur, job_id, 100, "Interrompido por reinício do servidor.", status="error")
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+job_queue.register_job(
+    "reprocessamento",
+    "ofs_import",
+    run_reprocess_job,
+    _mark_reprocess_job_queued,
+    _mark_reprocess_job_interrupted,
+)
@@ -0,0 +1,355 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from database.bulk import bulk_upsert
+from database.connection import get_connection
+from ofs.client import OFSClient
+from ofs.resource_hierarchy import (
+    EMPTY,
+    RESOURCE_HIERARCHY_FIELDS,
+    ResourceHierarchy,
+    normalize_resource_item,
+)
+
+
+# Por quanto tempo a hierarquia salva no banco vale sem novo crawl no OFS.
+HIERARCHY_TTL_MINUTES = int(os.getenv("OFS_RESOURCE_HIERARCHY_TTL_MINUTES", "360"))
+
+# Quantos recursos desconhecidos podem ser buscados um a um antes de
+# desistir e deixar o restante para o próximo crawl completo.
+MAX_INCREMENTAL_FETCH = int(os.getenv("OFS_RESOURCE_HIERARCHY_MAX_FETCH", "200"))
+
+CACHE_KEY = "ofs_resources"
+
+HIERARCHY_COLUMNS = (
+    "resource_id",
+    "name",
+    "parent_resource_id",
+    "xr_parent_resource",
+    "resource_type",
+    "status",
+)
+
+_memory = {
+    "hierarchy": None,
+    "refreshed_at": None,
+}
+_memory_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_tables_ready = False
+
+
+def _ensure_hierarchy_tables():
+    global _tables_ready
+
+    if _tables_ready:
+        return
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ofs_resource_hierarchy_cache (
+                resource_id VARCHAR(64) NOT NULL PRIMARY KEY,
+                name VARCHAR(255) NULL,
+                parent_resource_id VARCHAR(64) NULL,
+                xr_parent_resource VARCHAR(64) NULL,
+                resource_type VARCHAR(20) NULL,
+                status VARCHAR(20) NULL,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ofs_resource_hierarchy_meta (
+                cache_key VARCHAR(40) NOT NULL PRIMARY KEY,
+                refreshed_at DATETIME NOT NULL,
+                total_resources INT NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.commit()
+        _tables_ready = True
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _is_fresh(refreshed_at) -> bool:
+    if not refreshed_at:
+        return False
+
+    return refreshed_at > datetime.now() - timedelta(minutes=HIERARCHY_TTL_MINUTES)
+
+
+def _row_to_resource(row) -> dict:
+    return {
+        "resourceId": row[0],
+        "name": row[1] or EMPTY,
+        "parentResourceId": row[2] or EMPTY,
+        "XR_PARENT_RESOURCE": row[3] or EMPTY,
+        "resourceType": row[4] or EMPTY,
+        "status": row[5] or EMPTY,
+    }
+
+
+def _resource_values(resource: dict) -> tuple:
+    def db_value(key):
+        value = resource.get(key)
+        return None if value in (None, "", EMPTY) else value
+
+    return (
+        resource["resourceId"],
+        db_value("name"),
+        db_value("parentResourceId"),
+        db_value("XR_PARENT_RESOURCE"),
+        db_value("resourceType"),
+        db_value("status"),
+    )
+
+
+def _load_from_database() -> Tuple[Optional[ResourceHierarchy], Optional[datetime]]:
+    _ensure_hierarchy_tables()
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(
+            "SELECT refreshed_at FROM ofs_resource_hierarchy_meta WHERE cache_key = %s",
+            (CACHE_KEY,),
+        )
+        meta = cur.fetchone()
+
+        if not meta or not _is_fresh(meta[0]):
+            return None, None
+
+        cur.execute(
+            """
+            SELECT
+                resource_id,
+                name,
+                parent_resource_id,
+                xr_parent_resource,
+                resource_type,
+                status
+            FROM ofs_resource_hierarchy_cache
+            """
+        )
+        resources = {row[0]: _row_to_resource(row) for row in cur.fetchall()}
+
+        return ResourceHierarchy(resources), meta[0]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def store_resource_hierarchy(items: Iterable[dict], full_refresh: bool = True) -> dict:
+    """
+    Grava recursos do OFS na tabela de hierarquia, só tocando o que mudou.
+
+    full_refresh=True: a lista é o retrato completo do OFS; recursos que não
+    vieram são removidos e o TTL é renovado.
+    full_refresh=False: apenas complementa o cache (busca incremental).
+    """
+    _ensure_hierarchy_tables()
+
+    incoming = {}
+    for item in items:
+        resource = normalize_resource_item(item)
+        if resource:
+            incoming[resource["resourceId"]] = _resource_values(resource)
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(
+            """
+            SELECT
+                resource_id,
+                name,
+                parent_resource_id,
+                xr_parent_resource,
+                resource_type,
+                status
+            FROM ofs_resource_hierarchy_cache
+            """
+        )
+        existing = {row[0]: tuple(row) for row in cur.fetchall()}
+
+        changed = [values for resource_id, values in incoming.items() if existing.get(resource_id) != values]
+        removed = [resource_id for resource_id in existing if resource_id not in incoming] if full_refresh else []
+
+        if changed:
+            bulk_upsert(
+                cur,
+                "ofs_resource_hierarchy_cache",
+                HIERARCHY_COLUMNS,
+                changed,
+                key_columns=("resource_id",),
+                extra_values={"updated_at": "CURRENT_TIMESTAMP"},
+            )
+
+        if removed:
+            cur.executemany(
+                "DELETE FROM ofs_resource_hierarchy_cache WHERE resource_id = %s",
+                [(resource_id,) for resource_id in removed],
+            )
+
+        refreshed_at = None
+
+        if full_refresh:
+            refreshed_at = datetime.now().replace(microsecond=0)
+            cur.execute(
+                """
+                INSERT INTO ofs_resource_hierarchy_meta (cache_key, refreshed_at, total_resources)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    refreshed_at = VALUES(refreshed_at),
+                    total_resources = VALUES(total_resources)
+                """,
+                (CACHE_KEY, refreshed_at, len(incoming)),
+            )
+
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        cur.close()
+        conn.close()
+
+    with _memory_lock:
+        if full_refresh:
+            resources = {values[0]: _row_to_resource(values) for values in incoming.values()}
+            _memory["hierarchy"] = ResourceHierarchy(resources)
+            _memory["refreshed_at"] = refreshed_at
+        elif _memory["hierarchy"] is not None:
+            # Recria o objeto para não herdar cadeias de ancestrais já calculadas.
+            resources = dict(_memory["hierarchy"].resources)
+            for values in incoming.values():
+                resources[values[0]] = _row_to_resource(values)
+            _memory["hierarchy"] = ResourceHierarchy(resources)
+
+    return {
+        "received": len(incoming),
+        "changed": len(changed),
+        "removed": len(removed),
+        "unchanged": len(incoming) - len(changed),
+    }
+
+
+def invalidate_resource_hierarchy():
+    """Descarta a cópia em memória; a próxima leitura volta ao banco."""
+    with _memory_lock:
+        _memory["hierarchy"] = None
+        _memory["refreshed_at"] = None
+
+
+def get_resource_hierarchy(
+    client: OFSClient = None,
+    progress_callback=None,
+    force_refresh: bool = False,
+) -> Tuple[ResourceHierarchy, dict]:
+    """
+    Retorna a hierarquia de recursos e de onde ela veio.
+
+    Ordem: memória do processo -> tabela no banco (dentro do TTL) -> crawl
+    completo no OFS. Só um crawl roda por vez; quem chegar durante um crawl
+    espera e reaproveita o resultado.
+    """
+    if not force_refresh:
+        with _memory_lock:
+            hierarchy = _memory["hierarchy"]
+            refreshed_at = _memory["refreshed_at"]
+
+        if hierarchy is not None and _is_fresh(refreshed_at):
+            return hierarchy, {"source": "memory", "refreshed_at": refreshed_at}
+
+    with _refresh_lock:
+        if not force_refresh:
+            hierarchy, refreshed_at = _load_from_database()
+
+            if hierarchy is not None:
+                with _memory_lock:
+                    _memory["hierarchy"] = hierarchy
+                    _memory["refreshed_at"] = refreshed_at
+
+                return hierarchy, {"source": "database", "refreshed_at": refreshed_at}
+
+        client = client or OFSClient()
+        items = list(client.iter_resources(progress_callback=progress_callback))
+        stats = store_resource_hierarchy(items, full_refresh=True)
+
+        with _memory_lock:
+            hierarchy = _memory["hierarchy"]
+            refreshed_at = _memory["refreshed_at"]
+
+        return hierarchy, {"source": "ofs", "refreshed_at": refreshed_at, **stats}
+
+
+def ensure_resources(
+    hierarchy: ResourceHierarchy,
+    resource_ids: Iterable[str],
+    client: OFSClient = None,
+    max_fetch: int = MAX_INCREMENTAL_FETCH,
+) -> Tuple[ResourceHierarchy, int]:
+    """
+    Busca individualmente recursos (e seus ancestrais) que ainda não estão no cache.
+
+    Evita um crawl completo só porque apareceu um recurso criado depois do
+    último refresh. Retorna a hierarquia atualizada e quantos foram buscados.
+    """
+    pending: List[str] = []
+    for resource_id in resource_ids:
+        resource_id = str(resource_id or "").strip()
+        if resource_id and resource_id != EMPTY and resource_id not in hierarchy and resource_id not in pending:
+            pending.append(resource_id)
+
+    if not pending:
+        return hierarchy, 0
+
+    client = client or OFSClient()
+    fetched = {}
+    fields = ",".join(RESOURCE_HIERARCHY_FIELDS)
+
+    while pending and len(fetched) < max_fetch:
+        resource_id = pending.pop(0)
+
+        if resource_id in fetched or resource_id in hierarchy:
+            continue
+
+        try:
+            item = client.authenticated_get(f"{client.base_url}/resources/{resource_id}?fields={fields}")
+        except Exception:
+            fetched[resource_id] = None
+            continue
+
+        fetched[resource_id] = item
+        resource = normalize_resource_item(item) or {}
+
+        for parent_id in (resource.get("XR_PARENT_RESOURCE"), resource.get("parentResourceId")):
+            if parent_id and parent_id != EMPTY and parent_id not in hierarchy and parent_id not in fetched:
+                pending.append(parent_id)
+
+    found = [item for item in fetched.values() if item]
+
+    if found:
+        store_resource_hierarchy(found, full_refresh=False)
+
+        resources = dict(hierarchy.resources)
+        for item in found:
+            resource = normalize_resource_item(item)
+            if resource:
+                resources[resource["resourceId"]] = resource
+        hierarchy = ResourceHierarchy(resources)
+
+    return hierarchy, len(found)
@@ -1,53 +1,253 @@
+import atexit
+import os
+import threading
+import time
 from datetime import datetime, timedelta
 
+from database.bulk import bulk_upsert
 from database.connection import get_connection
 
 
 ONLINE_WINDOW_MINUTES = 5
 
+# Presença fica em memória e vai para o banco em lote a cada N segundos.
+PRESENCE_FLUSH_SECONDS = int(os.getenv("PRESENCE_FLUSH_SECONDS", "15"))
 
-def registrar_atividade_usuario(usuario_id):
-    """Atualiza a tabela usuarios_online com o último acesso do usuário logado."""
-    if not usuario_id:
-        return
+# Contagem de online é calculada por um worker de cada vez e guardada em
+# usuarios_online_resumo; os demais só leem o valor pronto. A tabela e a linha
+# do resumo são criadas no deploy (tools/apply_schema.py).
+ONLINE_COUNT_TTL_SECONDS = int(os.getenv("ONLINE_COUNT_TTL_SECONDS", "30"))
 
-    conn = get_connection()
-    cur = conn.cursor()
+RESUMO_KEY = "online"
 
-    try:
-        agora = datetime.now()
+_pending_seen = {}
+_pending_lock = threading.Lock()
+# Serializa a gravação do lote com o logout: sem isso, um lote já retirado da
+# memória pode gravar o usuário de novo depois do DELETE do logout.
+_sync_lock = threading.Lock()
 
-        cur.execute(
-            """
-            INSERT INTO usuarios_online (usuario_id, last_seen)
-            VALUES (%s, %s)
-            ON DUPLICATE KEY UPDATE last_seen = VALUES(last_seen)
-            """,
-            (usuario_id, agora),
+_count_cache = {
+    "value": None,
+    "loaded_at": 0.0,
+}
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def ensure_resumo_table(cur):
+    """Cria usuarios_online_resumo e a linha do resumo. Só para tools de deploy."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usuarios_online_resumo (
+            resumo_key VARCHAR(40) NOT NULL PRIMARY KEY,
+            online_count INT NOT NULL DEFAULT 0,
+            computed_at DATETIME NOT NULL
         )
-        conn.commit()
-    finally:
-        cur.close()
-        conn.close()
+        """
+    )
+    cur.execute(
+        """
+        INSERT IGNORE INTO usuarios_online_resumo (resumo_key, online_count, computed_at)
+        VALUES (%s, 0, '2000-01-01 00:00:00')
+        """,
+        (RESUMO_KEY,),
+    )
 
 
-def obter_usuarios_online_count():
+def _flush_pending(cur) -> int:
+    with _pending_lock:
+        if not _pending_seen:
+            return 0
+        rows = list(_pending_seen.items())
+        _pending_seen.clear()
+
+    try:
+        bulk_upsert(
+            cur,
+            "usuarios_online",
+            ("usuario_id", "last_seen"),
+            rows,
+            key_columns=("usuario_id",),
+        )
+    except Exception:
+        # Devolve para a próxima rodada sem sobrescrever acessos mais novos.
+        with _pending_lock:
+            for usuario_id, last_seen in rows:
+                if _pending_seen.get(usuario_id, last_seen) <= last_seen:
+                    _pending_seen[usuario_id] = last_seen
+        raise
+
+    return len(rows)
+
+
+def _refresh_online_count(cur):
+    """Recalcula o resumo se ninguém o fez dentro do TTL e lê o valor atual."""
+    agora = datetime.now()
+
+    # Só um worker ganha o UPDATE condicional por janela de TTL.
+    cur.execute(
+        """
+        UPDATE usuarios_online_resumo
+        SET
+            online_count = (
+                SELECT COUNT(*) FROM usuarios_online WHERE last_seen >= %s
+            ),
+            computed_at = %s
+        WHERE resumo_key = %s
+          AND computed_at <= %s
+        """,
+        (
+            agora - timedelta(minutes=ONLINE_WINDOW_MINUTES),
+            agora,
+            RESUMO_KEY,
+            agora - timedelta(seconds=ONLINE_COUNT_TTL_SECONDS),
+        ),
+    )
+
+    _read_online_count(cur)
+
+
+def _read_online_count(cur):
+    cur.execute(
+        "SELECT online_count FROM usuarios_online_resumo WHERE resumo_key = %s",
+        (RESUMO_KEY,),
+    )
+    row = cur.fetchone()
+
+    _count_cache["value"] = int(row[0] or 0) if row else 0
+    _count_cache["loaded_at"] = time.monotonic()
+
+
+def _sync_presence():
+    """Uma rodada: grava presenças pendentes e atualiza a contagem em cache."""
+    with _sync_lock:
+        conn = get_connection()
+        cur = conn.cursor()
+
+        try:
+            _flush_pending(cur)
+            _refresh_online_count(cur)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+
+def _load_online_count():
+    """Só lê o resumo já calculado (sem gravar nada)."""
     conn = get_connection()
     cur = conn.cursor()
 
     try:
-        limite = datetime.now() - timedelta(minutes=ONLINE_WINDOW_MINUTES)
-        cur.execute(
-            "SELECT COUNT(*) FROM usuarios_online WHERE last_seen >= %s",
-            (limite,),
-        )
-        row = cur.fetchone()
-        return row[0] if row else 0
+        _read_online_count(cur)
     finally:
         cur.close()
         conn.close()
 
+
+def _presence_loop():
+    while True:
+        time.sleep(PRESENCE_FLUSH_SECONDS)
+
+        try:
+            _sync_presence()
+        except Exception as e:
+            print(f"[WARN] Falha ao sincronizar presença de usuários: {e}")
+
+
+def _ensure_presence_worker():
+    global _worker
+
+    if _worker is not None and _worker.is_alive():
+        return
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_presence_loop,
+                name="presence-sync",
+                daemon=True,
+            )
+            _worker.start()
+
+
+def _flush_on_exit():
+    with _pending_lock:
+        has_pending = bool(_pending_seen)
+
+    if not has_pending:
+        return
+
+    try:
+        _sync_presence()
+    except Exception as e:
+        print(f"[WARN] Falha ao gravar presença pendente no encerramento: {e}")
+
+
+atexit.register(_flush_on_exit)
+
+
+def registrar_atividade_usuario(usuario_id):
+    """Marca o último acesso do usuário em memória; a gravação no banco é em lote."""
+    if not usuario_id:
+        return
+
+    with _pending_lock:
+        _pending_seen[usuario_id] = datetime.now().replace(microsecond=0)
+
+    _ensure_presence_worker()
+
+
+def remover_usuario_online(usuario_id):
+    """Tira o usuário da lista de online (logout), inclusive do que ainda está em memória."""
+    if not usuario_id:
+        return
+
+    # Com _sync_lock, um lote em gravação termina (e faz commit) antes do
+    # DELETE; o próximo lote já não tem o usuário.
+    with _sync_lock:
+        with _pending_lock:
+            _pending_seen.pop(usuario_id, None)
+
+        conn = get_connection()
+        cur = conn.cursor()
+
+        try:
+            cur.execute(
+                "DELETE FROM usuarios_online WHERE usuario_id = %s",
+                (usuario_id,),
+            )
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+
+
+def obter_usuarios_online_count():
+    """
+    Contagem de usuários online a partir do cache do processo.
+
+    O valor é renovado pela thread de presença; o banco só é lido aqui (sem
+    escrita: roda no context processor de todo template) na primeira chamada
+    do worker ou se a thread ficar parada por muito tempo.
+    """
+    _ensure_presence_worker()
+
+    stale_after = max(PRESENCE_FLUSH_SECONDS, ONLINE_COUNT_TTL_SECONDS) * 3
+
+    if _count_cache["value"] is None or time.monotonic() - _count_cache["loaded_at"] > stale_after:
+        _load_online_count()
+
+    return _count_cache["value"] or 0
+
 def listar_usuarios_online():
+    # Garante que acessos ainda em memória apareçam na lista.
+    _sync_presence()
+
     conn = get_connection()
     cur = conn.cursor(dictionary=True)
 
@@ -83,4 +283,4 @@ def listar_usuarios_online():
 
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
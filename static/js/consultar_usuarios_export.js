@@ -16,7 +16,7 @@ document.addEventListener("DOMContentLoaded", function () {
     const downloadLink = document.getElementById("usersExportDownloadLink");
     const errorBox = document.getElementById("usersExportErrorBox");
 
-    let pollingTimer = null;
+    let statusWatcher = null;
 
     function setProgress(percent) {
         const safePercent = Math.max(0, Math.min(100, percent || 0));
@@ -32,75 +32,57 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
     function stopPolling() {
-        if (pollingTimer) {
-            clearInterval(pollingTimer);
-            pollingTimer = null;
+        if (statusWatcher) {
+            statusWatcher.stop();
+            statusWatcher = null;
         }
     }
 
-    async function fetchStatus(statusUrl, downloadUrl) {
-        try {
-            const response = await fetch(statusUrl, {
-                method: "GET",
-                headers: {
-                    "Accept": "application/json"
-                }
-            });
-
-            const data = await response.json();
-
-            if (!response.ok || !data.ok) {
-                throw new Error(data.error || "Falha ao consultar status.");
-            }
-
-            const status = data.status;
-            const totalUsers = Number(data.total_users || 0);
-            const processedUsers = Number(data.processed_users || 0);
-
-            phaseEl.textContent = data.phase || "Processando exportação...";
+    function applyStatus(data, downloadUrl) {
+        const status = data.status;
+        const totalUsers = Number(data.total_users || 0);
+        const processedUsers = Number(data.processed_users || 0);
 
-            const progressPercent = Number(data.progress_percent || 0);
+        phaseEl.textContent = data.phase || "Processando exportação...";
 
-            if (progressPercent > 0) {
-                setProgress(progressPercent);
-            } else if (totalUsers > 0) {
-                const percent = Math.round((processedUsers / totalUsers) * 100);
-                setProgress(percent);
-            } else {
-                setProgress(status === "success" ? 100 : 5);
-            }
+        const progressPercent = Number(data.progress_percent || 0);
 
-            if (Number(data.processed_resources || 0) > 0 && processedUsers === 0) {
-                detailsEl.textContent = `${data.processed_resources} recursos carregados.`;
-            } else if (totalUsers > 0) {
-                detailsEl.textContent = `${processedUsers} de ${totalUsers} usuários processados.`;
-            } else {
-                detailsEl.textContent = "Buscando usuários no OFS...";
-            }
+        if (progressPercent > 0) {
+            setProgress(progressPercent);
+        } else if (totalUsers > 0) {
+            const percent = Math.round((processedUsers / totalUsers) * 100);
+            setProgress(percent);
+        } else {
+            setProgress(status === "success" ? 100 : 5);
+        }
 
-            if (status === "success") {
-                stopPolling();
-                setProgress(100);
+        if (Number(data.processed_resources || 0) > 0 && processedUsers === 0) {
+            detailsEl.textContent = `${data.processed_resources} recursos carregados.`;
+        } else if (totalUsers > 0) {
+            detailsEl.textContent = `${processedUsers} de ${totalUsers} usuários processados.`;
+        } else {
+            detailsEl.textContent = "Buscando usuários no OFS...";
+        }
 
-                phaseEl.textContent = "Exportação concluída";
-                detailsEl.textContent = "Arquivo CSV gerado com sucesso.";
+        if (status === "success") {
+            setProgress(100);
 
-                downloadLink.href = downloadUrl;
-                downloadBox.style.display = "block";
+            phaseEl.textContent = "Exportação concluída";
+            detailsEl.textContent = "Arquivo CSV gerado com sucesso.";
 
-                btnStart.disabled = false;
-                btnStart.textContent = "Gerar nova exportação CSV";
-            }
+            downloadLink.href = downloadUrl;
+            downloadBox.style.display = "block";
 
-            if (status === "error") {
-                stopPolling();
-                showError(data.error || "Erro ao gerar exportação.");
-            }
+            btnStart.disabled = false;
+            btnStart.textContent = "Gerar nova exportação CSV";
+        }
 
-        } catch (error) {
-            stopPolling();
-            showError(error.message || "Erro inesperado ao consultar status.");
+        if (status === "error") {
+            showError(data.error || "Erro ao gerar exportação.");
+            return true;
         }
+
+        return status === "success";
     }
 
     async function startExport() {
@@ -136,11 +118,21 @@ document.addEventListener("DOMContentLoaded", function () {
             detailsEl.textContent = "Consultando status do processamento...";
             setProgress(2);
 
-            pollingTimer = setInterval(function () {
-                fetchStatus(data.status_url, data.download_url);
-            }, 1500);
-
-            fetchStatus(data.status_url, data.download_url);
+            statusWatcher = watchJobStatus({
+                statusUrl: data.status_url,
+                eventsUrl: data.events_url,
+                intervalMs: 1500,
+                initialDelayMs: 0,
+                onStatus: function (statusData, response) {
+                    if (!response.ok || !statusData.ok) {
+                        throw new Error(statusData.error || "Falha ao consultar status.");
+                    }
+                    return applyStatus(statusData, data.download_url);
+                },
+                onError: function (error) {
+                    showError(error.message || "Erro inesperado ao consultar status.");
+                }
+            });
 
         } catch (error) {
             showError(error.message || "Erro inesperado ao iniciar exportação.");
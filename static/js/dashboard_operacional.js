@@ -3,6 +3,7 @@ document.addEventListener("DOMContentLoaded", function () {
     if (!root) return;
 
     const statusUrl = root.dataset.statusUrl;
+    const detailUrl = root.dataset.detailUrl;
     const currentUpdatedAt = root.dataset.currentUpdatedAt || "";
     const refreshCard = document.querySelector("[data-dashboard-refresh-card]");
     const newDataBox = document.querySelector("[data-dashboard-new-data]");
@@ -19,6 +20,7 @@ document.addEventListener("DOMContentLoaded", function () {
     const btnSelectAll = document.querySelector("[data-dashboard-select-all]");
     const btnClearAll = document.querySelector("[data-dashboard-clear-all]");
     const payload = parsePayload(payloadScript);
+    let detailRows = null;
     const filterCount = document.querySelector("[data-dashboard-filter-count]");
     const filterSearch = document.querySelector("[data-dashboard-filter-search]");
     const btnSelectB2c = document.querySelector("[data-dashboard-select-b2c]");
@@ -145,72 +147,140 @@ document.addEventListener("DOMContentLoaded", function () {
         });
     }
 
-    async function checkStatus() {
-        try {
-            const response = await fetch(statusUrl, {
-                method: "GET",
-                headers: {
-                    "Accept": "application/json"
-                }
-            });
-
-            const data = await response.json().catch(function () {
-                return {};
-            });
-
-            if (!response.ok) {
-                throw new Error(data.error || "Falha ao consultar status.");
+    function applyStatus(data) {
+        if (data.status === "running") {
+            if (data.has_payload) {
+                setRefreshMessage(
+                    "running",
+                    "Atualizando em segundo plano",
+                    "Exibindo última versão disponível.",
+                    data.progress_percent,
+                    data.progress_message,
+                    true
+                );
+            } else {
+                setRefreshMessage(
+                    "running",
+                    "Preparando dashboard",
+                    "A primeira carga está em andamento.",
+                    data.progress_percent,
+                    data.progress_message,
+                    true
+                );
             }
+            return;
+        }
 
-            if (data.status === "running") {
-                if (data.has_payload) {
-                    setRefreshMessage(
-                        "running",
-                        "Atualizando em segundo plano",
-                        "Exibindo última versão disponível.",
-                        data.progress_percent,
-                        data.progress_message,
-                        true
-                    );
-                } else {
-                    setRefreshMessage(
-                        "running",
-                        "Preparando dashboard",
-                        "A primeira carga está em andamento.",
-                        data.progress_percent,
-                        data.progress_message,
-                        true
-                    );
-                }
-                return;
+        if (data.status === "failed") {
+            if (data.has_payload) {
+                setRefreshMessage("failed", "Não foi possível atualizar agora", "Exibindo última versão disponível.");
+            } else {
+                setRefreshMessage("failed", "Falha ao preparar dashboard", "Verifique a conexão com o OFS.");
             }
+            return;
+        }
 
-            if (data.status === "failed") {
-                if (data.has_payload) {
-                    setRefreshMessage("failed", "Não foi possível atualizar agora", "Exibindo última versão disponível.");
-                } else {
-                    setRefreshMessage("failed", "Falha ao preparar dashboard", "Verifique a conexão com o OFS.");
-                }
-                return;
+        if (data.status === "completed") {
+            setRefreshMessage("", "Dados atualizados", data.updated_at || "-");
+
+            if (data.updated_at && data.has_payload && data.updated_at !== currentUpdatedAt) {
+                showNewDataMessage();
             }
+        }
+    }
 
-            if (data.status === "completed") {
-                setRefreshMessage("", "Dados atualizados", data.updated_at || "-");
+    function showStatusUnavailable() {
+        setRefreshMessage("failed", "Status indisponível", "Não foi possível consultar o status do dashboard.");
+    }
 
-                if (data.updated_at && data.has_payload && data.updated_at !== currentUpdatedAt) {
-                    showNewDataMessage();
+    // Consulta o status a cada 15s. Sem canal SSE: a página fica aberta o dia
+    // todo e o stream prenderia uma thread do servidor por usuário.
+    function watchDashboardStatus(initialDelayMs) {
+        watchJobStatus({
+            statusUrl,
+            intervalMs: 15000,
+            initialDelayMs,
+            onStatus: function (data, response) {
+                if (!response.ok) {
+                    showStatusUnavailable();
+                    return false;
                 }
+
+                applyStatus(data);
+                return false;
+            },
+            onError: function () {
+                showStatusUnavailable();
+                watchDashboardStatus(15000);
             }
+        });
+    }
+
+    watchDashboardStatus(2000);
+
+    renderCustomerThermometer();
+    loadDetailRows();
+
+    async function loadDetailRows() {
+        // Snapshot antigo ainda com as linhas dentro do payload.
+        if (Array.isArray(payload.dashboard_rows)) {
+            detailRows = payload.dashboard_rows;
+            renderFilteredBlocks();
+            return;
+        }
+
+        if (!detailUrl) return;
+
+        try {
+            const response = await fetch(detailUrl, {
+                headers: { "Accept": "application/json" },
+                credentials: "same-origin"
+            });
+
+            if (!response.ok) return;
+
+            detailRows = decodeDetailColumns(await response.json());
+            renderFilteredBlocks();
         } catch (error) {
-            setRefreshMessage("failed", "Status indisponível", "Não foi possível consultar o status do dashboard.");
+            detailRows = [];
+            renderFilteredBlocks();
         }
     }
 
-    window.setTimeout(checkStatus, 2000);
-    window.setInterval(checkStatus, 15000);
+    function decodeDetailColumns(detail) {
+        const codes = detail.codes || {};
+        const types = detail.types || {};
+        const columns = detail.columns || {};
+        const size = Number(detail.size || 0);
+
+        // Atributos por tipo são montados uma vez e compartilhados pelas linhas.
+        const typeRows = (codes.type || []).map((code, index) => ({
+            activityType: code,
+            activityTypeFilterCode: (types.filter_code || [])[index] || code,
+            activityTypeLabel: (types.label || [])[index] || code,
+            group: (codes.group || [])[(types.group || [])[index]] || "outros"
+        }));
+
+        const rows = new Array(size);
+
+        for (let i = 0; i < size; i += 1) {
+            const typeRow = typeRows[columns.type[i]] || {};
+
+            rows[i] = {
+                date: codes.date[columns.date[i]],
+                status: codes.status[columns.status[i]],
+                city: codes.city[columns.city[i]],
+                endMinute: columns.end_minute[i],
+                activityType: typeRow.activityType,
+                activityTypeFilterCode: typeRow.activityTypeFilterCode,
+                activityTypeLabel: typeRow.activityTypeLabel,
+                group: typeRow.group
+            };
+        }
+
+        return rows;
+    }
 
-    renderFilteredBlocks();
-    renderCustomerThermometer();
     function parsePayload(script) {
         if (!script) return {};
 
@@ -278,7 +348,7 @@ document.addEventListener("DOMContentLoaded", function () {
         renderFilteredBlocks();
     }
     function getFilteredRows() {
-        const rows = Array.isArray(payload.dashboard_rows) ? payload.dashboard_rows : [];
+        const rows = detailRows || [];
         const selectedTypes = getSelectedTypes();
 
         if (!selectedTypes.size) return [];
@@ -295,12 +365,15 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
     function renderFilteredBlocks() {
+        updateFilterCount();
+
+        // Gráficos esperam o detalhe carregado (placeholders do template até lá).
+        if (detailRows === null) return;
+
         const rows = getFilteredRows();
-        const allRows = Array.isArray(payload.dashboard_rows) ? payload.dashboard_rows : [];
+        const allRows = detailRows;
         const today = payload.periods ? payload.periods.today : "";
 
-        updateFilterCount();
-
         renderTypeChart(allRows, today, "b2c", b2cTypesChart, "Nenhum tipo B2C encontrado hoje.");
         renderTypeChart(allRows, today, "redes", redesTypesChart, "Nenhum tipo de Redes/B2B encontrado hoje.");
 
@@ -617,7 +690,7 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
     function rowFinishedUntilTime(row, untilTime) {
-        const endMinutes = parseTimeToMinutes(row.endTime);
+        const endMinutes = row.endMinute !== undefined ? row.endMinute : parseTimeToMinutes(row.endTime);
         const untilMinutes = parseTimeToMinutes(untilTime);
 
         if (endMinutes === null || untilMinutes === null) {
@@ -4,6 +4,7 @@
   const singleSendUrl = pageEl?.dataset.urlSingleSend || "";
   const massiveStartUrl = pageEl?.dataset.urlMassiveStart || "";
   const massiveStatusBaseUrl = pageEl?.dataset.urlMassiveStatusBase || "";
+  const massiveEventsBaseUrl = pageEl?.dataset.urlMassiveEventsBase || "";
 
   const toggleButtons = document.querySelectorAll(".ddc-toggle-btn");
 
@@ -32,7 +33,7 @@
 
   let massiveIds = [];
   let massiveJobRunning = false;
-  let massivePollTimer = null;
+  let massiveWatcher = null;
   let currentJobId = null;
 
   function buildMassiveStatusUrl(jobId) {
@@ -307,52 +308,57 @@
     return data;
   }
 
-  async function fetchMassiveStatus(jobId) {
-    const statusUrl = buildMassiveStatusUrl(jobId);
-
-    if (!statusUrl) {
-      throw new Error("URL de status do envio massivo não configurada.");
-    }
-
-    const response = await fetch(statusUrl);
-    const data = await response.json();
-
-    if (!response.ok || !data.success) {
-      throw new Error(data.message || "Falha ao consultar status do job.");
-    }
-
-    return data;
-  }
-
   function stopMassivePolling() {
-    if (massivePollTimer) {
-      clearTimeout(massivePollTimer);
-      massivePollTimer = null;
+    if (massiveWatcher) {
+      massiveWatcher.stop();
+      massiveWatcher = null;
     }
   }
 
-  async function pollMassiveStatus() {
+  function pollMassiveStatus() {
     if (!currentJobId) return;
 
-    try {
-      const data = await fetchMassiveStatus(currentJobId);
-      updateMassiveSummaryFromApi(data);
+    const statusUrl = buildMassiveStatusUrl(currentJobId);
 
-      if (data.status === "finished" || data.status === "error") {
-        setMassiveButtonsState(false);
-        stopMassivePolling();
-        return;
-      }
-
-      massivePollTimer = setTimeout(pollMassiveStatus, 1000);
-    } catch (error) {
+    if (!statusUrl) {
       if (massiveProgressMeta) {
-        massiveProgressMeta.textContent = error.message;
+        massiveProgressMeta.textContent = "URL de status do envio massivo não configurada.";
       }
-
       setMassiveButtonsState(false);
-      stopMassivePolling();
+      return;
     }
+
+    stopMassivePolling();
+
+    massiveWatcher = watchJobStatus({
+      statusUrl,
+      eventsUrl: massiveEventsBaseUrl
+        ? massiveEventsBaseUrl.replace("__JOB_ID__", encodeURIComponent(currentJobId))
+        : "",
+      intervalMs: 1000,
+      initialDelayMs: 0,
+      onStatus: function (data, response) {
+        if (!response.ok || !data.success) {
+          throw new Error(data.message || "Falha ao consultar status do job.");
+        }
+
+        updateMassiveSummaryFromApi(data);
+
+        if (data.status === "finished" || data.status === "error") {
+          setMassiveButtonsState(false);
+          return true;
+        }
+
+        return false;
+      },
+      onError: function (error) {
+        if (massiveProgressMeta) {
+          massiveProgressMeta.textContent = error.message;
+        }
+
+        setMassiveButtonsState(false);
+      }
+    });
   }
 
   toggleButtons.forEach((button) => {
@@ -60,7 +60,7 @@ document.addEventListener("DOMContentLoaded", function () {
     let currentSimulationDownloadUrl = null;
     let currentApplyUrl = null;
     let currentApplicationDownloadUrl = null;
-    let pollingTimer = null;
+    let statusWatcher = null;
 
     pageSessionInputs.forEach(function (input) {
         input.value = pageSessionId;
@@ -122,11 +122,7 @@ document.addEventListener("DOMContentLoaded", function () {
                 currentSimulationDownloadUrl = data.download_url;
                 currentApplyUrl = buildApplyUrl(data.job_id);
 
-                pollStatus(currentSimulationStatusUrl, "simulation");
-
-                pollingTimer = window.setInterval(function () {
-                    pollStatus(currentSimulationStatusUrl, "simulation");
-                }, 2500);
+                watchStatus(currentSimulationStatusUrl, data.events_url, "simulation");
 
             } catch (error) {
                 setButtonLoading(simulateButton, false);
@@ -289,79 +285,76 @@ document.addEventListener("DOMContentLoaded", function () {
     });
 
 
-    async function pollStatus(statusUrl, expectedType) {
-        if (!statusUrl) return;
+    function applyStatus(data, expectedType) {
+        updateStatus(data);
 
-        try {
-            const urlWithNoCache = `${statusUrl}${statusUrl.includes("?") ? "&" : "?"}_=${Date.now()}`;
+        if (data.status === "success") {
+            setButtonLoading(simulateButton, false);
 
-            const response = await fetch(urlWithNoCache, {
-                method: "GET",
-                cache: "no-store",
-                headers: {
-                    "Accept": "application/json",
-                    "Cache-Control": "no-cache"
+            if (expectedType === "application" || data.job_type === "application") {
+                renderResults(data);
+
+                if (downloadLink && currentApplicationDownloadUrl) {
+                    downloadLink.href = currentApplicationDownloadUrl;
                 }
-            });
 
-            const data = await response.json().catch(function () {
-                return {};
-            });
+                if (actionsBox) {
+                    actionsBox.classList.remove("hidden");
+                }
 
-            if (!response.ok || data.ok === false) {
-                throw new Error(
-                    data.error ||
-                    data.message ||
-                    `Falha ao consultar status. Status HTTP: ${response.status}`
-                );
-            }
+                if (openApplyButton) {
+                    openApplyButton.disabled = true;
+                }
 
-            updateStatus(data);
+                return true;
+            }
 
-            if (data.status === "success") {
-                clearPolling();
-                setButtonLoading(simulateButton, false);
+            renderCandidates(data);
+            showSimulationActions();
+            return true;
+        }
 
-                if (expectedType === "application" || data.job_type === "application") {
-                    renderResults(data);
+        if (data.status === "error") {
+            setButtonLoading(simulateButton, false);
+            markProgressError();
+            setStatus(
+                data.error || "Erro no processamento.",
+                data.progress_percent || 0,
+                data.phase || "Erro"
+            );
+            return true;
+        }
 
-                    if (downloadLink && currentApplicationDownloadUrl) {
-                        downloadLink.href = currentApplicationDownloadUrl;
-                    }
+        return false;
+    }
 
-                    if (actionsBox) {
-                        actionsBox.classList.remove("hidden");
-                    }
+    function watchStatus(statusUrl, eventsUrl, expectedType) {
+        if (!statusUrl) return;
 
-                    if (openApplyButton) {
-                        openApplyButton.disabled = true;
-                    }
+        clearPolling();
 
-                    return;
+        statusWatcher = watchJobStatus({
+            statusUrl,
+            eventsUrl,
+            intervalMs: 2500,
+            initialDelayMs: 0,
+            onStatus: function (data, response) {
+                if (!response.ok || data.ok === false) {
+                    throw new Error(
+                        data.error ||
+                        data.message ||
+                        `Falha ao consultar status. Status HTTP: ${response.status}`
+                    );
                 }
 
-                renderCandidates(data);
-                showSimulationActions();
-                return;
-            }
-
-            if (data.status === "error") {
-                clearPolling();
+                return applyStatus(data, expectedType);
+            },
+            onError: function (error) {
                 setButtonLoading(simulateButton, false);
                 markProgressError();
-                setStatus(
-                    data.error || "Erro no processamento.",
-                    data.progress_percent || 0,
-                    data.phase || "Erro"
-                );
+                setStatus(error.message || "Falha ao consultar status.", 0, "Erro");
             }
-
-        } catch (error) {
-            clearPolling();
-            setButtonLoading(simulateButton, false);
-            markProgressError();
-            setStatus(error.message || "Falha ao consultar status.", 0, "Erro");
-        }
+        });
     }
 
     async function executeApply() {
@@ -425,11 +418,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
             currentApplicationDownloadUrl = data.download_url || null;
 
-            pollStatus(data.status_url, "application");
-
-            pollingTimer = window.setInterval(function () {
-                pollStatus(data.status_url, "application");
-            }, 2500);
+            watchStatus(data.status_url, data.events_url, "application");
 
             if (downloadLink && currentApplicationDownloadUrl) {
                 downloadLink.href = currentApplicationDownloadUrl;
@@ -818,9 +807,9 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
     function clearPolling() {
-        if (pollingTimer) {
-            window.clearInterval(pollingTimer);
-            pollingTimer = null;
+        if (statusWatcher) {
+            statusWatcher.stop();
+            statusWatcher = null;
         }
     }
 
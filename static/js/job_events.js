@@ -0,0 +1,129 @@
+// Acompanhamento de jobs em segundo plano.
+//
+// Usa o canal SSE (/eventos/jobs/<tipo>/<job_id>) quando o navegador suporta
+// e o job está publicando neste processo; caso contrário (ou se a conexão
+// cair) volta ao polling do endpoint de status de sempre.
+//
+// onStatus(data, resp) recebe o mesmo corpo do endpoint de status e devolve
+// true quando o acompanhamento pode parar. Exceções em onStatus ou falhas de
+// rede no polling vão para onError, que também encerra o acompanhamento.
+function watchJobStatus(options) {
+    const statusUrl = options.statusUrl;
+    const eventsUrl = options.eventsUrl;
+    const onStatus = options.onStatus;
+    const onError = options.onError || function (error) { console.error(error); };
+    const intervalMs = options.intervalMs || 2500;
+    const initialDelayMs = options.initialDelayMs === undefined ? intervalMs : options.initialDelayMs;
+
+    let stopped = false;
+    let source = null;
+    let timer = null;
+    let polling = false;
+
+    function stop() {
+        stopped = true;
+        if (source) source.close();
+        if (timer) clearTimeout(timer);
+    }
+
+    async function fetchStatus() {
+        const resp = await fetch(statusUrl, {
+            method: "GET",
+            headers: { "Accept": "application/json" },
+            cache: "no-store"
+        });
+        const data = await resp.json().catch(function () {
+            return {};
+        });
+        return { resp, data };
+    }
+
+    async function deliver(data, resp) {
+        if (stopped) return true;
+
+        try {
+            if (await onStatus(data, resp)) {
+                stop();
+                return true;
+            }
+        } catch (error) {
+            stop();
+            onError(error);
+            return true;
+        }
+        return false;
+    }
+
+    async function poll() {
+        if (stopped) return;
+
+        try {
+            const { resp, data } = await fetchStatus();
+            if (await deliver(data, resp)) return;
+        } catch (error) {
+            stop();
+            onError(error);
+            return;
+        }
+
+        timer = setTimeout(poll, intervalMs);
+    }
+
+    function startPolling(delayMs) {
+        if (stopped || polling) return;
+        polling = true;
+
+        if (source) {
+            source.close();
+            source = null;
+        }
+
+        timer = setTimeout(poll, delayMs);
+    }
+
+    if (!eventsUrl || !window.EventSource) {
+        startPolling(initialDelayMs);
+        return { stop };
+    }
+
+    source = new EventSource(eventsUrl);
+
+    source.addEventListener("status", function (event) {
+        let data = {};
+        try {
+            data = JSON.parse(event.data);
+        } catch (error) {
+            return;
+        }
+        deliver(data, { ok: true, status: 200 });
+    });
+
+    // "final": o job terminou; o endpoint de status traz o estado completo
+    // (links de download, prévias etc.).
+    source.addEventListener("final", async function () {
+        if (source) source.close();
+
+        try {
+            const { resp, data } = await fetchStatus();
+            const done = await deliver(data, resp);
+            if (!done) startPolling(intervalMs);
+        } catch (error) {
+            stop();
+            onError(error);
+        }
+    });
+
+    source.addEventListener("fallback", function () {
+        startPolling(0);
+    });
+
+    source.onerror = function () {
+        // Fechamento normal (tempo máximo do stream) reconecta sozinho;
+        // só cai para o polling se a conexão estiver realmente fechada.
+        if (source && source.readyState === EventSource.CLOSED) {
+            startPolling(0);
+        }
+    };
+
+    return { stop };
+}
@@ -3,6 +3,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
     const startUrl = body.dataset.ofsOsStartUrl;
     const statusUrlBase = body.dataset.ofsOsStatusUrlBase;
+    const eventsUrlBase = body.dataset.jobEventsUrlBase;
     const downloadUrlBase = body.dataset.ofsOsDownloadUrlBase;
     const discardUrlBase = body.dataset.ofsOsDiscardUrlBase;
 
@@ -587,18 +588,19 @@ document.addEventListener("DOMContentLoaded", function () {
 
         updateReportSummary();
     });
-    async function pollJob(jobId) {
+    function pollJob(jobId) {
         const statusUrl = statusUrlBase.replace("__JOB_ID__", encodeURIComponent(jobId));
+        const eventsUrl = eventsUrlBase ? eventsUrlBase.replace("__JOB_ID__", encodeURIComponent(jobId)) : "";
 
-        const interval = setInterval(async function () {
-            try {
-                const { resp, data } = await fetchJson(statusUrl);
-
+        watchJobStatus({
+            statusUrl,
+            eventsUrl,
+            intervalMs: 2500,
+            onStatus: function (data, resp) {
                 if (!resp.ok || !data.ok) {
-                    clearInterval(interval);
                     setStatusBox(getReadableError(data, "Erro ao consultar status da extração."), "error");
                     if (btnStart) btnStart.disabled = false;
-                    return;
+                    return true;
                 }
 
                 const job = data.job || {};
@@ -608,27 +610,28 @@ document.addEventListener("DOMContentLoaded", function () {
                 setStatusBox(`${phase} | Linhas até agora: ${rows}`, "info");
 
                 if (job.status === "completed") {
-                    clearInterval(interval);
                     setStatusBox(`Extração concluída. Linhas extraídas: ${job.total_rows || 0}.`, "info");
                     if (btnStart) btnStart.disabled = false;
                     renderRedesSummary(job.summary);
                     showPersistentExtractionToast(job);
-                    return;
+                    return true;
                 }
 
                 if (job.status === "failed") {
-                    clearInterval(interval);
                     setStatusBox(job.error || "Falha na extração.", "error");
                     if (btnStart) btnStart.disabled = false;
                     showToast("error", "Erro", job.error || "Falha na extração.");
+                    return true;
                 }
-            } catch (err) {
+
+                return false;
+            },
+            onError: function (err) {
                 console.error(err);
-                clearInterval(interval);
                 setStatusBox("Falha de rede ao consultar status da extração.", "error");
                 if (btnStart) btnStart.disabled = false;
             }
-        }, 2500);
+        });
     }
 
     if (form) {
@@ -777,6 +780,55 @@ document.addEventListener("DOMContentLoaded", function () {
             const statusUrl = resourceSyncStatusUrlBase.replace("__JOB_ID__", encodeURIComponent(jobId));
             let consecutiveErrors = 0;
 
+            function applyJob(job) {
+                const percent = job.percent || 0;
+                const rawTotal = job.raw_total_from_api || 0;
+                const insertedSoFar = job.inserted_so_far || 0;
+                const phase = job.phase || "Atualizando recursos";
+
+                setResourceProgress(
+                    percent,
+                    `${phase} | API: ${rawTotal} | Carregados: ${insertedSoFar}`,
+                    "running"
+                );
+
+                if (job.status === "completed") {
+                    resourceSyncPollingActive = false;
+                    clearStoredResourceJob();
+
+                    const insertedTotal = job.inserted_total || insertedSoFar || 0;
+
+                    const result = job.result || {};
+                    const activeTotal = result.active_total || 0;
+                    const inactiveTotal = result.inactive_total || 0;
+
+                    finishResourceProgress(
+                        `Concluído. Recursos carregados: ${insertedTotal}. Ativos: ${activeTotal}. Inativos: ${inactiveTotal}.`
+                    );
+
+                    showToast(
+                        "success",
+                        "Lista de recursos atualizada",
+                        `Recursos carregados: ${insertedTotal}. Ativos: ${activeTotal}. Inativos: ${inactiveTotal}. Recarregue esta página para ver a lista atualizada.`
+                    );
+
+                    return true;
+                }
+
+                if (job.status === "failed") {
+                    resourceSyncPollingActive = false;
+                    clearStoredResourceJob();
+
+                    const errorMessage = job.error || "Falha ao atualizar lista de recursos.";
+
+                    failResourceProgress(errorMessage);
+                    showToast("error", "Erro", errorMessage);
+                    return true;
+                }
+
+                return false;
+            }
+
             async function tick() {
                 try {
                     const { resp, data } = await fetchJson(statusUrl);
@@ -813,51 +865,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
                     consecutiveErrors = 0;
 
-                    const job = data.job || {};
-                    const percent = job.percent || 0;
-                    const rawTotal = job.raw_total_from_api || 0;
-                    const insertedSoFar = job.inserted_so_far || 0;
-                    const phase = job.phase || "Atualizando recursos";
-
-                    setResourceProgress(
-                        percent,
-                        `${phase} | API: ${rawTotal} | Carregados: ${insertedSoFar}`,
-                        "running"
-                    );
-
-                    if (job.status === "completed") {
-                        resourceSyncPollingActive = false;
-                        clearStoredResourceJob();
-
-                        const insertedTotal = job.inserted_total || insertedSoFar || 0;
-
-                        const result = job.result || {};
-                        const activeTotal = result.active_total || 0;
-                        const inactiveTotal = result.inactive_total || 0;
-
-                        finishResourceProgress(
-                            `Concluído. Recursos carregados: ${insertedTotal}. Ativos: ${activeTotal}. Inativos: ${inactiveTotal}.`
-                        );
-
-                        showToast(
-                            "success",
-                            "Lista de recursos atualizada",
-                            `Recursos carregados: ${insertedTotal}. Ativos: ${activeTotal}. Inativos: ${inactiveTotal}. Recarregue esta página para ver a lista atualizada.`
-                        );
-
-                        return;
-                    }
-
-                    if (job.status === "failed") {
-                        resourceSyncPollingActive = false;
-                        clearStoredResourceJob();
-
-                        const errorMessage = job.error || "Falha ao atualizar lista de recursos.";
-
-                        failResourceProgress(errorMessage);
-                        showToast("error", "Erro", errorMessage);
-                        return;
-                    }
+                    if (applyJob(data.job || {})) return;
 
                     setTimeout(tick, 2500);
                 } catch (err) {
@@ -882,7 +890,36 @@ document.addEventListener("DOMContentLoaded", function () {
                 }
             }
 
-            tick();
+            // Com SSE, o andamento chega por evento; o status só é consultado
+            // no fim ("final") ou se o canal não estiver disponível.
+            if (!eventsUrlBase || !window.EventSource) {
+                tick();
+                return;
+            }
+
+            const source = new EventSource(eventsUrlBase.replace("__JOB_ID__", encodeURIComponent(jobId)));
+            let switchedToStatus = false;
+
+            function switchToStatus() {
+                source.close();
+                if (switchedToStatus) return;
+                switchedToStatus = true;
+                tick();
+            }
+
+            source.addEventListener("status", function (event) {
+                try {
+                    const data = JSON.parse(event.data);
+                    if (applyJob(data.job || {})) source.close();
+                } catch (err) {
+                    console.error(err);
+                }
+            });
+            source.addEventListener("final", switchToStatus);
+            source.addEventListener("fallback", switchToStatus);
+            source.onerror = function () {
+                if (source.readyState === EventSource.CLOSED) switchToStatus();
+            };
         }
 
         btnSync.addEventListener("click", async function () {
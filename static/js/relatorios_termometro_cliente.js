@@ -3,6 +3,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
     const startUrl = body.dataset.thermometerStartUrl;
     const statusUrlBase = body.dataset.thermometerStatusUrlBase;
+    const eventsUrlBase = body.dataset.jobEventsUrlBase;
     const downloadUrlBase = body.dataset.thermometerDownloadUrlBase;
     const discardUrlBase = body.dataset.thermometerDiscardUrlBase;
 
@@ -314,43 +315,45 @@ document.addEventListener("DOMContentLoaded", function () {
         container.appendChild(toast);
     }
 
-    async function pollJob(jobId) {
+    function pollJob(jobId) {
         const statusUrl = statusUrlBase.replace("__JOB_ID__", encodeURIComponent(jobId));
+        const eventsUrl = eventsUrlBase ? eventsUrlBase.replace("__JOB_ID__", encodeURIComponent(jobId)) : "";
 
-        const interval = setInterval(async function () {
-            try {
-                const { resp, data } = await fetchJson(statusUrl);
-
+        watchJobStatus({
+            statusUrl,
+            eventsUrl,
+            intervalMs: 2500,
+            onStatus: function (data, resp) {
                 if (!resp.ok || !data.ok) {
-                    clearInterval(interval);
                     setStatusBox(getReadableError(data, "Erro ao consultar status da extração."), "error");
                     if (btnStart) btnStart.disabled = false;
-                    return;
+                    return true;
                 }
 
                 const job = data.job || {};
                 setStatusBox(`${job.phase || "Processando"} | Linhas até agora: ${job.rows_so_far || 0}`, "info");
 
                 if (job.status === "completed") {
-                    clearInterval(interval);
                     setStatusBox(`Extração concluída. Linhas exportadas: ${job.total_rows || 0}.`, "info");
                     if (btnStart) btnStart.disabled = false;
                     showPersistentExtractionToast(job);
-                    return;
+                    return true;
                 }
 
                 if (job.status === "failed") {
-                    clearInterval(interval);
                     setStatusBox(job.error || "Falha na extração.", "error");
                     if (btnStart) btnStart.disabled = false;
                     showToast("error", "Erro", job.error || "Falha na extração.");
+                    return true;
                 }
-            } catch (err) {
-                clearInterval(interval);
+
+                return false;
+            },
+            onError: function () {
                 setStatusBox("Falha de rede ao consultar status da extração.", "error");
                 if (btnStart) btnStart.disabled = false;
             }
-        }, 2500);
+        });
     }
 
     document.querySelectorAll(".resource-type-btn").forEach(btn => {
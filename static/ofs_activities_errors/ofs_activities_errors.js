@@ -17,6 +17,8 @@
     const URL_START = pageEl?.dataset.urlStart || "";
     const URL_STATUS = (jobId) =>
         (pageEl?.dataset.urlStatusTemplate || "").replace("999999", String(jobId));
+    const URL_EVENTS = (jobId) =>
+        (pageEl?.dataset.urlEventsTemplate || "").replace("999999", String(jobId));
     const URL_CANCEL = (jobId) =>
         (pageEl?.dataset.urlCancelTemplate || "").replace("999999", String(jobId));
     const URL_DETAIL = (activityId) =>
@@ -186,59 +188,62 @@
     }
 
     let pollTimer = null;
+    let jobEvents = null;
     function stopPolling() {
         if (pollTimer) clearInterval(pollTimer);
         pollTimer = null;
+        if (jobEvents) jobEvents.close();
+        jobEvents = null;
     }
 
-    async function poll(jobId, filters) {
-        setRunningUI(true);
-
-        // Poll rápido enquanto running
-        stopPolling();
-        pollTimer = setInterval(async () => {
-            try {
-                const job = await fetchJobStatus(jobId);
+    // Devolve true quando o job terminou (e a tela já foi tratada).
+    function handleJob(job, filters) {
+        const nextRun = loadNextRun();
+        setStatusUI(renderJob(job, nextRun));
 
-                const nextRun = loadNextRun();
-                setStatusUI(renderJob(job, nextRun));
+        if (job.status === "queued" || job.status === "running") return false;
 
-                if (job.status === "running") return;
+        // Finalizou
+        stopPolling();
+        clearActiveJobId();
+        setRunningUI(false);
 
-                // Finalizou
-                stopPolling();
-                clearActiveJobId();
-                setRunningUI(false);
+        if (job.status === "done") {
+            // agenda próxima execução em 2h e recarrega com os filtros
+            const newNext = Date.now() + TWO_HOURS_MS;
+            saveNextRun(newNext);
+            saveFilters(filters);
 
-                if (job.status === "done") {
-                    // agenda próxima execução em 2h e recarrega com os filtros
-                    const newNext = Date.now() + TWO_HOURS_MS;
-                    saveNextRun(newNext);
-                    saveFilters(filters);
+            const q = new URLSearchParams(filters).toString();
+            window.location.href = `${window.location.pathname}?${q}`;
+            return true;
+        }
 
-                    const q = new URLSearchParams(filters).toString();
-                    window.location.href = `${window.location.pathname}?${q}`;
-                    return;
-                }
+        if (job.status === "canceled") {
+            const newNext = Date.now() + TWO_HOURS_MS;
+            saveNextRun(newNext);
 
-                if (job.status === "canceled") {
-                    stopPolling();
-                    clearActiveJobId();
-                    setRunningUI(false);
+            setStatusUI(renderJob(job, newNext));
+            startCountdown();
+            return true;
+        }
 
-                    const newNext = Date.now() + TWO_HOURS_MS;
-                    saveNextRun(newNext);
+        // error
+        setStatusUI(renderJob(job, loadNextRun()));
+        // retry automático em 2 minutos
+        const retry = Date.now() + (2 * 60 * 1000);
+        saveNextRun(retry);
+        return true;
+    }
 
-                    setStatusUI(renderJob(job, newNext));
-                    startCountdown();
-                    return;
-                }
+    function startStatusPolling(jobId, filters) {
+        if (pollTimer) return;
+        if (jobEvents) jobEvents.close();
+        jobEvents = null;
 
-                // error
-                setStatusUI(renderJob(job, loadNextRun()));
-                // retry automático em 2 minutos
-                const retry = Date.now() + (2 * 60 * 1000);
-                saveNextRun(retry);
+        pollTimer = setInterval(async () => {
+            try {
+                handleJob(await fetchJobStatus(jobId), filters);
             } catch (e) {
                 // falha de rede/status: não derruba; mantém tentando
                 setStatusUI(`
@@ -249,6 +254,38 @@
         `);
             }
         }, 2000);
+    }
+
+    async function poll(jobId, filters) {
+        setRunningUI(true);
+        stopPolling();
+
+        // Andamento via SSE; o polling rápido fica para o fim do job
+        // ("final"), navegador sem EventSource ou job de outro processo.
+        const eventsUrl = URL_EVENTS(jobId);
+        if (eventsUrl && window.EventSource) {
+            const source = new EventSource(eventsUrl);
+            jobEvents = source;
+
+            const toPolling = () => {
+                if (jobEvents === source) startStatusPolling(jobId, filters);
+            };
+
+            source.addEventListener("status", (event) => {
+                try {
+                    handleJob(JSON.parse(event.data).job || {}, filters);
+                } catch (e) {
+                    console.error(e);
+                }
+            });
+            source.addEventListener("final", toPolling);
+            source.addEventListener("fallback", toPolling);
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED) toPolling();
+            };
+        } else {
+            startStatusPolling(jobId, filters);
+        }
 
         // Primeira chamada imediata
         try {
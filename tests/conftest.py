@@ -0,0 +1,14 @@
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+# database.connection abre o pool do MySQL no import; os testes rodam sem
+# banco, com uma conexão falsa que só guarda os comandos.
+from tests import fake_db  # noqa: E402
+
+sys.modules["database.connection"] = fake_db
@@ -0,0 +1,46 @@
+"""Banco falso para os testes: registra o SQL executado, sem MySQL."""
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.connection.executed.append((" ".join(sql.split()), params))
+        self.rowcount = 1
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Conexão em memória: só registra o SQL executado."""
+
+    def __init__(self, executed):
+        self.executed = executed
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.executed.append(("COMMIT", None))
+
+    def rollback(self):
+        self.executed.append(("ROLLBACK", None))
+
+    def close(self):
+        pass
+
+
+executed_sql = []
+
+
+def get_connection():
+    return FakeConnection(executed_sql)
@@ -0,0 +1,45 @@
+from flask import Flask
+
+from routes import home_routes
+from services import dashboard_operacional_service as dashboard
+from tests.fake_db import executed_sql
+
+
+def _app():
+    app = Flask(__name__)
+    app.secret_key = "test"
+    home_routes.init_app(app)
+    return app
+
+
+def test_unlock_route_releases_lease_and_wakes_refresher(monkeypatch):
+    started = []
+    monkeypatch.setattr(dashboard, "start_dashboard_refresher", lambda: started.append(True))
+    monkeypatch.setattr(dashboard, "_snapshot_table_ready", True)
+    dashboard._refresher_wakeup.clear()
+    executed_sql.clear()
+
+    client = _app().test_client()
+    with client.session_transaction() as session:
+        session["usuario_logado"] = "admin"
+        session["tipo_id"] = 1
+
+    resp = client.post("/dashboard/destravar")
+
+    assert resp.status_code == 200
+    assert resp.get_json()["ok"] is True
+    assert started == [True]
+    assert dashboard._refresher_wakeup.is_set()
+    assert any(
+        "UPDATE dashboard_operacional_lease" in sql and params == (dashboard.LEASE_KEY,)
+        for sql, params in executed_sql
+    )
+
+
+def test_unlock_route_requires_admin():
+    client = _app().test_client()
+    with client.session_transaction() as session:
+        session["usuario_logado"] = "user"
+        session["tipo_id"] = 2
+
+    assert client.post("/dashboard/destravar").status_code == 403
@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+from tests.conftest import PROJECT_ROOT
+
+# Worker "vivo": enfileira dois jobs na mesma classe (1 worker), o primeiro
+# fica rodando até existir o arquivo release e o segundo espera na fila.
+WORKER_SCRIPT = textwrap.dedent("""
+    import os, sys, time
+    sys.path.insert(0, sys.argv[1])
+    from core import job_queue
+    from tests.test_job_queue import register_test_job
+
+    register_test_job(job_queue)
+    job_queue.submit("teste", "1", ("1",))
+    job_queue.submit("teste", "2", ("2",))
+
+    while True:
+        time.sleep(0.1)
+""")
+
+
+def _status_path(job_id):
+    return os.path.join(os.environ["JOB_QUEUE_DIR"], f"status_{job_id}.txt")
+
+
+def _set_status(job_id, text):
+    with open(_status_path(job_id), "a", encoding="utf-8") as f:
+        f.write(f"{os.getpid()}:{text}\n")
+
+
+def _run_test_job(job_id):
+    _set_status(job_id, "running")
+    release = os.path.join(os.environ["JOB_QUEUE_DIR"], "release")
+    while not os.path.exists(release):
+        time.sleep(0.05)
+    _set_status(job_id, "done")
+
+
+def _mark_test_job_queued(position, job_id):
+    _set_status(job_id, f"queued {position}")
+
+
+def _mark_test_job_interrupted(job_id):
+    _set_status(job_id, "interrupted")
+
+
+def register_test_job(job_queue):
+    job_queue.register_job(
+        "teste",
+        "ddc",
+        _run_test_job,
+        _mark_test_job_queued,
+        _mark_test_job_interrupted,
+    )
+
+
+def _read_status(queue_dir, job_id):
+    try:
+        with open(os.path.join(queue_dir, f"status_{job_id}.txt"), encoding="utf-8") as f:
+            return f.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+
+def _wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _start_worker(queue_dir):
+    env = dict(os.environ, JOB_QUEUE_DIR=str(queue_dir), PYTHONPATH=PROJECT_ROOT)
+    process = subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, PROJECT_ROOT], env=env)
+    assert _wait_for(lambda: any(line.endswith(":running") for line in _read_status(queue_dir, "1")))
+    assert _wait_for(lambda: _read_status(queue_dir, "2"))
+    return process
+
+
+def _restoring_queue(monkeypatch, queue_dir):
+    """Segunda instância da fila (este processo) que assume o lock de restauração."""
+    from core import job_queue
+
+    monkeypatch.setenv("JOB_QUEUE_DIR", str(queue_dir))
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_DIR", str(queue_dir))
+    monkeypatch.setattr(job_queue, "_restore_lock", None)
+    monkeypatch.setattr(job_queue, "_registry", {})
+    monkeypatch.setattr(job_queue, "_pools", {})
+    register_test_job(job_queue)
+    return job_queue
+
+
+def test_restore_leaves_jobs_of_live_workers_alone(tmp_path, monkeypatch):
+    worker = _start_worker(tmp_path)
+
+    try:
+        before = {job_id: _read_status(tmp_path, job_id) for job_id in ("1", "2")}
+
+        job_queue = _restoring_queue(monkeypatch, tmp_path)
+        job_queue.restore_pending()
+        time.sleep(0.3)
+
+        assert job_queue.queue_position("teste", "2") is None
+        assert {job_id: _read_status(tmp_path, job_id) for job_id in ("1", "2")} == before
+
+        open(tmp_path / "release", "w").close()
+        assert _wait_for(lambda: any(line.endswith(":done") for line in _read_status(tmp_path, "2")))
+
+        ran = [line for line in _read_status(tmp_path, "2") if line.endswith(":running")]
+        assert ran == [f"{worker.pid}:running"]
+    finally:
+        worker.kill()
+        worker.wait()
+
+
+def test_restore_takes_over_jobs_of_dead_workers(tmp_path, monkeypatch):
+    worker = _start_worker(tmp_path)
+    worker.kill()
+    worker.wait()
+
+    job_queue = _restoring_queue(monkeypatch, tmp_path)
+    open(tmp_path / "release", "w").close()
+    job_queue.restore_pending()
+
+    assert _read_status(tmp_path, "1")[-1] == f"{os.getpid()}:interrupted"
+    assert _wait_for(lambda: _read_status(tmp_path, "2")[-1] == f"{os.getpid()}:done")
+    assert not [name for name in os.listdir(tmp_path) if name.endswith((".json", ".running"))]
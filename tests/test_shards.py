@@ -0,0 +1,62 @@
+import threading
+import time
+from contextlib import closing
+
+from ofs import shards as shards_module
+
+DAYS = [f"2026-01-{day:02d}" for day in range(1, 9)]
+PAGES_PER_DAY = 10
+
+
+class FakeClient:
+    """iter_activity_pages falso: PAGES_PER_DAY páginas por dia."""
+
+    def iter_activity_pages(self, date_from, date_to, resources, **kwargs):
+        for page in range(1, PAGES_PER_DAY + 1):
+            yield {
+                "page": page,
+                "offset": (page - 1) * 2,
+                "items": [{"activityId": f"{date_from}-{page}"}],
+                "has_more": page < PAGES_PER_DAY,
+            }
+
+
+def _consume(client, results, key):
+    shards = shards_module.build_activity_shards(DAYS, ["R1"])
+    seen = []
+
+    with closing(shards_module.iter_activity_shards(client, shards, use_cache=False)) as pages:
+        for shard, page_data in pages:
+            seen.append((shard["day"], page_data["page"]))
+
+    results[key] = seen
+
+
+def test_concurrent_iterators_do_not_deadlock(monkeypatch):
+    # O primeiro shard de cada job chega atrasado: com os valores padrão, os
+    # shards adiantados dos dois jobs (3 + 3) enchem as filas antes dele.
+    fetch_shard = shards_module._fetch_shard
+
+    def delayed_fetch_shard(client, shard, *args):
+        if shard["index"] == 0:
+            time.sleep(0.2)
+        return fetch_shard(client, shard, *args)
+
+    monkeypatch.setattr(shards_module, "_fetch_shard", delayed_fetch_shard)
+
+    results = {}
+    threads = [
+        threading.Thread(target=_consume, args=(FakeClient(), results, "first"), daemon=True),
+        threading.Thread(target=_consume, args=(FakeClient(), results, "second"), daemon=True),
+    ]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=20)
+
+    assert not any(thread.is_alive() for thread in threads), "consulta travou"
+
+    expected = [(day, page) for day in DAYS for page in range(1, PAGES_PER_DAY + 1)]
+    assert results["first"] == expected
+    assert results["second"] == expected
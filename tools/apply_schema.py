@@ -0,0 +1,56 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from database.connection import get_connection
+from database.schema import ensure_index
+from services.ofs_activities_errors_importer import ensure_erro_tipo_column
+from services.online_service import ensure_resumo_table
+
+# Passo de deploy: cria colunas e índices que as telas usam. Rodar uma vez
+# (antes de subir a versão nova do app), fora do horário de pico: CREATE
+# INDEX em tabela grande demora. As rotas não fazem DDL. A coluna erro_tipo e
+# a tabela usuarios_online_resumo são obrigatórias (a importação e a contagem
+# de online usam); os índices só deixam as telas rápidas. Pode ser executado
+# de novo.
+INDEXES = [
+    # Paginação por keyset das listagens.
+    ("ofs_activities_errors", "idx_errors_date_seen_id", ["date", "last_seen_at", "activity_id"]),
+    ("ofs_atividades_notdone", "idx_notdone_tratado_created_id", ["tratado_em", "created_at", "activity_id"]),
+    ("audit_log", "idx_audit_created_id", ["created_at", "id"]),
+]
+
+
+def main():
+    conn = get_connection()
+    cur = conn.cursor(dictionary=True)
+
+    try:
+        print("Coluna erro_tipo em ofs_activities_errors...")
+        if ensure_erro_tipo_column(cur):
+            print("  coluna criada: rode tools/backfill_erro_tipo.py para classificar o histórico.")
+        conn.commit()
+
+        print("Tabela usuarios_online_resumo...")
+        ensure_resumo_table(cur)
+        conn.commit()
+
+        for table, index_name, columns in INDEXES:
+            print(f"Índice {index_name} em {table}...")
+            ensure_index(cur, table, index_name, columns)
+            conn.commit()
+
+    finally:
+        cur.close()
+        conn.close()
+
+    print("\nSchema atualizado.")
+
+
+if __name__ == "__main__":
+    main()
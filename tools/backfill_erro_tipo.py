@@ -0,0 +1,89 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from database.connection import get_connection
+from database.bulk import bulk_update
+from services.ofs_activities_errors_importer import classify_erro_tipo, ensure_erro_tipo_column
+
+# Classifica erro_tipo nas linhas importadas antes da coluna existir.
+# Percorre a tabela por activity_id (keyset) e só grava o que mudou;
+# pode ser interrompido e executado de novo. Até rodar, as telas classificam
+# essas linhas (erro_tipo = '-') pela regra antiga em SQL (erro_tipo_sql),
+# então os números já batem; o backfill só tira esse custo das consultas.
+BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "1000"))
+
+
+def fetch_batch(cur, last_activity_id):
+    cur.execute("""
+        SELECT
+            activity_id,
+            xa_sap_crt,
+            xa_res_api_ng_response,
+            xa_api_ng_dispatch,
+            erro_tipo
+        FROM ofs_activities_errors
+        WHERE activity_id > %s
+        ORDER BY activity_id
+        LIMIT %s
+    """, (last_activity_id, BATCH_SIZE))
+    return cur.fetchall()
+
+
+def main():
+    conn = get_connection()
+    cur = conn.cursor(dictionary=True)
+
+    total_read = 0
+    total_updated = 0
+    by_tipo = {}
+    last_activity_id = ""
+
+    try:
+        ensure_erro_tipo_column(cur)
+        conn.commit()
+
+        while True:
+            rows = fetch_batch(cur, last_activity_id)
+            if not rows:
+                break
+
+            last_activity_id = rows[-1]["activity_id"]
+            total_read += len(rows)
+
+            changes = []
+            for row in rows:
+                tipo = classify_erro_tipo(
+                    row.get("xa_sap_crt"),
+                    row.get("xa_res_api_ng_response"),
+                    row.get("xa_api_ng_dispatch"),
+                )
+                by_tipo[tipo] = by_tipo.get(tipo, 0) + 1
+
+                if row.get("erro_tipo") != tipo:
+                    changes.append((row["activity_id"], tipo))
+
+            if changes:
+                total_updated += bulk_update(cur, "ofs_activities_errors", "activity_id", ("erro_tipo",), changes)
+                conn.commit()
+
+            print(f"Lidas: {total_read} | atualizadas: {total_updated} | último activity_id: {last_activity_id}")
+
+    finally:
+        cur.close()
+        conn.close()
+
+    print("\nBackfill finalizado.")
+    print(f"Total lido do banco: {total_read}")
+    print(f"Total atualizado: {total_updated}")
+    for tipo, qtd in sorted(by_tipo.items(), key=lambda x: -x[1]):
+        print(f"  {tipo}: {qtd}")
+
+
+if __name__ == "__main__":
+    main()
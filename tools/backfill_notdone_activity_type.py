@@ -9,6 +9,7 @@ if PROJECT_ROOT not in sys.path:
 from collections import defaultdict
 from urllib.parse import urlencode
 from database.connection import get_connection
+from database.bulk import bulk_update
 from ofs.client import OFSClient
 from datetime import datetime
 BATCH_SIZE_DB = 200
@@ -81,16 +82,15 @@ def update_activity_types(type_map):
 
     conn = get_connection()
     cur = conn.cursor()
-    updated = 0
 
     try:
-        for activity_id, activity_type in type_map.items():
-            cur.execute("""
-                UPDATE ofs_atividades_notdone
-                SET activity_type = %s
-                WHERE activity_id = %s
-            """, (activity_type, activity_id))
-            updated += cur.rowcount
+        updated = bulk_update(
+            cur,
+            "ofs_atividades_notdone",
+            "activity_id",
+            ("activity_type",),
+            list(type_map.items()),
+        )
 
         conn.commit()
         return updated
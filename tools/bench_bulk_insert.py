@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from database.bulk import bulk_insert_ignore, bulk_upsert
+from database.connection import get_connection
+
+TOTAL_ROWS = int(os.getenv("BENCH_ROWS", "20000"))
+CHUNK_SIZES = [int(x) for x in os.getenv("BENCH_CHUNK_SIZES", "100,500,1000").split(",")]
+
+TABLE = "bench_bulk_insert_tmp"
+COLUMNS = ("activity_id", "activity_type", "city", "resource_id", "date")
+
+
+def _rows(start=0):
+    return [
+        (str(1000000 + i), "INS", f"Cidade {i % 50}", f"TC{i % 300}", "2026-01-01")
+        for i in range(start, start + TOTAL_ROWS)
+    ]
+
+
+def _reset_table(cur):
+    cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cur.execute(
+        f"""
+        CREATE TABLE {TABLE} (
+            activity_id VARCHAR(32) NOT NULL PRIMARY KEY,
+            activity_type VARCHAR(40) NULL,
+            city VARCHAR(120) NULL,
+            resource_id VARCHAR(40) NULL,
+            `date` DATE NULL
+        )
+        """
+    )
+
+
+def _report(label, rows, elapsed, extra=""):
+    print(f"{label:<34} linhas={rows:<7} tempo={elapsed:7.2f}s  {rows / elapsed:10.0f} linhas/s  {extra}")
+
+
+def bench_row_by_row(conn, cur):
+    _reset_table(cur)
+    rows = _rows()
+    sql = f"INSERT IGNORE INTO {TABLE} ({', '.join(COLUMNS)}) VALUES (%s, %s, %s, %s, %s)"
+
+    started = time.perf_counter()
+    inserted = 0
+    for row in rows:
+        cur.execute(sql, row)
+        inserted += cur.rowcount
+    conn.commit()
+
+    _report("antes: cur.execute por linha", len(rows), time.perf_counter() - started, f"inseridas={inserted}")
+
+
+def bench_bulk(conn, cur, chunk_size):
+    _reset_table(cur)
+    rows = _rows()
+
+    started = time.perf_counter()
+    result = bulk_insert_ignore(cur, TABLE, COLUMNS, rows, chunk_size=chunk_size)
+    conn.commit()
+    _report(f"bulk_insert_ignore chunk={chunk_size}", len(rows), time.perf_counter() - started, f"{result}")
+
+    # Metade já existe (atualizada), metade é nova.
+    upsert_rows = [
+        (activity_id, "UPD", city, resource_id, day)
+        for activity_id, _, city, resource_id, day in _rows(start=TOTAL_ROWS // 2)
+    ]
+
+    started = time.perf_counter()
+    result = bulk_upsert(cur, TABLE, COLUMNS, upsert_rows, key_columns=("activity_id",), chunk_size=chunk_size)
+    conn.commit()
+    _report(f"bulk_upsert chunk={chunk_size}", len(upsert_rows), time.perf_counter() - started, f"{result}")
+
+
+def main():
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        bench_row_by_row(conn, cur)
+
+        for chunk_size in CHUNK_SIZES:
+            bench_bulk(conn, cur, chunk_size)
+
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
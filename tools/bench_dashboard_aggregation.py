@@ -0,0 +1,151 @@
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from services.dashboard_aggregation import ActivityColumns, ActivityCube
+
+# Compara os indicadores do dashboard calculados com varreduras repetidas
+# (forma antiga de _build_payload) contra o passe único do ActivityCube.
+TOTAL_ROWS = int(os.getenv("BENCH_ROWS", "200000"))
+
+B2C_CODES = {"INS", "SUP", "SUP_QUA", "SUP_REP", "MIG_PLA", "MIG_TEC", "QUA", "INS_DEV"}
+REDES_CODES = {"INF_COR", "INF_PRE", "MAN_COR", "MAN_PRE"}
+OTHER_CODES = {"RET", "VIS"}
+STATUSES = ["completed", "notdone", "pending", "started", "suspended", "cancelled", "enroute"]
+CITIES = [f"Cidade {i}" for i in range(120)]
+
+
+def synthetic_rows(today):
+    random.seed(42)
+    codes = sorted(B2C_CODES | REDES_CODES | OTHER_CODES)
+    rows = []
+
+    for i in range(TOTAL_ROWS):
+        day = today - timedelta(days=random.randint(0, 7))
+        end = datetime.combine(day, datetime.min.time()) + timedelta(minutes=random.randint(420, 1260))
+
+        rows.append({
+            "activityId": str(10_000_000 + i),
+            "date": day.strftime("%Y-%m-%d"),
+            "status": random.choice(STATUSES),
+            "activityType": random.choice(codes),
+            "city": random.choice(CITIES),
+            "endTime": end.strftime("%Y-%m-%d %H:%M:%S") if random.random() > 0.1 else "",
+        })
+
+    return rows
+
+
+# --- forma antiga: cada indicador relê todas as linhas e reconverte endTime ---
+
+def _legacy_finished_until(item, until_time):
+    if until_time is None:
+        return True
+    value = str(item.get("endTime") or "").strip()
+    if not value:
+        return False
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(value[:19], fmt).time() <= until_time
+        except ValueError:
+            continue
+    return False
+
+
+def _legacy_count(rows, date_value, codes, status, until_time=None):
+    total = 0
+    for item in rows:
+        if str(item.get("date") or "").strip() != date_value:
+            continue
+        if str(item.get("status") or "").strip().lower() != status:
+            continue
+        if str(item.get("activityType") or "").strip() not in codes:
+            continue
+        if not _legacy_finished_until(item, until_time):
+            continue
+        total += 1
+    return total
+
+
+def legacy_indicators(rows, today_text, last_week_text, last_7, cutoff):
+    result = {}
+    for name, codes in (("b2c", B2C_CODES), ("redes", REDES_CODES)):
+        for status in ("completed", "notdone"):
+            result[f"{name}_{status}_today"] = _legacy_count(rows, today_text, codes, status)
+            result[f"{name}_{status}_last_week"] = _legacy_count(rows, last_week_text, codes, status, cutoff)
+        result[f"{name}_last_7"] = [_legacy_count(rows, d, codes, "completed") for d in last_7]
+    return result
+
+
+def build_columns(rows):
+    # Em _build_payload este passe já existe (monta dashboard_rows).
+    columns = ActivityColumns()
+
+    for item in rows:
+        columns.append(
+            str(item.get("date") or "").strip(),
+            str(item.get("activityType") or "").strip(),
+            str(item.get("status") or "").strip().lower(),
+            str(item.get("city") or "").strip(),
+            item.get("endTime"),
+        )
+
+    return columns
+
+
+def cube_indicators(columns, today_text, last_week_text, last_7, cutoff):
+    cube = ActivityCube(columns, cutoff_date=last_week_text, cutoff_time=cutoff)
+
+    result = {}
+    for name, codes in (("b2c", B2C_CODES), ("redes", REDES_CODES)):
+        for status in ("completed", "notdone"):
+            result[f"{name}_{status}_today"] = cube.count(today_text, codes, status)
+            result[f"{name}_{status}_last_week"] = cube.count(last_week_text, codes, status, until_cutoff=True)
+        by_day = cube.by_date(codes, "completed")
+        result[f"{name}_last_7"] = [by_day.get(d, 0) for d in last_7]
+    return result
+
+
+def main():
+    today = date.today()
+    today_text = today.strftime("%Y-%m-%d")
+    last_week_text = (today - timedelta(days=7)).strftime("%Y-%m-%d")
+    last_7 = [(today - timedelta(days=6 - i)).strftime("%Y-%m-%d") for i in range(7)]
+    cutoff = datetime.now().time().replace(microsecond=0)
+
+    rows = synthetic_rows(today)
+    print(f"Atividades sintéticas: {len(rows)}")
+
+    started = time.perf_counter()
+    legacy = legacy_indicators(rows, today_text, last_week_text, last_7, cutoff)
+    legacy_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    columns = build_columns(rows)
+    columns_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    single = cube_indicators(columns, today_text, last_week_text, last_7, cutoff)
+    cube_elapsed = time.perf_counter() - started
+
+    print(f"varreduras repetidas:          {legacy_elapsed:8.2f}s")
+    print(f"colunas (passe já existente):  {columns_elapsed:8.2f}s")
+    print(f"cubo + indicadores:            {cube_elapsed:8.2f}s")
+    print(f"ganho (só indicadores):        {legacy_elapsed / max(cube_elapsed, 1e-9):8.1f}x")
+    print(f"ganho (contando as colunas):   {legacy_elapsed / max(cube_elapsed + columns_elapsed, 1e-9):8.1f}x")
+    print(f"resultados iguais:    {legacy == single}")
+
+    if legacy != single:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# O benchmark mede o pool de conexões, não o ritmo do limitador.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import requests
+
+from ofs.client import OFSClient
+
+TOTAL_REQUESTS = int(os.getenv("BENCH_REQUESTS", "300"))
+WORKERS = int(os.getenv("BENCH_WORKERS", "8"))
+
+_connections = {"total": 0}
+_connections_lock = threading.Lock()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Servidor local que imita uma página de /activities do OFS.
+    Conta quantas conexões TCP foram abertas (setup roda uma vez por conexão).
+    """
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with _connections_lock:
+            _connections["total"] += 1
+
+    def do_GET(self):
+        body = b'{"items": [{"activityId": 1}], "hasMore": false}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _reset_connections():
+    with _connections_lock:
+        _connections["total"] = 0
+
+
+def _run(label, fetch, url):
+    _reset_connections()
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        list(executor.map(lambda i: fetch(f"{url}?offset={i}"), range(TOTAL_REQUESTS)))
+
+    elapsed = time.perf_counter() - started
+    opened = _connections["total"]
+
+    print(
+        f"{label:<28} requests={TOTAL_REQUESTS} conexoes={opened} "
+        f"reuso={(1 - opened / TOTAL_REQUESTS) * 100:.1f}% tempo={elapsed:.2f}s"
+    )
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url = f"http://127.0.0.1:{server.server_port}/rest/ofscCore/v1/activities/"
+    client = OFSClient(username="bench", password="bench")
+
+    def fetch_without_pool(page_url):
+        response = requests.get(page_url, auth=client.auth, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    try:
+        _run("requests.get (sem pool)", fetch_without_pool, url)
+        _run("OFSClient (session pool)", client.authenticated_get, url)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import os
+import random
+import sys
+import time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from services.ofs_os_report_service import (
+    FIELD_CHOICES,
+    TASK_TYPE_PROPERTY_CODE,
+    _closure_fields_for_report,
+    _compile_report_column,
+    _first_name,
+)
+
+# Compara a montagem das linhas do relatório célula a célula com a cadeia de
+# ifs de _row_value (forma antiga) contra os extratores compilados por campo.
+# Confere que as duas produzem exatamente as mesmas linhas.
+TOTAL_ROWS = int(os.getenv("BENCH_ROWS", "100000"))
+REPORT_TYPE = os.getenv("BENCH_REPORT_TYPE", "ofs_os")
+
+SELECTED_FIELDS = [field["key"] for field in FIELD_CHOICES]
+
+RESOURCES = [f"TEC{i:04d}" for i in range(800)]
+ACTIVITY_TYPES = ["INS", "SUP", "SUP_QUA", "RET", "VIS", "MIG_PLA", "INF_COR"]
+TASK_TYPES = [f"T{i}" for i in range(40)]
+CLOSE_REASONS = [f"{i:02d}" for i in range(30)]
+STATUSES = ["completed", "notdone", "pending", "started", "cancelled"]
+
+
+def synthetic_maps():
+    closure_fields = _closure_fields_for_report(REPORT_TYPE)
+
+    return {
+        # Alguns recursos ficam de fora para exercitar o "não encontrado".
+        "resource_name_map": {rid: f"Técnico {rid}" for rid in RESOURCES[:700]},
+        "resource_status_map": {rid: "active" for rid in RESOURCES[:650]},
+        "activity_type_label_map": {code: f"Tipo {code}" for code in ACTIVITY_TYPES[:5]},
+        "close_reason_name_map": {
+            (field, code): f"Motivo {code}"
+            for field in closure_fields
+            for code in CLOSE_REASONS[:20]
+        },
+        "task_type_name_map": {code: f"Tarefa {code}" for code in TASK_TYPES[:30]},
+    }
+
+
+def synthetic_items():
+    rnd = random.Random(42)
+    closure_fields = _closure_fields_for_report(REPORT_TYPE)
+    items = []
+
+    for i in range(TOTAL_ROWS):
+        item = {
+            "activityId": 10_000_000 + i,
+            "apptNumber": f"OS{i}",
+            "resourceId": rnd.choice(RESOURCES + [""]),
+            "status": rnd.choice(STATUSES),
+            "activityType": rnd.choice(ACTIVITY_TYPES),
+            TASK_TYPE_PROPERTY_CODE: rnd.choice(TASK_TYPES + [None]),
+            "customerName": rnd.choice(["Maria da Silva", " João Souza ", None]),
+            "city": f"Cidade {rnd.randint(0, 120)}",
+            "date": f"2026-05-{rnd.randint(1, 28):02d}",
+            "XA_TSK_NOT": "observação " * rnd.randint(0, 3) or None,
+        }
+        item[rnd.choice(closure_fields)] = rnd.choice(CLOSE_REASONS + ["", None])
+        items.append(item)
+
+    return items
+
+
+# --- forma antiga: _row_value percorria a cadeia de ifs para cada célula ---
+
+def legacy_row_value(
+    item,
+    field_key,
+    resource_name_map=None,
+    resource_status_map=None,
+    activity_type_label_map=None,
+    close_reason_name_map=None,
+    task_type_name_map=None,
+    report_type="ofs_os",
+):
+    if field_key == "customerName":
+        return _first_name(item.get("customerName"))
+    if field_key == "customerNameFull":
+        return str(item.get("customerName") or "").strip()
+    if field_key == "fechamento_atividade":
+        for closure_field in _closure_fields_for_report(report_type):
+            raw_value = item.get(closure_field)
+            if raw_value is None:
+                continue
+            label = str(raw_value).strip()
+            if not label:
+                continue
+            if close_reason_name_map:
+                translated = close_reason_name_map.get((closure_field, label))
+                if translated:
+                    return translated
+            return label
+        return ""
+    if field_key == "resourceName":
+        resource_id = str(item.get("resourceId") or "").strip()
+        if not resource_id:
+            return "Técnico não encontrado na base"
+        if resource_name_map and resource_id in resource_name_map:
+            return resource_name_map[resource_id] or "Técnico não encontrado na base"
+        return "Técnico não encontrado na base"
+    if field_key == "resourceStatus":
+        resource_id = str(item.get("resourceId") or "").strip()
+        if not resource_id:
+            return "Não encontrado"
+        if resource_status_map and resource_id in resource_status_map:
+            return resource_status_map[resource_id]
+        return "Não encontrado"
+    if field_key == "activityType":
+        activity_code = str(item.get("activityType") or "").strip()
+        if not activity_code:
+            return ""
+        if activity_type_label_map and activity_code in activity_type_label_map:
+            return activity_type_label_map[activity_code]
+        return activity_code
+    if field_key == TASK_TYPE_PROPERTY_CODE:
+        raw_value = str(item.get(TASK_TYPE_PROPERTY_CODE) or "").strip()
+        if not raw_value:
+            return ""
+        if task_type_name_map and raw_value in task_type_name_map:
+            return task_type_name_map[raw_value]
+        return raw_value
+    value = item.get(field_key)
+    if value is None:
+        return ""
+    return value
+
+
+def legacy_rows(items, maps):
+    return [
+        [
+            legacy_row_value(item, key, report_type=REPORT_TYPE, **maps)
+            for key in SELECTED_FIELDS
+        ]
+        for item in items
+    ]
+
+
+def compiled_rows(items, maps):
+    columns = tuple(
+        _compile_report_column(key, report_type=REPORT_TYPE, **maps)
+        for key in SELECTED_FIELDS
+    )
+    return [[column(item) for column in columns] for item in items]
+
+
+def main():
+    maps = synthetic_maps()
+    items = synthetic_items()
+
+    print(f"Linhas sintéticas: {TOTAL_ROWS} x {len(SELECTED_FIELDS)} campos ({REPORT_TYPE})")
+
+    results = {}
+
+    for label, fn in (("_row_value", legacy_rows), ("compilado", compiled_rows)):
+        started = time.perf_counter()
+        rows = fn(items, maps)
+        elapsed = time.perf_counter() - started
+        results[label] = (elapsed, rows)
+        print(f"{label:<12} {elapsed:8.2f}s | {TOTAL_ROWS / elapsed:10.0f} linhas/s")
+
+    legacy_elapsed, legacy = results["_row_value"]
+    compiled_elapsed, compiled = results["compilado"]
+
+    if legacy != compiled:
+        print("ERRO: as linhas compiladas diferem das de _row_value")
+        sys.exit(1)
+
+    print(f"linhas idênticas; ganho: {legacy_elapsed / max(compiled_elapsed, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
+from core.utils import xlsx_auto_width
+from core.xlsx_writer import StreamingXlsxWriter
+
+# Compara a geração do XLSX de relatório em openpyxl (forma antiga de
+# _build_xlsx: planilha inteira em memória, borda/alinhamento célula a célula
+# e largura relendo tudo) com o StreamingXlsxWriter (constant_memory).
+# Cada modo roda em um processo próprio; o pico é o RSS máximo do processo
+# menos o de um processo que só importa os módulos. Falha (exit 1) se o pico
+# do streaming passar de BENCH_MAX_PEAK_MB.
+TOTAL_ROWS = int(os.getenv("BENCH_ROWS", "50000"))
+TOTAL_FIELDS = int(os.getenv("BENCH_FIELDS", "30"))
+MAX_PEAK_MB = float(os.getenv("BENCH_MAX_PEAK_MB", "32"))
+SKIP_LEGACY = os.getenv("BENCH_SKIP_LEGACY", "").lower() in ("1", "true", "yes")
+
+STATUSES = ["completed", "notdone", "pending", "started", "cancelled"]
+CITIES = [f"Cidade {i}" for i in range(120)]
+
+
+def synthetic_rows():
+    rnd = random.Random(42)
+    headers = [f"Campo {i}" for i in range(TOTAL_FIELDS)]
+
+    for i in range(TOTAL_ROWS):
+        row = [
+            str(10_000_000 + i),
+            rnd.choice(STATUSES),
+            rnd.choice(CITIES),
+            f"2026-05-{rnd.randint(1, 28):02d}",
+        ]
+        while len(row) < len(headers):
+            row.append("texto livre " * rnd.randint(0, 4) or None)
+        yield row
+
+
+def legacy_openpyxl(output_path, headers):
+    # O pipeline antigo guardava todas as linhas antes de montar a planilha.
+    rows = list(synthetic_rows())
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Relatório OS OFS"
+    ws.append(headers)
+
+    for row in rows:
+        ws.append(["" if value is None else value for value in row])
+
+    header_fill = PatternFill("solid", fgColor="1F4E78")
+    header_font = Font(color="FFFFFF", bold=True)
+    thin = Side(style="thin", color="D9E2F3")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    for cell in ws[1]:
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        cell.border = border
+
+    for row in ws.iter_rows(min_row=2):
+        for cell in row:
+            cell.border = border
+            cell.alignment = Alignment(vertical="top")
+
+    ws.freeze_panes = "A2"
+    xlsx_auto_width(ws)
+    wb.save(output_path)
+
+
+def streaming(output_path, headers):
+    with StreamingXlsxWriter(output_path, "Relatório OS OFS", headers) as xlsx:
+        for row in synthetic_rows():
+            xlsx.write_row(row)
+
+
+MODES = {
+    "baseline": None,
+    "streaming": streaming,
+    "openpyxl": legacy_openpyxl,
+}
+
+
+def run_mode(mode):
+    """Processo filho: roda um modo e imprime tempo e RSS máximo (KB)."""
+    headers = [f"Campo {i}" for i in range(TOTAL_FIELDS)]
+    elapsed = 0.0
+    size = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if MODES[mode] is not None:
+            output_path = os.path.join(tmp, f"{mode}.xlsx")
+            started = time.perf_counter()
+            MODES[mode](output_path, headers)
+            elapsed = time.perf_counter() - started
+            size = os.path.getsize(output_path)
+
+    print(json.dumps({
+        "elapsed": elapsed,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "size": size,
+    }))
+
+
+def measure(mode):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), mode],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1:
+        run_mode(sys.argv[1])
+        return
+
+    print(f"Linhas sintéticas: {TOTAL_ROWS} x {TOTAL_FIELDS} campos")
+
+    baseline_mb = measure("baseline")["max_rss_kb"] / 1024
+    results = {}
+
+    for mode in ("streaming",) if SKIP_LEGACY else ("streaming", "openpyxl"):
+        data = measure(mode)
+        peak_mb = data["max_rss_kb"] / 1024 - baseline_mb
+        results[mode] = (data["elapsed"], peak_mb)
+        print(f"{mode:<10} {data['elapsed']:8.2f}s | pico {peak_mb:8.1f} MB | arquivo {data['size'] / (1024 * 1024):6.1f} MB")
+
+    stream_elapsed, stream_peak = results["streaming"]
+
+    if "openpyxl" in results:
+        legacy_elapsed, legacy_peak = results["openpyxl"]
+        print(f"ganho de tempo:   {legacy_elapsed / max(stream_elapsed, 1e-9):6.1f}x")
+        print(f"ganho de memória: {legacy_peak / max(stream_peak, 1.0):6.1f}x")
+
+    print(f"pico do streaming: {stream_peak:.1f} MB (limite {MAX_PEAK_MB:.0f} MB)")
+
+    if stream_peak > MAX_PEAK_MB:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()